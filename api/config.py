@@ -44,6 +44,34 @@ class APIConfig:
     DEFAULT_DECODO_TIMEOUT: int = int(os.getenv("DEFAULT_DECODO_TIMEOUT", "180"))
     DEFAULT_DECODO_MAX_CONCURRENT: int = int(os.getenv("DEFAULT_DECODO_MAX_CONCURRENT", "50"))
     
+    # Learned per-domain XHR endpoint pattern index (SQLite file, disabled if unset)
+    XHR_PATTERN_INDEX_PATH: Optional[str] = os.getenv("XHR_PATTERN_INDEX_PATH") or None
+    
+    # Learned per-domain tier routing (SQLite file, disabled if unset)
+    TIER_STATS_PATH: Optional[str] = os.getenv("TIER_STATS_PATH") or None
+    TIER_EXPLORATION_RATE: float = float(os.getenv("TIER_EXPLORATION_RATE", "0.05"))
+    
+    # Worker processes for content analysis (0 = analyze on the event loop)
+    ANALYZER_WORKERS: int = int(os.getenv("ANALYZER_WORKERS", str(min(4, os.cpu_count() or 1))))
+    
+    # Health probes of failed custom JS services
+    CUSTOM_JS_PROBE_URL: Optional[str] = os.getenv("CUSTOM_JS_PROBE_URL") or None
+    CUSTOM_JS_PROBE_BACKOFF: int = int(os.getenv("CUSTOM_JS_PROBE_BACKOFF", "30"))
+    
+    # Request budget per custom JS service: URLs per window (defaults: batch size
+    # per cooldown) and batches at once
+    CUSTOM_JS_RATE_LIMIT_URLS: Optional[int] = int(os.getenv("CUSTOM_JS_RATE_LIMIT_URLS")) if os.getenv("CUSTOM_JS_RATE_LIMIT_URLS") else None
+    CUSTOM_JS_RATE_LIMIT_WINDOW: Optional[float] = float(os.getenv("CUSTOM_JS_RATE_LIMIT_WINDOW")) if os.getenv("CUSTOM_JS_RATE_LIMIT_WINDOW") else None
+    CUSTOM_JS_MAX_CONCURRENT_BATCHES: int = int(os.getenv("CUSTOM_JS_MAX_CONCURRENT_BATCHES", "1"))
+    
+    # Keep-alive connections to the custom JS services
+    CUSTOM_JS_KEEPALIVE_TIMEOUT: float = float(os.getenv("CUSTOM_JS_KEEPALIVE_TIMEOUT", "75"))
+    CUSTOM_JS_DNS_CACHE_TTL: int = int(os.getenv("CUSTOM_JS_DNS_CACHE_TTL", "300"))
+    CUSTOM_JS_COMPRESS_REQUESTS: bool = os.getenv("CUSTOM_JS_COMPRESS_REQUESTS", "false").lower() == "true"
+    
+    # HTML parser for content analysis: auto, selectolax, lxml or html.parser
+    PARSER_BACKEND: str = os.getenv("PARSER_BACKEND", "auto")
+    
     # Custom JS service endpoints (comma-separated)
     CUSTOM_JS_SERVICES: Optional[List[str]] = None
     if os.getenv("CUSTOM_JS_SERVICES"):
@@ -84,6 +112,23 @@ class APIConfig:
     DECODO_DEVICE_TYPE: str = os.getenv("DECODO_DEVICE_TYPE", "desktop")
     DECODO_POLL_INTERVAL: int = int(os.getenv("DECODO_POLL_INTERVAL", "2"))
     DECODO_MAX_POLL_ATTEMPTS: int = int(os.getenv("DECODO_MAX_POLL_ATTEMPTS", "30"))
+    DECODO_SUBMIT_CHUNK_SIZE: int = int(os.getenv("DECODO_SUBMIT_CHUNK_SIZE", "25"))
+    DECODO_SUBMIT_RETRIES: int = int(os.getenv("DECODO_SUBMIT_RETRIES", "2"))
+    DECODO_MAX_CONCURRENT_SUBMISSIONS: int = int(os.getenv("DECODO_MAX_CONCURRENT_SUBMISSIONS", "4"))
+    DECODO_POLL_QPS: float = float(os.getenv("DECODO_POLL_QPS", "20"))
+    DECODO_POLL_MASS_STEP: float = float(os.getenv("DECODO_POLL_MASS_STEP", "0.3"))
+    
+    # Decodo callback mode: public URL of /api/v1/decodo/callback on this server
+    # (unset = polling only), a shared secret Decodo must echo back as ?token=
+    # (required: callback mode stays off without it),
+    # and the safety-net poll interval for lost callbacks
+    DECODO_CALLBACK_URL: Optional[str] = os.getenv("DECODO_CALLBACK_URL") or None
+    DECODO_CALLBACK_TOKEN: Optional[str] = os.getenv("DECODO_CALLBACK_TOKEN") or None
+    DECODO_CALLBACK_POLL_INTERVAL: float = float(os.getenv("DECODO_CALLBACK_POLL_INTERVAL", "30"))
+    
+    # Journal of submitted Decodo tasks, reattached after a restart (SQLite file, disabled if unset)
+    DECODO_TASK_JOURNAL_PATH: Optional[str] = os.getenv("DECODO_TASK_JOURNAL_PATH") or None
+    DECODO_TASK_JOURNAL_MAX_AGE: float = float(os.getenv("DECODO_TASK_JOURNAL_MAX_AGE", "3600"))
     
     # Content analyzer defaults
     DEFAULT_MIN_CONTENT_LENGTH: int = int(os.getenv("DEFAULT_MIN_CONTENT_LENGTH", "1000"))
@@ -5,7 +5,7 @@ FastAPI application for URL to HTML converter API.
 import logging
 import time
 import asyncio
-from typing import List
+from typing import List, Optional
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, Request
@@ -21,10 +21,16 @@ from api.models import (
     BatchSummary,
     ErrorResponse,
     HealthResponse,
-    APIInfoResponse
+    APIInfoResponse,
+    DecodoCallbackResponse,
+    ServicePoolStatusResponse
 )
 from url_to_html.async_batch_fetcher import async_fetch_batch
-from url_to_html.batch_config import BatchFetcherConfig
+from url_to_html.batch_config import BatchFetcherConfig, DEFAULT_CUSTOM_JS_SERVICE_ENDPOINTS
+from url_to_html.analyzer_executor import AnalyzerExecutor
+from url_to_html.decodo_callbacks import callback_token_valid, get_callback_router, signed_callback_url
+from url_to_html.decodo_task_journal import get_decodo_task_journal
+from url_to_html.service_pool_manager import ServicePoolManager
 
 # Configure logging
 logging.basicConfig(
@@ -37,6 +43,11 @@ logger = logging.getLogger(__name__)
 startup_time = time.time()
 
 
+def decodo_callback_url() -> Optional[str]:
+    """Callback URL given to Decodo, carrying the callback token (None unless both are set)."""
+    return signed_callback_url(APIConfig.DECODO_CALLBACK_URL, APIConfig.DECODO_CALLBACK_TOKEN)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup/shutdown."""
@@ -45,9 +56,42 @@ async def lifespan(app: FastAPI):
     logger.info(f"API Version: {APIConfig.API_VERSION}")
     logger.info(f"Default static/XHR concurrency: {APIConfig.DEFAULT_STATIC_XHR_CONCURRENCY}")
     logger.info(f"Custom JS services: {len(APIConfig.CUSTOM_JS_SERVICES) if APIConfig.CUSTOM_JS_SERVICES else 0}")
+    
+    # Content analysis runs in a process pool shared by every request
+    app.state.analyzer_executor = AnalyzerExecutor(workers=APIConfig.ANALYZER_WORKERS)
+    logger.info(f"Content analyzer workers: {APIConfig.ANALYZER_WORKERS}")
+    
+    # One custom JS service pool for every request, so request budgets hold across batches
+    app.state.service_pool = ServicePoolManager(
+        service_endpoints=APIConfig.CUSTOM_JS_SERVICES or list(DEFAULT_CUSTOM_JS_SERVICE_ENDPOINTS),
+        batch_size=APIConfig.DEFAULT_CUSTOM_JS_BATCH_SIZE,
+        cooldown_seconds=APIConfig.DEFAULT_CUSTOM_JS_COOLDOWN,
+        probe_url=APIConfig.CUSTOM_JS_PROBE_URL,
+        probe_backoff_seconds=APIConfig.CUSTOM_JS_PROBE_BACKOFF,
+        rate_limit_urls=APIConfig.CUSTOM_JS_RATE_LIMIT_URLS,
+        rate_limit_window=APIConfig.CUSTOM_JS_RATE_LIMIT_WINDOW,
+        max_concurrent_batches=APIConfig.CUSTOM_JS_MAX_CONCURRENT_BATCHES,
+        keepalive_timeout=APIConfig.CUSTOM_JS_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl=APIConfig.CUSTOM_JS_DNS_CACHE_TTL,
+        compress_requests=APIConfig.CUSTOM_JS_COMPRESS_REQUESTS
+    )
+    
+    # Decodo tasks left in flight by the previous process are reattached when requested again
+    task_journal = get_decodo_task_journal(
+        APIConfig.DECODO_TASK_JOURNAL_PATH,
+        max_age=APIConfig.DECODO_TASK_JOURNAL_MAX_AGE
+    )
+    if task_journal is not None:
+        expired = task_journal.prune()
+        logger.info(
+            f"Decodo task journal: {task_journal.in_flight_count()} tasks in flight"
+            f" ({expired} expired dropped)"
+        )
     yield
     # Shutdown
     logger.info("Shutting down URL to HTML Converter API")
+    await app.state.service_pool.close()
+    app.state.analyzer_executor.shutdown()
 
 
 # Create FastAPI app
@@ -105,6 +149,8 @@ async def root():
         endpoints={
             "health": "/health",
             "batch_fetch": "/api/v1/fetch-batch",
+            "service_pool": "/api/v1/service-pool",
+            "decodo_callback": "/api/v1/decodo/callback",
             "docs": "/docs",
             "redoc": "/redoc"
         }
@@ -122,6 +168,35 @@ async def health_check():
     )
 
 
+@app.get("/api/v1/service-pool", response_model=ServicePoolStatusResponse, tags=["Health"])
+async def service_pool_status():
+    """Custom JS render capacity shared by all requests."""
+    service_pool = app.state.service_pool
+    return ServicePoolStatusResponse(
+        services=service_pool.get_service_count(),
+        status=await service_pool.get_status_summary(),
+        service_stats=await service_pool.get_service_stats()
+    )
+
+
+@app.post("/api/v1/decodo/callback", response_model=DecodoCallbackResponse, tags=["Batch Processing"])
+async def decodo_callback(request: Request):
+    """
+    Receive a finished Decodo task (callback mode, see DECODO_CALLBACK_URL).
+    
+    The result goes straight to the request waiting for the task, instead of
+    being found by polling.
+    """
+    if not callback_token_valid(request.query_params.get("token"), APIConfig.DECODO_CALLBACK_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid callback token")
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Callback body is not JSON")
+    accepted = get_callback_router().deliver(payload, task_id=request.query_params.get("task_id"))
+    return DecodoCallbackResponse(accepted=accepted)
+
+
 @app.post("/api/v1/fetch-batch", response_model=BatchResponse, tags=["Batch Processing"])
 async def fetch_batch(request: BatchRequest):
     """
@@ -150,7 +225,20 @@ async def fetch_batch(request: BatchRequest):
             decodo_api_endpoint=APIConfig.DECODO_API_ENDPOINT,
             decodo_results_endpoint=APIConfig.DECODO_RESULTS_ENDPOINT,
             decodo_poll_interval=APIConfig.DECODO_POLL_INTERVAL,
-            decodo_max_poll_attempts=APIConfig.DECODO_MAX_POLL_ATTEMPTS
+            decodo_max_poll_attempts=APIConfig.DECODO_MAX_POLL_ATTEMPTS,
+            decodo_submit_chunk_size=APIConfig.DECODO_SUBMIT_CHUNK_SIZE,
+            decodo_submit_retries=APIConfig.DECODO_SUBMIT_RETRIES,
+            decodo_max_concurrent_submissions=APIConfig.DECODO_MAX_CONCURRENT_SUBMISSIONS,
+            decodo_poll_qps=APIConfig.DECODO_POLL_QPS,
+            decodo_poll_mass_step=APIConfig.DECODO_POLL_MASS_STEP,
+            decodo_callback_url=decodo_callback_url(),
+            decodo_callback_poll_interval=APIConfig.DECODO_CALLBACK_POLL_INTERVAL,
+            decodo_task_journal_path=APIConfig.DECODO_TASK_JOURNAL_PATH,
+            decodo_task_journal_max_age=APIConfig.DECODO_TASK_JOURNAL_MAX_AGE,
+            xhr_pattern_index_path=APIConfig.XHR_PATTERN_INDEX_PATH,
+            tier_stats_path=APIConfig.TIER_STATS_PATH,
+            tier_exploration_rate=APIConfig.TIER_EXPLORATION_RATE,
+            parser_backend=APIConfig.PARSER_BACKEND
         )
         
         # Apply request config overrides if provided
@@ -177,10 +265,14 @@ async def fetch_batch(request: BatchRequest):
             else:
                 config.custom_js_batch_size = APIConfig.DEFAULT_CUSTOM_JS_BATCH_SIZE
             
+            # Not per request: the cooldown is part of the services' shared rate budget
             if req_config.custom_js_cooldown_seconds is not None:
-                config.custom_js_cooldown_seconds = req_config.custom_js_cooldown_seconds
-            else:
-                config.custom_js_cooldown_seconds = APIConfig.DEFAULT_CUSTOM_JS_COOLDOWN
+                logger.warning(
+                    "Ignoring deprecated custom_js_cooldown_seconds "
+                    f"({req_config.custom_js_cooldown_seconds}); the services' cooldown is "
+                    f"{APIConfig.DEFAULT_CUSTOM_JS_COOLDOWN}s for every request"
+                )
+            config.custom_js_cooldown_seconds = APIConfig.DEFAULT_CUSTOM_JS_COOLDOWN
             
             if req_config.custom_js_timeout is not None:
                 config.custom_js_timeout = req_config.custom_js_timeout
@@ -246,8 +338,18 @@ async def fetch_batch(request: BatchRequest):
             if APIConfig.CUSTOM_JS_SERVICES:
                 config.custom_js_service_endpoints = APIConfig.CUSTOM_JS_SERVICES
         
+        # Requests naming their own services get the process-wide pool for those instead
+        service_pool = getattr(app.state, "service_pool", None)
+        if service_pool is not None and not service_pool.serves(config.custom_js_service_endpoints):
+            service_pool = None
+        
         # Process batch
-        result = await async_fetch_batch(url_strings, config)
+        result = await async_fetch_batch(
+            url_strings,
+            config,
+            analyzer_executor=getattr(app.state, "analyzer_executor", None),
+            service_pool=service_pool
+        )
         
         # Convert results to response model
         url_results = [
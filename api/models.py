@@ -20,8 +20,13 @@ class BatchRequestConfig(BaseModel):
     
     # Custom JS Service
     custom_js_service_endpoints: Optional[List[str]] = Field(default=None, description="List of custom JS rendering service endpoints")
-    custom_js_batch_size: Optional[int] = Field(default=None, ge=1, le=100, description="URLs per batch for custom JS (1-100)")
-    custom_js_cooldown_seconds: Optional[int] = Field(default=None, ge=0, le=600, description="Cooldown between batches in seconds")
+    custom_js_batch_size: Optional[int] = Field(default=None, ge=1, le=100, description="Maximum URLs per batch for custom JS (1-100); batches are sized per service below this")
+    custom_js_cooldown_seconds: Optional[int] = Field(
+        default=None,
+        ge=0,
+        le=600,
+        description="Deprecated and ignored: the cooldown is part of the render services' shared rate budget"
+    )
     custom_js_timeout: Optional[int] = Field(default=None, ge=30, le=600, description="Timeout for custom JS batch requests")
     custom_js_max_retries: Optional[int] = Field(default=None, ge=1, le=20, description="Max retry attempts for failed/skeleton URLs (1-20)")
     custom_js_skip_domains: Optional[List[str]] = Field(
@@ -117,3 +122,19 @@ class APIInfoResponse(BaseModel):
     description: str = Field(..., description="API description")
     endpoints: Dict[str, str] = Field(..., description="Available endpoints")
 
+
+class DecodoCallbackResponse(BaseModel):
+    """Acknowledgement of a Decodo task callback."""
+    
+    accepted: bool = Field(..., description="Whether a pending task was waiting for this result")
+
+
+class ServicePoolStatusResponse(BaseModel):
+    """Custom JS service pool status."""
+    
+    services: int = Field(..., description="Number of custom JS render services")
+    status: Dict[str, int] = Field(..., description="Services per state and per circuit breaker state, plus batches waiting for a service")
+    service_stats: List[Dict[str, Any]] = Field(
+        default_factory=list,
+        description="Per-service state, average seconds per URL, success rate and throughput, fastest first"
+    )
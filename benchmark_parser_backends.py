@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ContentAnalyzer parser backends on large pages.
+
+Times is_skeleton_content() and is_custom_js_skeleton() with every
+installed backend, against the original BeautifulSoup('html.parser')
+parse, on synthetic listing pages of increasing size.
+
+Usage:
+    python benchmark_parser_backends.py [--repeat N]
+"""
+
+import argparse
+import random
+import time
+from bs4 import BeautifulSoup
+from url_to_html.content_analyzer import ContentAnalyzer
+from url_to_html.parser_backends import available_backends
+from test_html_metrics import _product_page
+
+PAGE_SIZES = (50, 500, 2000)  # product cards per page
+
+
+def _time(func, html_content: str, repeat: int) -> float:
+    """Best-of-N wall time of func(html_content) in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html_content)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    pages = [(products, _product_page(rng, products)) for products in PAGE_SIZES]
+    analyzers = {name: ContentAnalyzer(parser_backend=name) for name in available_backends()}
+
+    print(f"Backends installed: {', '.join(analyzers)}")
+    header = f"{'page':>14} {'backend':>14} {'skeleton ms':>12} {'custom js ms':>13} {'speedup':>8}"
+    print(header)
+    print("-" * len(header))
+    for products, html_content in pages:
+        label = f"{len(html_content) // 1024} KB"
+        baseline = _time(lambda html: BeautifulSoup(html, 'html.parser'), html_content, args.repeat)
+        print(f"{label:>14} {'bs4 (parse)':>14} {baseline:>12.1f} {baseline:>13.1f} {1.0:>7.1f}x")
+        for name, analyzer in analyzers.items():
+            skeleton_ms = _time(analyzer.is_skeleton_content, html_content, args.repeat)
+            custom_js_ms = _time(analyzer.is_custom_js_skeleton, html_content, args.repeat)
+            print(
+                f"{label:>14} {name:>14} {skeleton_ms:>12.1f} {custom_js_ms:>13.1f} "
+                f"{baseline / custom_js_ms:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
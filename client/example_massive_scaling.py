@@ -67,7 +67,6 @@ def main():
             static_xhr_concurrency=200,  # Process 200 URLs in parallel for static/XHR
             custom_js_service_endpoints=custom_js_services,
             custom_js_batch_size=20,  # 20 URLs per service batch
-            custom_js_cooldown_seconds=120,  # 2 minute cooldown
             decodo_enabled=True  # Enable Decodo fallback
         )
         
@@ -5,6 +5,7 @@ Simple, easy-to-use client for fetching HTML content from URLs.
 """
 
 import requests
+import warnings
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass, asdict
 import json
@@ -19,7 +20,7 @@ class BatchRequest:
     static_xhr_timeout: Optional[int] = None
     custom_js_service_endpoints: Optional[List[str]] = None
     custom_js_batch_size: Optional[int] = None
-    custom_js_cooldown_seconds: Optional[int] = None
+    custom_js_cooldown_seconds: Optional[int] = None  # Deprecated, ignored by the server
     custom_js_timeout: Optional[int] = None
     decodo_enabled: Optional[bool] = None
     decodo_timeout: Optional[int] = None
@@ -28,6 +29,15 @@ class BatchRequest:
     save_outputs: Optional[bool] = None
     enable_logging: Optional[bool] = None
     
+    def __post_init__(self):
+        if self.custom_js_cooldown_seconds is not None:
+            warnings.warn(
+                "custom_js_cooldown_seconds is deprecated and ignored by the server: "
+                "the render services' cooldown is configured server-side",
+                DeprecationWarning,
+                stacklevel=3
+            )
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to API request format."""
         data = {"urls": self.urls}
@@ -241,7 +251,7 @@ class URLToHTMLClient:
             custom_js_batch_size: URLs per batch for custom JS (default: 20)
             **kwargs: Additional configuration options:
                 - static_xhr_timeout: Timeout for static/XHR requests
-                - custom_js_cooldown_seconds: Cooldown between batches
+                - custom_js_cooldown_seconds: Deprecated, ignored by the server
                 - custom_js_timeout: Timeout for custom JS batch requests
                 - decodo_enabled: Whether to use Decodo as fallback
                 - decodo_timeout: Timeout for Decodo requests
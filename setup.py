@@ -22,7 +22,7 @@ setup(
         "beautifulsoup4>=4.9.0",
     ],
     extras_require={
-        "fast": ["lxml>=4.6.0"],
+        "fast": ["lxml>=4.6.0", "selectolax>=0.3.17", "ijson>=3.1"],
     },
 )
 
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test the analyzer process pool's recovery from dying workers.
+
+CrashingAnalyzer kills the process it runs in for any page containing
+CRASH, the way an OOM kill on a huge page would. If such a page were ever
+analyzed inline, the test process itself would exit.
+
+Run directly (python test_analyzer_executor.py) or with pytest.
+"""
+
+import asyncio
+import os
+from url_to_html.analyzer_executor import AnalyzerExecutor, WORKER_CRASH_VERDICT
+from url_to_html.content_analyzer import ContentAnalyzer
+
+PAGE = "<html><body>" + "<div class='product'><a href='/p'>Product</a></div>" * 100 + "</body></html>"
+
+
+class CrashingAnalyzer(ContentAnalyzer):
+    """ContentAnalyzer whose worker dies on pages containing CRASH."""
+
+    def should_fallback(self, html_content, status_code):
+        if "CRASH" in html_content:
+            os._exit(1)
+        return super().should_fallback(html_content, status_code)
+
+
+class CountingExecutor(AnalyzerExecutor):
+    """AnalyzerExecutor that counts the pools it creates."""
+
+    def __init__(self, workers: int):
+        self.pools_created = 0
+        super().__init__(workers=workers)
+
+    def _new_pool(self):
+        self.pools_created += 1
+        return super()._new_pool()
+
+
+async def _crash_then_recover(executor: AnalyzerExecutor):
+    analyzer = CrashingAnalyzer()
+    crashed = await executor.should_fallback(analyzer, PAGE + "CRASH", 200)
+    healthy = await executor.should_fallback(analyzer, PAGE, 200)
+    return crashed, healthy
+
+
+def test_crashing_document_gets_fallback_verdict():
+    executor = CountingExecutor(workers=2)
+    try:
+        crashed, healthy = asyncio.run(_crash_then_recover(executor))
+        assert crashed == WORKER_CRASH_VERDICT
+        # Retried once in a new pool, which broke too, then replaced again
+        assert executor.pools_created == 3
+        assert healthy == ContentAnalyzer().should_fallback(PAGE, 200)
+    finally:
+        executor.shutdown()
+
+
+def test_broken_pool_is_replaced_once():
+    executor = CountingExecutor(workers=1)
+    try:
+        broken = executor._pool
+        # Every caller that saw the same pool break asks for a replacement
+        for _ in range(5):
+            executor._replace_pool(broken)
+        assert executor.pools_created == 2
+        assert executor._pool is not broken
+        # The broken pool was shut down rather than leaked
+        try:
+            broken.submit(os.getpid)
+            assert False, "broken pool still accepts work"
+        except RuntimeError:
+            pass
+    finally:
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    test_crashing_document_gets_fallback_verdict()
+    print("✓ Document that kills workers got a fallback verdict, not an inline parse")
+    test_broken_pool_is_replaced_once()
+    print("✓ Broken pool replaced once and shut down")
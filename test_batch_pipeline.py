@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Test the streaming batch pipeline (static/XHR -> custom JS -> Decodo).
+
+Phase 1 is a stand-in, custom JS runs through the real renderer and pool
+against the stand-in render services from test_service_pool.py, and Decodo
+is the stand-in server from test_decodo_callbacks.py. URLs must stream
+through the tiers without phase barriers, failed URLs must be retried on
+another service, and every queued URL must get exactly one result.
+
+Run directly (python test_batch_pipeline.py) or with pytest.
+"""
+
+import asyncio
+import time
+from aiohttp import web
+from url_to_html import async_decodo_fallback
+from url_to_html.async_multi_service_js_renderer import AsyncMultiServiceJSRenderer
+from url_to_html.batch_config import BatchFetcherConfig
+from url_to_html.batch_pipeline import BatchPipeline
+from url_to_html.content_analyzer import ContentAnalyzer
+from url_to_html.result_aggregator import ResultAggregator
+from url_to_html.service_pool_manager import ServicePoolManager
+from test_decodo_callbacks import StandInDecodo
+from test_service_pool import StandInRenderService
+
+SLOW_SECONDS = 1.0
+MAX_RETRIES = 3
+
+FULL_PAGE = (
+    "<html><head><title>Shop</title></head><body>"
+    + "".join(f"<div class='product'><h2>Product {i}</h2><p>{'Well made and in stock. ' * 5}</p></div>" for i in range(40))
+    + "</body></html>"
+)
+
+
+class PageRenderService(StandInRenderService):
+    """Render service that returns full pages and fails every URL containing "dead"."""
+
+    def __init__(self):
+        super().__init__(render_seconds=0.01)
+        self.first_batch_at = None
+
+    def result(self, url: str) -> dict:
+        if self.first_batch_at is None:
+            self.first_batch_at = time.monotonic()
+        if "dead" in url:
+            return {"url": url, "html": None, "status": "failed", "error": "render crashed"}
+        return {"url": url, "html": FULL_PAGE, "status": "success"}
+
+
+class BrokenRenderService(StandInRenderService):
+    """Render service that fails every URL."""
+
+    def result(self, url: str) -> dict:
+        return {"url": url, "html": None, "status": "failed", "error": "render crashed"}
+
+
+class StandInPhase1:
+    """Static/XHR stage: /ok pages pass at once, everything else needs JS; /slow takes SLOW_SECONDS."""
+
+    def __init__(self):
+        self.slow_done_at = None
+
+    async def _fetch(self, url: str) -> dict:
+        if url.endswith("/slow"):
+            await asyncio.sleep(SLOW_SECONDS)
+            self.slow_done_at = time.monotonic()
+        ok = url.endswith("/ok")
+        return {
+            "url": url,
+            "html": FULL_PAGE if ok else None,
+            "method": "static" if ok else None,
+            "needs_js": not ok,
+            "tiers_tried": ["static", "xhr"]
+        }
+
+    async def process_as_completed(self, urls, start_tiers=None):
+        for next_result in asyncio.as_completed([self._fetch(url) for url in urls]):
+            yield await next_result
+
+
+async def _run_pipeline(urls):
+    services = [PageRenderService() for _ in range(3)]
+    endpoints = [await service.start() for service in services]
+    decodo = StandInDecodo()
+    app = web.Application()
+    app.router.add_post("/v2/task/batch", decodo.submit)
+    app.router.add_get("/v2/task/{task_id}/results", decodo.results)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    host, port = runner.addresses[0][:2]
+
+    config = BatchFetcherConfig(
+        custom_js_service_endpoints=endpoints,
+        custom_js_batch_size=4,
+        custom_js_max_retries=MAX_RETRIES,
+        custom_js_retry_backoff_seconds=0.05,
+        decodo_api_endpoint=f"http://{host}:{port}/v2/task/batch",
+        decodo_results_endpoint=f"http://{host}:{port}/v2/task",
+        decodo_poll_interval=0.1,
+        decodo_timeout=10,
+        pipeline_linger_seconds=0.05,
+        save_outputs=False
+    )
+    pool = ServicePoolManager(endpoints, batch_size=4, rate_limit_window=0)
+    phase1 = StandInPhase1()
+    aggregator = ResultAggregator()
+    try:
+        pipeline = BatchPipeline(
+            config,
+            aggregator,
+            phase1,
+            AsyncMultiServiceJSRenderer(endpoints, batch_size=4, timeout=30, service_pool=pool),
+            ContentAnalyzer(),
+            {url: [] for url in urls}
+        )
+        await asyncio.wait_for(pipeline.run(urls), timeout=20)
+        return aggregator.results, services, phase1, decodo
+    finally:
+        await pool.close()
+        await runner.cleanup()
+        for service in services:
+            await service.stop()
+
+
+def _run(urls):
+    saved_token = async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN
+    async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved_token or "test-token"
+    try:
+        return asyncio.run(_run_pipeline(urls))
+    finally:
+        async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved_token
+
+
+async def _retry_routing(urls):
+    broken, healthy = BrokenRenderService(render_seconds=0.01), PageRenderService()
+    endpoints = [await broken.start(), await healthy.start()]
+    config = BatchFetcherConfig(
+        custom_js_service_endpoints=endpoints,
+        custom_js_batch_size=4,
+        custom_js_max_retries=2,
+        custom_js_retry_backoff_seconds=0.3,
+        decodo_enabled=False,
+        pipeline_linger_seconds=0.05,
+        save_outputs=False
+    )
+    pool = ServicePoolManager(endpoints, batch_size=4, rate_limit_window=0)
+    aggregator = ResultAggregator()
+    try:
+        # The healthy service is busy for the first attempts and free for the retries
+        held = await pool.acquire_service(timeout=1, avoid={endpoints[0]})
+        assert held.endpoint == endpoints[1]
+
+        async def release_later():
+            await asyncio.sleep(0.15)
+            await pool.release_service(held)
+
+        release = asyncio.create_task(release_later())
+        pipeline = BatchPipeline(
+            config,
+            aggregator,
+            StandInPhase1(),
+            AsyncMultiServiceJSRenderer(endpoints, batch_size=4, timeout=30, service_pool=pool),
+            ContentAnalyzer(),
+            {url: [] for url in urls}
+        )
+        await asyncio.wait_for(pipeline.run(urls), timeout=10)
+        await release
+        return aggregator.results, broken, healthy
+    finally:
+        await pool.close()
+        await broken.stop()
+        await healthy.stop()
+
+
+def test_pipeline_streams_urls_through_the_tiers():
+    urls = (
+        [f"https://shop.example/{i}/ok" for i in range(3)]
+        + [f"https://shop.example/{i}/js" for i in range(4)]
+        + [f"https://shop.example/{i}/dead" for i in range(2)]
+        + ["https://shop.example/x/slow"]
+    )
+    results, services, phase1, decodo = _run(urls)
+
+    methods = {result["url"]: result["method"] for result in results}
+    assert sorted(methods) == sorted(urls), "every URL gets exactly one result"
+    assert len(results) == len(urls)
+    assert all(result["status"] == "success" for result in results), results
+    for url in urls:
+        expected = "static" if url.endswith("/ok") else "decodo" if url.endswith("/dead") else "custom_js"
+        assert methods[url] == expected, (url, methods[url])
+
+    # No phase barrier: rendering started while the slow URL was still in phase 1
+    first_render = min(service.first_batch_at for service in services if service.first_batch_at)
+    assert first_render < phase1.slow_done_at
+
+    # Each failing URL used its custom JS attempts, retried on another service, then went to Decodo
+    for url in urls[7:9]:
+        rendered_on = [i for i, service in enumerate(services) if url in service.urls_rendered]
+        assert sum(service.urls_rendered.count(url) for service in services) == MAX_RETRIES
+        assert len(rendered_on) >= 2, (url, rendered_on)
+    assert decodo.urls_submitted == 2
+
+
+def test_duplicate_urls_get_a_result_per_copy():
+    urls = [
+        "https://shop.example/1/js", "https://shop.example/1/js",
+        "https://shop.example/2/ok", "https://shop.example/2/ok",
+        "https://shop.example/3/dead", "https://shop.example/3/dead",
+        "https://shop.example/4/js"
+    ]
+    results, services, phase1, decodo = _run(urls)
+    assert sorted(result["url"] for result in results) == sorted(urls)
+    assert all(result["status"] == "success" for result in results), results
+
+
+def test_retry_goes_to_another_service():
+    urls = ["https://shop.example/1/js", "https://shop.example/1/js", "https://shop.example/2/js"]
+    results, broken, healthy = asyncio.run(_retry_routing(urls))
+    # One result per queued copy, each rendered on the retry
+    assert sorted(result["url"] for result in results) == sorted(urls)
+    assert all(result["method"] == "custom_js" and result["status"] == "success" for result in results), results
+    # First attempt on the broken service, the retry on the other one (not the broken one again)
+    assert sorted(broken.urls_rendered) == sorted(set(urls))
+    assert sorted(healthy.urls_rendered) == sorted(set(urls))
+
+
+if __name__ == "__main__":
+    test_pipeline_streams_urls_through_the_tiers()
+    print("✓ URLs streamed through static -> custom JS (other services on retry) -> Decodo")
+    test_duplicate_urls_get_a_result_per_copy()
+    print("✓ URL listed twice got a result per copy")
+    test_retry_goes_to_another_service()
+    print("✓ Failed URL retried on a service that had not tried it")
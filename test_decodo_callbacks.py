@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Test Decodo callback mode against a local stand-in Decodo server.
+
+The stand-in accepts batch submissions, POSTs each finished task to the
+submitted callback_url (if any) and also serves the polling results
+endpoint, so the tests can check that results arrive by callback, that
+polling only catches lost callbacks, and that a callback arriving before
+the submission response is not lost. Callback mode must be refused
+without a token, and only callbacks carrying the token are accepted.
+
+Run directly (python test_decodo_callbacks.py) or with pytest.
+"""
+
+import asyncio
+import itertools
+import time
+from aiohttp import ClientSession, web
+from url_to_html import async_decodo_fallback
+from url_to_html.async_decodo_fallback import AsyncDecodoFallback
+from url_to_html.decodo_callbacks import callback_token_valid, get_callback_router, signed_callback_url
+
+CALLBACK_TOKEN = "test-secret"
+RENDER_SECONDS = 0.2
+
+
+class StandInDecodo:
+    """Minimal Decodo batch/results/callback behaviour on a local port."""
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.tasks = {}
+        self.polls = 0
+        self.callbacks_sent = 0
+        self.urls_submitted = 0
+
+    def _payload(self, task_id: str) -> dict:
+        url = self.tasks[task_id]["url"]
+        return {"id": task_id, "status": "done", "results": [{"content": f"<html>{url}</html>"}]}
+
+    async def _send_callback(self, callback_url: str, task_id: str, delay: float):
+        await asyncio.sleep(delay)
+        self.tasks[task_id]["done"] = True
+        async with ClientSession() as session:
+            async with session.post(callback_url, json=self._payload(task_id)) as response:
+                assert response.status == 200
+        self.callbacks_sent += 1
+
+    async def submit(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        callback_url = body.get("callback_url")
+        self.urls_submitted += len(body["url"])
+        queries = []
+        for url in body["url"]:
+            task_id = f"task-{next(self.ids)}"
+            self.tasks[task_id] = {"url": url, "done": False}
+            queries.append({"id": task_id, "url": url})
+            if "stuck" in url:
+                # Never finishes
+                pass
+            elif "lost" in url or not callback_url:
+                # Never called back: only polling finds it
+                asyncio.get_running_loop().call_later(RENDER_SECONDS, self.tasks[task_id].update, {"done": True})
+            elif "early" in url:
+                # Finished before the submission response is even sent
+                await self._send_callback(callback_url, task_id, 0)
+            else:
+                asyncio.create_task(self._send_callback(callback_url, task_id, RENDER_SECONDS))
+        return web.json_response({"queries": queries})
+
+    async def results(self, request: web.Request) -> web.Response:
+        self.polls += 1
+        task_id = request.match_info["task_id"]
+        if task_id not in self.tasks:
+            return web.Response(status=404)
+        if not self.tasks[task_id]["done"]:
+            return web.Response(status=204)
+        return web.json_response(self._payload(task_id))
+
+
+async def receive_callback(request: web.Request) -> web.Response:
+    """Same checks as the API's /api/v1/decodo/callback route."""
+    if not callback_token_valid(request.query.get("token"), CALLBACK_TOKEN):
+        return web.json_response({"detail": "Invalid callback token"}, status=403)
+    accepted = get_callback_router().deliver(await request.json())
+    return web.json_response({"accepted": accepted})
+
+
+async def _run(urls, callback_poll_interval: float = 5.0):
+    decodo = StandInDecodo()
+    app = web.Application()
+    app.router.add_post("/v2/task/batch", decodo.submit)
+    app.router.add_get("/v2/task/{task_id}/results", decodo.results)
+    app.router.add_post("/callback", receive_callback)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    base = f"http://{host}:{port}"
+
+    saved_token = async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN
+    async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved_token or "test-token"
+    try:
+        # The token is read once, when the fallback is created
+        fallback = AsyncDecodoFallback(
+            timeout=10,
+            api_endpoint=f"{base}/v2/task/batch",
+            results_endpoint=f"{base}/v2/task",
+            callback_url=f"{base}/callback?token={CALLBACK_TOKEN}",
+            callback_poll_interval=callback_poll_interval
+        )
+    finally:
+        async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved_token
+    try:
+        started = time.monotonic()
+        results = await fallback.process_urls(urls)
+        return results, decodo, time.monotonic() - started
+    finally:
+        await runner.cleanup()
+
+
+def test_callbacks_deliver_results_without_polling():
+    urls = [f"https://shop.example/p/{i}" for i in range(10)]
+    results, decodo, elapsed = asyncio.run(_run(urls))
+    assert [r["url"] for r in results] == urls
+    assert all(r["status"] == "success" and r["html"] == f"<html>{r['url']}</html>" for r in results)
+    assert decodo.callbacks_sent == len(urls)
+    assert decodo.polls == 0
+    # Well before the first safety-net poll
+    assert elapsed < 2.0, elapsed
+
+
+def test_lost_callback_is_caught_by_polling():
+    urls = ["https://shop.example/ok", "https://shop.example/lost"]
+    results, decodo, elapsed = asyncio.run(_run(urls, callback_poll_interval=0.5))
+    assert all(r["status"] == "success" for r in results), results
+    assert decodo.polls >= 1
+
+
+def test_callback_before_submission_response_is_kept():
+    urls = ["https://shop.example/early", "https://shop.example/normal"]
+    results, decodo, elapsed = asyncio.run(_run(urls))
+    assert all(r["status"] == "success" for r in results), results
+    assert decodo.polls == 0
+
+
+def test_callback_mode_requires_token():
+    assert signed_callback_url("https://api.example/callback", None) is None
+    assert signed_callback_url("https://api.example/callback?v=1", CALLBACK_TOKEN) == (
+        f"https://api.example/callback?v=1&token={CALLBACK_TOKEN}"
+    )
+    assert not callback_token_valid(CALLBACK_TOKEN, None)
+    assert not callback_token_valid(None, CALLBACK_TOKEN)
+    assert not callback_token_valid("wrong-secret", CALLBACK_TOKEN)
+    assert not callback_token_valid("sécret", CALLBACK_TOKEN)
+    assert callback_token_valid(CALLBACK_TOKEN, CALLBACK_TOKEN)
+
+    # A callback URL from the environment without a token leaves polling on
+    saved = (
+        async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN,
+        async_decodo_fallback.DECODO_CALLBACK_URL,
+        async_decodo_fallback.DECODO_CALLBACK_TOKEN
+    )
+    async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved[0] or "test-token"
+    async_decodo_fallback.DECODO_CALLBACK_URL = "https://api.example/callback"
+    try:
+        async_decodo_fallback.DECODO_CALLBACK_TOKEN = None
+        assert AsyncDecodoFallback().callback_url is None
+        async_decodo_fallback.DECODO_CALLBACK_TOKEN = CALLBACK_TOKEN
+        assert AsyncDecodoFallback().callback_url == f"https://api.example/callback?token={CALLBACK_TOKEN}"
+    finally:
+        (
+            async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN,
+            async_decodo_fallback.DECODO_CALLBACK_URL,
+            async_decodo_fallback.DECODO_CALLBACK_TOKEN
+        ) = saved
+
+
+if __name__ == "__main__":
+    test_callbacks_deliver_results_without_polling()
+    print("✓ Results delivered by callback, no polls")
+    test_lost_callback_is_caught_by_polling()
+    print("✓ Lost callback caught by safety-net polling")
+    test_callback_before_submission_response_is_kept()
+    print("✓ Early callback kept until its task was registered")
+    test_callback_mode_requires_token()
+    print("✓ Callback mode refused without a token, tokens checked in constant time")
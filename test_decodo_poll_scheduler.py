@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test the central Decodo poll scheduler.
+
+Checks are answered by a stand-in check function and the session factory
+returns a stand-in session whose close takes a while, so the tests can
+submit tasks in the window where the scheduler loop is shutting down.
+With completion time history, checks must be placed where tasks finish
+instead of backing off from the first second.
+
+Run directly (python test_decodo_poll_scheduler.py) or with pytest.
+"""
+
+import asyncio
+import time
+from url_to_html import async_decodo_fallback
+from url_to_html.async_decodo_fallback import AsyncDecodoFallback
+from url_to_html.decodo_poll_scheduler import CompletionTimeStats, DecodoPollScheduler
+
+CLOSE_SECONDS = 0.2
+
+
+class SlowClosingSession:
+    """Stands in for aiohttp.ClientSession; closing it takes CLOSE_SECONDS."""
+
+    def __init__(self, opened: list):
+        self.opened = opened
+        self.closing = False
+
+    async def __aenter__(self):
+        self.opened.append(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closing = True
+        await asyncio.sleep(CLOSE_SECONDS)
+
+
+def _scheduler(sessions: list) -> DecodoPollScheduler:
+    async def check(session, task_id, url):
+        return {"url": url, "html": f"<html>{task_id}</html>", "status": "success"}, None
+
+    return DecodoPollScheduler(
+        check=check,
+        session_factory=lambda: SlowClosingSession(sessions),
+        poll_interval=0.01,
+        max_qps=0,
+        completion_stats=CompletionTimeStats()
+    )
+
+
+async def _submit_while_draining():
+    sessions = []
+    scheduler = _scheduler(sessions)
+    first = await scheduler.submit("task-1", "https://shop.example/1")
+    # Let the runner drain and start closing its session, then submit before it has finished
+    await asyncio.sleep(CLOSE_SECONDS / 4)
+    assert sessions[0].closing
+    second = await asyncio.wait_for(scheduler.submit("task-2", "https://shop.example/2"), timeout=5)
+    await scheduler.close()
+    return first, second, sessions
+
+
+def test_submit_while_session_closes_is_not_cancelled():
+    first, second, sessions = asyncio.run(_submit_while_draining())
+    assert first["status"] == "success"
+    assert second["status"] == "success"
+    assert second["html"] == "<html>task-2</html>"
+    # The late task was polled on a new session
+    assert len(sessions) == 2
+
+
+async def _poll_after_close():
+    saved_token = async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN
+    async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved_token or "test-token"
+    try:
+        # Nothing listens there: checks fail (transiently) until the scheduler is closed
+        fallback = AsyncDecodoFallback(timeout=10, poll_interval=5, results_endpoint="http://127.0.0.1:9/v2/task")
+    finally:
+        async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved_token
+    scheduler = fallback._get_poll_scheduler()
+    polling = asyncio.create_task(fallback._poll_tasks({"task-1": "https://shop.example/1"}, ["https://shop.example/1"]))
+    await asyncio.sleep(0.05)
+    await scheduler.close()
+    return await polling
+
+
+def test_cancelled_poll_fails_only_its_url():
+    results = asyncio.run(_poll_after_close())
+    assert [r["url"] for r in results] == ["https://shop.example/1"]
+    assert results[0]["status"] == "failed"
+    assert results[0]["error"] == "CancelledError"
+
+
+FINISH_SECONDS = 1.0
+KEYS = (("shop.example", "universal"), (None, "universal"))
+
+
+async def _checks_until_done(stats: CompletionTimeStats):
+    submitted = {}
+    checked_at = []
+
+    async def check(session, task_id, url):
+        elapsed = time.monotonic() - submitted[task_id]
+        checked_at.append(elapsed)
+        if elapsed < FINISH_SECONDS:
+            return None, None
+        return {"url": url, "html": "<html></html>", "status": "success"}, None
+
+    scheduler = DecodoPollScheduler(
+        check=check,
+        session_factory=lambda: SlowClosingSession([]),
+        poll_interval=0.1,
+        max_qps=0,
+        completion_stats=stats
+    )
+    submitted["task-1"] = time.monotonic()
+    result = await scheduler.submit("task-1", "https://shop.example/1", keys=KEYS)
+    await scheduler.close()
+    return result, checked_at
+
+
+def test_checks_follow_completion_history():
+    learned = CompletionTimeStats(min_samples=5)
+    for seconds in (1.0, 1.05, 1.1, 1.2, 1.3, 1.5, 2.0):
+        learned.record(KEYS, seconds)
+    result, checked_at = asyncio.run(_checks_until_done(learned))
+    assert result["status"] == "success"
+    # First check where the fastest tasks finished, and few after it
+    assert checked_at[0] >= FINISH_SECONDS * 0.95, checked_at
+    assert len(checked_at) <= 2, checked_at
+
+    result, checked_at = asyncio.run(_checks_until_done(CompletionTimeStats(min_samples=5)))
+    assert result["status"] == "success"
+    # No history: checked right away, then backed off from poll_interval
+    assert checked_at[0] < 0.1 and len(checked_at) > 3, checked_at
+
+
+def test_next_check_waits_for_a_share_of_the_remaining_tasks():
+    stats = CompletionTimeStats(min_samples=5)
+    assert stats.next_check_delay(KEYS, 0.0, 0.3) is None
+    for seconds in range(1, 11):
+        stats.record(KEYS[1:], float(seconds))
+    # Domain key has no history: falls back to the target-wide key
+    assert stats.next_check_delay(KEYS, 0.0, 0.3) == 3.0
+    # 30% done after 3s: wait until 30% of the remaining 70% are done too
+    assert stats.next_check_delay(KEYS, 3.0, 0.3) == 3.0
+    assert stats.next_check_delay(KEYS, 10.0, 0.3) is None
+
+
+if __name__ == "__main__":
+    test_submit_while_session_closes_is_not_cancelled()
+    print("✓ Task submitted while the session closed was polled")
+    test_cancelled_poll_fails_only_its_url()
+    print("✓ Cancelled poll failed its URL instead of the whole call")
+    test_checks_follow_completion_history()
+    print("✓ Checks placed by completion time history")
+    test_next_check_waits_for_a_share_of_the_remaining_tasks()
+    print("✓ Next check waits for a share of the remaining tasks")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test chunked Decodo submission against the local stand-in Decodo server.
+
+URLs are submitted in chunks of two. One chunk's first submission fails
+with a 503 and must be retried on its own; a chunk the API rejects with
+a 400 must fail (both its URLs) without being resubmitted. The other chunks must be
+submitted once and succeed.
+
+Run directly (python test_decodo_submission.py) or with pytest.
+"""
+
+import asyncio
+from aiohttp import web
+from url_to_html import async_decodo_fallback
+from url_to_html.async_decodo_fallback import AsyncDecodoFallback
+from test_decodo_callbacks import StandInDecodo
+
+URLS = [
+    "https://shop.example/p/0", "https://shop.example/p/1",
+    "https://shop.example/flaky", "https://shop.example/p/3",
+    "https://shop.example/forbidden", "https://shop.example/p/5",
+]
+
+
+class FlakyDecodo(StandInDecodo):
+    """Stand-in Decodo that fails a chunk's first submission or rejects it outright."""
+
+    def __init__(self):
+        super().__init__()
+        self.submissions = []
+        self.failed_once = False
+
+    async def submit(self, request: web.Request) -> web.Response:
+        urls = (await request.json())["url"]
+        self.submissions.append(list(urls))
+        if any("forbidden" in url for url in urls):
+            return web.json_response({"message": "Invalid request"}, status=400)
+        if any("flaky" in url for url in urls) and not self.failed_once:
+            self.failed_once = True
+            return web.Response(status=503)
+        return await super().submit(request)
+
+
+async def _submit_in_chunks():
+    decodo = FlakyDecodo()
+    app = web.Application()
+    app.router.add_post("/v2/task/batch", decodo.submit)
+    app.router.add_get("/v2/task/{task_id}/results", decodo.results)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    host, port = runner.addresses[0][:2]
+
+    saved_token = async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN
+    async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved_token or "test-token"
+    try:
+        fallback = AsyncDecodoFallback(
+            timeout=10,
+            poll_interval=0.1,
+            api_endpoint=f"http://{host}:{port}/v2/task/batch",
+            results_endpoint=f"http://{host}:{port}/v2/task",
+            submit_chunk_size=2,
+            submit_retries=2
+        )
+    finally:
+        async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved_token
+    try:
+        return await fallback.process_urls(URLS), decodo
+    finally:
+        await runner.cleanup()
+
+
+def test_failed_chunk_is_retried_on_its_own():
+    results, decodo = asyncio.run(_submit_in_chunks())
+    assert [result["url"] for result in results] == URLS
+    status = {result["url"]: result["status"] for result in results}
+    # The rejected chunk fails as a whole; everything else succeeds
+    assert [url for url, outcome in status.items() if outcome != "success"] == URLS[4:6]
+    attempts = {tuple(chunk): decodo.submissions.count(chunk) for chunk in decodo.submissions}
+    # The 503 chunk was sent again alone, the rejected one was not, the rest once
+    assert attempts == {
+        tuple(URLS[0:2]): 1,
+        tuple(URLS[2:4]): 2,
+        tuple(URLS[4:6]): 1,
+    }, attempts
+    assert decodo.urls_submitted == 4
+
+
+if __name__ == "__main__":
+    test_failed_chunk_is_retried_on_its_own()
+    print("✓ Failed chunk retried on its own, rejected chunk not resubmitted")
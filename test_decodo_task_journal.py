@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test crash-safe resume of Decodo tasks through the SQLite task journal.
+
+A first fallback submits URLs to the stand-in Decodo server and is
+cancelled mid-poll (as if the process died). A second fallback sharing
+the journal must reattach to the journaled tasks instead of submitting
+the URLs again, and the journal must be empty once they finish. Tasks
+that are gone or never finish must not stay in the journal, and their
+URLs must be resubmitted rather than waited on again.
+
+Run directly (python test_decodo_task_journal.py) or with pytest.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from aiohttp import web
+from url_to_html import async_decodo_fallback
+from url_to_html.async_decodo_fallback import AsyncDecodoFallback
+from url_to_html.decodo_task_journal import DecodoTaskJournal
+from test_decodo_callbacks import CALLBACK_TOKEN, RENDER_SECONDS, StandInDecodo, receive_callback
+
+URLS = [f"https://shop.example/p/{i}" for i in range(6)]
+
+
+async def _serve(decodo: StandInDecodo):
+    app = web.Application()
+    app.router.add_post("/v2/task/batch", decodo.submit)
+    app.router.add_get("/v2/task/{task_id}/results", decodo.results)
+    app.router.add_post("/callback", receive_callback)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+def _fallback(base: str, journal: DecodoTaskJournal, **options) -> AsyncDecodoFallback:
+    options.setdefault("timeout", 10)
+    options.setdefault("poll_interval", 0.1)
+    return AsyncDecodoFallback(
+        api_endpoint=f"{base}/v2/task/batch",
+        results_endpoint=f"{base}/v2/task",
+        task_journal=journal,
+        **options
+    )
+
+
+async def _resume(journal: DecodoTaskJournal):
+    decodo = StandInDecodo()
+    runner, base = await _serve(decodo)
+    try:
+        # First process: dies after submitting, before the tasks finish
+        try:
+            await asyncio.wait_for(_fallback(base, journal).process_urls(URLS), timeout=RENDER_SECONDS / 2)
+        except asyncio.TimeoutError:
+            pass
+        in_flight_after_crash = journal.in_flight_count()
+        submitted_before_restart = decodo.urls_submitted
+
+        # Second process: same URLs requested again
+        results = await _fallback(base, journal).process_urls(URLS)
+        return results, decodo, in_flight_after_crash, submitted_before_restart
+    finally:
+        await runner.cleanup()
+
+
+async def _dead_task(journal: DecodoTaskJournal):
+    decodo = StandInDecodo()
+    runner, base = await _serve(decodo)
+    try:
+        # Journaled by an earlier process, but Decodo no longer knows the task
+        journal.record_submitted({"task-gone": URLS[0]}, "universal")
+        journal._conn.execute("UPDATE decodo_tasks SET submitted_at = submitted_at - 120")
+        started = time.monotonic()
+        results = await _fallback(base, journal).process_urls(URLS[:1])
+        return results, decodo, time.monotonic() - started
+    finally:
+        await runner.cleanup()
+
+
+async def _given_up(journal: DecodoTaskJournal):
+    decodo = StandInDecodo()
+    runner, base = await _serve(decodo)
+    try:
+        return await _fallback(base, journal, timeout=1).process_urls(["https://shop.example/stuck"])
+    finally:
+        await runner.cleanup()
+
+
+async def _shared_task(journal: DecodoTaskJournal):
+    decodo = StandInDecodo()
+    runner, base = await _serve(decodo)
+    try:
+        def callback_fallback():
+            return _fallback(
+                base, journal,
+                callback_url=f"{base}/callback?token={CALLBACK_TOKEN}",
+                callback_poll_interval=5
+            )
+
+        # Two concurrent requests (each with its own fallback) for the same URL:
+        # the second reattaches to the first one's task
+        first = asyncio.create_task(callback_fallback().process_urls(URLS[:1]))
+        await asyncio.sleep(RENDER_SECONDS / 2)
+        second = asyncio.create_task(callback_fallback().process_urls(URLS[:1]))
+        started = time.monotonic()
+        results = await asyncio.wait_for(asyncio.gather(first, second), timeout=3)
+        return results, decodo, time.monotonic() - started
+    finally:
+        await runner.cleanup()
+
+
+def _run_with_journal(scenario):
+    saved_token = async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN
+    async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved_token or "test-token"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = DecodoTaskJournal(os.path.join(tmp, "decodo_tasks.sqlite3"))
+            try:
+                return asyncio.run(scenario(journal)), journal.in_flight_count()
+            finally:
+                journal.close()
+    finally:
+        async_decodo_fallback.DECODO_BASIC_AUTH_TOKEN = saved_token
+
+
+def test_restart_reattaches_instead_of_resubmitting():
+    (results, decodo, in_flight, submitted), left = _run_with_journal(_resume)
+    assert in_flight == len(URLS)
+    assert submitted == len(URLS)
+    # Nothing submitted again: every URL was reattached to its task
+    assert decodo.urls_submitted == len(URLS)
+    assert [r["url"] for r in results] == URLS
+    assert all(r["status"] == "success" and r["html"] == f"<html>{r['url']}</html>" for r in results)
+    assert left == 0
+
+
+def test_dead_reattached_task_is_resubmitted():
+    (results, decodo, elapsed), left = _run_with_journal(_dead_task)
+    assert results[0]["status"] == "success", results
+    assert decodo.urls_submitted == 1
+    # Not held up for the polling timeout
+    assert elapsed < 5, elapsed
+    assert left == 0
+
+
+def test_given_up_task_leaves_the_journal():
+    results, left = _run_with_journal(_given_up)
+    assert results[0]["status"] == "failed"
+    assert "timeout" in results[0]["error"].lower()
+    assert left == 0
+
+
+def test_concurrent_requests_share_a_task_callback():
+    (results, decodo, elapsed), left = _run_with_journal(_shared_task)
+    assert all(r[0]["status"] == "success" for r in results), results
+    assert decodo.urls_submitted == 1
+    # Both resolved by the one callback, well before the first safety-net poll
+    assert decodo.polls == 0
+    assert elapsed < 2, elapsed
+    assert left == 0
+
+
+def test_expired_tasks_are_not_reattached():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = DecodoTaskJournal(os.path.join(tmp, "decodo_tasks.sqlite3"), max_age=60)
+        try:
+            journal.record_submitted({"t1": "https://a.example/", "t2": "https://b.example/"}, "universal")
+            journal._conn.execute("UPDATE decodo_tasks SET submitted_at = submitted_at - 120 WHERE task_id = 't1'")
+            found = journal.find_in_flight(["https://a.example/", "https://b.example/"], "universal")
+            assert list(found) == ["https://b.example/"]
+            assert journal.find_in_flight(["https://b.example/"], "google") == {}
+            assert journal.prune() == 1
+            journal.remove("t2")
+            assert journal.in_flight_count() == 0
+        finally:
+            journal.close()
+
+
+if __name__ == "__main__":
+    test_restart_reattaches_instead_of_resubmitting()
+    print("✓ Restart reattached to journaled tasks, nothing resubmitted")
+    test_dead_reattached_task_is_resubmitted()
+    print("✓ Task Decodo no longer knows was dropped and its URL resubmitted")
+    test_given_up_task_leaves_the_journal()
+    print("✓ Task polling gave up on was dropped from the journal")
+    test_concurrent_requests_share_a_task_callback()
+    print("✓ Concurrent requests for one task both resolved by its callback")
+    test_expired_tasks_are_not_reattached()
+    print("✓ Expired tasks are resubmitted and pruned")
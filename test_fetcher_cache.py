@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test the cache of Fetcher engines behind fetch_html().
+
+Engines are looked up by a frozen snapshot of their config, so calls
+with the same settings (including settings passed as keyword arguments)
+reuse one engine, and a config changed in place gets a new one.
+
+Run directly (python test_fetcher_cache.py) or with pytest.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from url_to_html import fetcher as fetcher_module
+from url_to_html.fetcher import FetcherConfig, MAX_CACHED_FETCHERS, _get_fetcher, fetch_html
+
+PAGE = (
+    "<html><head><title>Shop</title></head><body>"
+    + "".join(f"<div class='product'><h2>Product {i}</h2><p>{'Well made and in stock. ' * 5}</p></div>" for i in range(40))
+    + "</body></html>"
+).encode()
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+def _engines_used(calls):
+    """Run fetch_html() calls against a local page; return the engines cached afterwards."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    try:
+        for config, kwargs in calls:
+            assert fetch_html(url, config, **kwargs)
+        return list(fetcher_module._fetchers.values())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_equal_settings_share_an_engine():
+    config = FetcherConfig(static_timeout=7, static_headers={"X-Test": "1"})
+    engine = _get_fetcher(config)
+    assert _get_fetcher(FetcherConfig(static_timeout=7, static_headers={"X-Test": "1"})) is engine
+
+
+def test_keyword_arguments_reuse_an_engine():
+    base = FetcherConfig(static_timeout=3, save_outputs=False, enable_logging=False)
+    options = dict(static_timeout=9, static_headers={"X-Test": "2"})
+    engines = _engines_used([(base, options)] * 3)
+    assert sum(1 for engine in engines if engine.config.static_timeout == 9) == 1
+    # The caller's config was not touched
+    assert base.static_timeout == 3 and base.static_headers == {}
+
+
+def test_changed_config_gets_a_new_engine():
+    config = FetcherConfig(static_timeout=11)
+    engine = _get_fetcher(config)
+    config.static_headers["X-Changed"] = "1"
+    changed = _get_fetcher(config)
+    assert changed is not engine
+    # The first engine kept its own copy of the settings
+    assert "X-Changed" not in engine.config.static_headers
+
+
+def test_cache_is_bounded():
+    for timeout in range(100, 100 + MAX_CACHED_FETCHERS * 2):
+        _get_fetcher(FetcherConfig(static_timeout=timeout))
+    assert len(fetcher_module._fetchers) == MAX_CACHED_FETCHERS
+
+
+if __name__ == "__main__":
+    test_equal_settings_share_an_engine()
+    print("✓ Equal settings share an engine")
+    test_keyword_arguments_reuse_an_engine()
+    print("✓ Repeated calls with keyword arguments reused one engine")
+    test_changed_config_gets_a_new_engine()
+    print("✓ Config changed in place got a new engine")
+    test_cache_is_bounded()
+    print("✓ Engine cache is bounded")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Parity test for the single-pass HTML metrics engine.
+
+Checks that html_metrics.collect_metrics() reproduces the BeautifulSoup
+numbers the skeleton heuristics were built on, and that
+ContentAnalyzer.is_skeleton_content() gives the same verdicts as the
+original soup-based implementation, over a corpus of hand-written edge
+cases, synthetic pages and random tag soup.
+
+Run directly (python test_html_metrics.py) or with pytest.
+"""
+
+import random
+from bs4 import BeautifulSoup
+from url_to_html.content_analyzer import ContentAnalyzer, SKELETON_INDICATORS
+from url_to_html.html_metrics import collect_metrics
+
+EDGE_CASES = [
+    "",
+    "plain text only",
+    "<p>hello</p>",
+    "<div> </div><div><!--c--></div><div><span>x</span></div><div></div><div><br></div>",
+    "<p>a<b>b</b></p><div><script>var x = 1;</script></div>",
+    "<img src><img><img src='a.png'/><a href=''>x</a><a>y</a><a HREF='/z'>z</a>",
+    "<div>a</span>b</div>",                      # stray end tag splits the text run
+    "<p>one<p>two<p>three",                      # unclosed, nested paragraphs
+    "<div><p>x</div>y</p>",                      # mis-nested
+    "<br></br><br/>text<img></img>after",         # void elements with end tags
+    "<div><br/>t</div><div><hr></hr></div>",
+    "<style>.loading{}</style><template><p>hidden</p></template><p>shown</p>",
+    "<ruby>漢<rp>(</rp><rt>kan</rt><rp>)</rp></ruby>",
+    "<div>&amp; &nbsp; &#160; &#x41; &#150; &bogus; &#0;</div>",
+    "<div>&nbsp;</div><p>&#32;&#10;</p><section>&NotEqualTilde;</section>",
+    "<!DOCTYPE html><html><head><title>T</title></head><body><article>A</article></body></html>",
+    "<div><![CDATA[ cdata text ]]></div><?php echo 1 ?><div><!----></div>",
+    "<pre>   </pre><textarea>\n</textarea><div>\t\n</div>",
+    "<div/><p/>text<section/>",
+    "<DIV CLASS='Loading'>Skeleton</DIV><Div>Spinner</Div>",
+    "<script>unterminated <div> in script",
+    "<div>unclosed <span>tags <b>everywhere",
+    "<table><tr><td>cell</td><td><div>inner</div></td></tr></table>",
+]
+
+TAGS = ["div", "p", "span", "a", "img", "section", "article", "br", "b",
+        "script", "style", "template", "ul", "li", "hr", "input", "rt"]
+WORDS = ["loading", "product", "price", "shimmer", "Skeleton", "item", "&amp;",
+         "&#160;", " ", "\n", "buy now", "placeholder", "<!-- c -->", "PULSE"]
+
+
+def _random_soup(rng: random.Random, size: int) -> str:
+    """Build random, often malformed, markup."""
+    parts = []
+    for _ in range(size):
+        roll = rng.random()
+        tag = rng.choice(TAGS)
+        if roll < 0.35:
+            attrs = ""
+            if tag == "img" and rng.random() < 0.7:
+                attrs = " src='/i.png'"
+            elif tag == "a" and rng.random() < 0.7:
+                attrs = " href='/p'"
+            elif rng.random() < 0.3:
+                attrs = f" class='{rng.choice(WORDS).strip() or 'x'}'"
+            closer = "/" if rng.random() < 0.05 else ""
+            parts.append(f"<{tag}{attrs}{closer}>")
+        elif roll < 0.6:
+            parts.append(f"</{tag}>")
+        else:
+            parts.append(rng.choice(WORDS))
+    return "".join(parts)
+
+
+def _product_page(rng: random.Random, products: int) -> str:
+    """Build a synthetic listing page."""
+    cards = "".join(
+        f"<div class='product-card'><img src='/p{i}.jpg'><a href='/p/{i}'>"
+        f"<p>Product {i} description text</p></a><span>Rs. {rng.randint(99, 9999)}</span></div>"
+        for i in range(products)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Shop</title>"
+        "<script>window.__STATE__ = {\"loading\": true};</script>"
+        "<style>.skeleton{}</style></head><body><nav><a href='/'>Home</a></nav>"
+        f"<main>{cards}</main>" + "<div class='shimmer'></div>" * rng.randint(0, 40) +
+        "</body></html>"
+    )
+
+
+def _corpus():
+    rng = random.Random(1234)
+    corpus = list(EDGE_CASES)
+    for products in (0, 1, 3, 10, 50):
+        corpus.append(_product_page(rng, products))
+    for _ in range(300):
+        corpus.append(_random_soup(rng, rng.randint(5, 400)))
+    return corpus
+
+
+def _soup_metrics(html_content: str):
+    """Reference metrics computed the original way, from a BeautifulSoup tree."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    text_length = len(soup.get_text(separator=' ', strip=True))
+    meaningful_elements = (
+        len(soup.find_all(['p', 'article', 'section', 'div'], string=True)) +
+        len(soup.find_all('img', src=True)) +
+        len(soup.find_all('a', href=True))
+    )
+    return text_length, meaningful_elements, len(soup.find_all('div'))
+
+
+def _soup_verdict(analyzer: ContentAnalyzer, html_content: str):
+    """Reference is_skeleton_content verdict using the original soup-based heuristics."""
+    if not html_content:
+        return True, "Empty content"
+    content_length = len(html_content)
+    if content_length < analyzer.min_content_length:
+        return True, f"Content too short ({content_length} bytes)"
+    text_length, meaningful_elements, div_count = _soup_metrics(html_content)
+    if text_length < analyzer.min_text_length:
+        return True, f"Text content too short ({text_length} chars)"
+    if meaningful_elements < analyzer.min_meaningful_elements:
+        return True, f"Too few meaningful elements ({meaningful_elements})"
+    markup_length = len(html_content) - text_length
+    if markup_length > 0:
+        ratio = text_length / markup_length
+        effective_threshold = analyzer.text_to_markup_ratio
+        if content_length > 100000:
+            effective_threshold = analyzer.text_to_markup_ratio * 0.5
+        if ratio < effective_threshold and content_length < 50000:
+            return True, f"Low text-to-markup ratio ({ratio:.4f})"
+    html_lower = html_content.lower()
+    skeleton_count = sum(1 for indicator in SKELETON_INDICATORS if indicator in html_lower)
+    if skeleton_count >= 3 and text_length < analyzer.min_text_length * 2:
+        return True, f"Multiple skeleton indicators ({skeleton_count})"
+    if div_count > 20 and text_length < analyzer.min_text_length * 3:
+        return True, f"Layout-heavy, content-light ({div_count} divs, {text_length} chars)"
+    return False, "Valid content"
+
+
+def test_metrics_match_beautifulsoup():
+    for html_content in _corpus():
+        metrics = collect_metrics(html_content)
+        expected = _soup_metrics(html_content)
+        actual = (metrics.text_length, metrics.meaningful_elements, metrics.div_count)
+        assert actual == expected, f"{actual} != {expected} for {html_content[:200]!r}"
+
+
+def test_verdicts_match_beautifulsoup():
+    analyzers = [
+        ContentAnalyzer(parser_backend="html.parser"),
+        ContentAnalyzer(
+            min_content_length=50, min_text_length=20, min_meaningful_elements=2,
+            parser_backend="html.parser"
+        ),
+    ]
+    for analyzer in analyzers:
+        for html_content in _corpus():
+            expected = _soup_verdict(analyzer, html_content)
+            actual = analyzer.is_skeleton_content(html_content)
+            assert actual == expected, f"{actual} != {expected} for {html_content[:200]!r}"
+
+
+if __name__ == "__main__":
+    test_metrics_match_beautifulsoup()
+    print("✓ Metrics match BeautifulSoup")
+    test_verdicts_match_beautifulsoup()
+    print("✓ Verdicts match the soup-based heuristics")
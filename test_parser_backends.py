@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Parity test for the pluggable HTML parser backends.
+
+- The html.parser backend must give exactly the verdicts of the original
+  BeautifulSoup-based ContentAnalyzer checks, on realistic pages and on
+  random tag soup.
+- Every installed fast backend (selectolax, lxml) must agree with it on
+  realistic pages, with metrics within a small tolerance, and backends
+  that "auto" can pick must give its verdicts on tag soup too. Backends
+  that are not installed are skipped.
+
+Run directly (python test_parser_backends.py) or with pytest.
+"""
+
+import json
+import random
+import re
+from bs4 import BeautifulSoup
+from url_to_html import content_analyzer as ca
+from url_to_html.content_analyzer import ContentAnalyzer
+from url_to_html.parser_backends import AUTO_BACKEND_ORDER, available_backends, get_parser_backend
+from test_html_metrics import EDGE_CASES, _product_page, _random_soup, _soup_verdict
+
+# Attribute regexes of the original soup-based checks
+PRODUCT_CLASS_RE = re.compile(r'product|item|listing|card', re.I)
+PRODUCT_ID_RE = re.compile(r'product|item|listing', re.I)
+NAVIGATION_CLASS_RE = re.compile(r'nav|header|menu', re.I)
+LOADING_CLASS_RE = re.compile(r'loading|error|empty|no-results|no-results-found', re.I)
+LOADING_ID_RE = re.compile(r'loading|error|empty|no-results', re.I)
+
+FAST_BACKENDS = [name for name in available_backends() if name != "html.parser"]
+AUTO_FAST_BACKENDS = [name for name in FAST_BACKENDS if name in AUTO_BACKEND_ORDER]
+
+CLASSES = ["product-card", "item", "nav-bar", "menu", "loading", "loading hidden",
+           "error-box", "empty-state", "card", "header", "content", "listing"]
+IDS = ["product-1", "main", "loading", "error", "results", "listing-grid"]
+
+
+def _listing_page(rng: random.Random) -> str:
+    """Build a realistic JS-rendered listing page with random skeleton traits."""
+    parts = ["<!DOCTYPE html><html><head><title>Search</title>"]
+    if rng.random() < 0.3:
+        products = [] if rng.random() < 0.5 else [{"id": 1}]
+        parts.append(f"<script>window.__STATE__ = {json.dumps({'products': products})};</script>")
+    if rng.random() < 0.2:
+        parts.append('<script type="application/json">{"data": {"totalProductsCount": 0}}</script>')
+    parts.append("<style>.loading{display:block}</style></head><body>")
+    if rng.random() < 0.7:
+        parts.append("<header><nav class='main-nav'><a href='/'>Home</a><a href='/c'>Cart</a></nav></header>")
+    if rng.random() < 0.1:
+        parts.append("<p>Sorry, no results found for your search.</p>")
+    if rng.random() < 0.1:
+        parts.append("<p>Oops! Nothing found here.</p>")
+    for _ in range(rng.choice([0, 0, 2, 60])):
+        parts.append("<div class='row'><div class='col'></div></div>")
+    if rng.random() < 0.2:
+        hidden = rng.choice(["", " hidden", "' style='display: none"])
+        parts.append(f"<div class='spinner loading{hidden}'></div>")
+    for i in range(rng.choice([0, 0, 1, 5, 30])):
+        parts.append(
+            f"<div class='product-card' data-product-id='{i}'><img src='/p{i}.jpg'>"
+            f"<a href='/p/{i}'><h3>Product {i}</h3></a><p>Rs. {rng.randint(99, 9999)}</p></div>"
+        )
+    for _ in range(rng.choice([0, 1, 10])):
+        sentences = "Long descriptive paragraph about the catalogue and shipping policy. " * rng.randint(1, 4)
+        parts.append(f"<section><p>{sentences}</p></section>")
+    parts.append("<footer><p>&copy; Shop</p></footer></body></html>")
+    return "".join(parts)
+
+
+def _attribute_soup(rng: random.Random, size: int) -> str:
+    """Random tag soup with the class/id/style attributes the skeleton checks look at."""
+    html_content = _random_soup(rng, size)
+    for tag in ("div", "span", "nav", "article", "header", "section", "li"):
+        html_content = html_content.replace(
+            f"<{tag}>",
+            f"<{tag} class='{rng.choice(CLASSES)}' id='{rng.choice(IDS)}'>",
+            rng.randint(0, 3)
+        )
+    return html_content
+
+
+def _realistic_corpus():
+    rng = random.Random(99)
+    corpus = [_product_page(rng, products) for products in (0, 1, 3, 10, 50)]
+    corpus.extend(_listing_page(rng) for _ in range(200))
+    return corpus
+
+
+def _corpus():
+    rng = random.Random(4321)
+    corpus = list(EDGE_CASES) + _realistic_corpus()
+    corpus.extend(_attribute_soup(rng, rng.randint(5, 400)) for _ in range(300))
+    return corpus
+
+
+def _soup_custom_js_verdict(html_content: str, min_products: int = 1):
+    """Reference is_custom_js_skeleton verdict using the original soup-based checks."""
+    if not html_content:
+        return True, "Empty content"
+    soup = BeautifulSoup(html_content, 'html.parser')
+    html_lower = html_content.lower()
+    for pattern in ca.NO_RESULTS_PATTERNS:
+        if pattern.search(html_lower):
+            return True, "Found 'no results' message"
+    for script in soup.find_all('script'):
+        script_content = script.string or ""
+        if not script_content:
+            continue
+        for pattern in ca.EMPTY_LISTING_PATTERNS:
+            if pattern.search(script_content):
+                return True, "Empty product listing detected"
+        try:
+            json_match = ca._PRODUCTS_JSON_RE.search(script_content)
+            if json_match:
+                data = json.loads(json_match.group(0))
+                if isinstance(data, dict):
+                    for key in ['products', 'items', 'results', 'data']:
+                        if key in data:
+                            value = data[key]
+                            if isinstance(value, list) and len(value) == 0:
+                                return True, f"Empty {key} array in JSON data"
+                            if isinstance(value, dict):
+                                for count_key in ['count', 'total', 'productsCount', 'itemCount', 'totalProductsCount']:
+                                    if count_key in value and value[count_key] == 0:
+                                        return True, f"Zero {count_key} in JSON data"
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    product_elements = set()
+    for indicator_list in (
+        soup.find_all(class_=PRODUCT_CLASS_RE),
+        soup.find_all(id=PRODUCT_ID_RE),
+        soup.find_all('article'),
+        soup.find_all(attrs={'data-product-id': True}),
+        soup.find_all(attrs={'data-item-id': True}),
+    ):
+        # Unique elements (Tag hashes by markup, which would merge identical cards)
+        product_elements.update(id(tag) for tag in indicator_list)
+    has_navigation = (
+        len(soup.find_all(['nav', 'header'])) > 0 or
+        len(soup.find_all(class_=NAVIGATION_CLASS_RE)) > 0
+    )
+    text_content = soup.get_text(separator=' ', strip=True)
+    text_length = len(text_content)
+    if has_navigation and len(product_elements) < min_products:
+        if text_length < 500:
+            return True, "Navigation present but no products and minimal content"
+        if any(phrase in text_content.lower() for phrase in ['no results', 'nothing found', 'try searching', 'oops']):
+            return True, "Navigation present but empty state message detected"
+    structural_elements = len(soup.find_all(['div', 'nav', 'header', 'footer', 'aside']))
+    content_elements = len(soup.find_all(['article', 'section', 'main', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']))
+    if structural_elements > 50 and content_elements < 5 and text_length < 1000:
+        return True, "Structure-heavy but content-light page"
+    loading_indicators = soup.find_all(class_=LOADING_CLASS_RE)
+    loading_indicators.extend(soup.find_all(id=LOADING_ID_RE))
+    for indicator in loading_indicators:
+        style = indicator.get('style', '')
+        classes = ' '.join(indicator.get('class', []))
+        if 'display: none' not in style.lower() and 'hidden' not in classes.lower():
+            return True, "Visible loading/error state detected"
+    return False, "Valid content"
+
+
+def test_unknown_backend_rejected():
+    try:
+        get_parser_backend("html5lib-turbo")
+    except ValueError:
+        return
+    raise AssertionError("unknown backend name was accepted")
+
+
+def test_html_parser_backend_matches_beautifulsoup():
+    analyzer = ContentAnalyzer(parser_backend="html.parser")
+    for html_content in _corpus():
+        assert analyzer.is_skeleton_content(html_content) == _soup_verdict(analyzer, html_content)
+        for min_products in (1, 3):
+            expected = _soup_custom_js_verdict(html_content, min_products)
+            actual = analyzer.is_custom_js_skeleton(html_content, min_products=min_products)
+            assert actual == expected, f"{actual} != {expected} for {html_content[:200]!r}"
+
+
+def test_fast_backends_match_html_parser():
+    reference_backend = get_parser_backend("html.parser")
+    reference = ContentAnalyzer(parser_backend="html.parser")
+    for name in FAST_BACKENDS:
+        backend = get_parser_backend(name)
+        analyzer = ContentAnalyzer(parser_backend=name)
+        for html_content in _realistic_corpus():
+            expected = reference_backend.parse(html_content).metrics
+            actual = backend.parse(html_content).metrics
+            # HTML5 parsers may normalize whitespace and implied elements slightly differently
+            assert abs(actual.text_length - expected.text_length) <= max(5, expected.text_length * 0.02), name
+            assert abs(actual.meaningful_elements - expected.meaningful_elements) <= max(2, expected.meaningful_elements * 0.05), name
+            assert actual.div_count == expected.div_count, name
+
+            assert analyzer.is_skeleton_content(html_content) == reference.is_skeleton_content(html_content), name
+            assert (
+                analyzer.is_custom_js_skeleton(html_content) == reference.is_custom_js_skeleton(html_content)
+            ), f"{name}: {html_content[:200]!r}"
+
+
+def test_auto_backends_match_html_parser_on_tag_soup():
+    reference = ContentAnalyzer(parser_backend="html.parser")
+    for name in AUTO_FAST_BACKENDS:
+        analyzer = ContentAnalyzer(parser_backend=name)
+        for html_content in _corpus():
+            assert (
+                analyzer.is_skeleton_content(html_content)[0] == reference.is_skeleton_content(html_content)[0]
+            ), f"{name}: {html_content[:200]!r}"
+            assert (
+                analyzer.is_custom_js_skeleton(html_content)[0] == reference.is_custom_js_skeleton(html_content)[0]
+            ), f"{name}: {html_content[:200]!r}"
+
+
+def test_processing_instructions_are_not_elements():
+    html_content = "<html><body><?php echo 1 ?><nav>Home</nav><div class='loading'>Hi</div></body></html>"
+    reference = ContentAnalyzer(parser_backend="html.parser")
+    for name in available_backends():
+        analyzer = ContentAnalyzer(parser_backend=name)
+        assert analyzer.is_skeleton_content(html_content)[0] == reference.is_skeleton_content(html_content)[0], name
+        assert analyzer.is_custom_js_skeleton(html_content) == reference.is_custom_js_skeleton(html_content), name
+
+
+if __name__ == "__main__":
+    test_unknown_backend_rejected()
+    test_processing_instructions_are_not_elements()
+    print("✓ Processing instructions parsed by every installed backend")
+    test_html_parser_backend_matches_beautifulsoup()
+    print("✓ html.parser backend matches the soup-based checks")
+    if FAST_BACKENDS:
+        test_fast_backends_match_html_parser()
+        print(f"✓ Fast backends agree with html.parser: {', '.join(FAST_BACKENDS)}")
+        test_auto_backends_match_html_parser_on_tag_soup()
+        print(f"✓ Auto backends agree with html.parser on tag soup: {', '.join(AUTO_FAST_BACKENDS) or 'none installed'}")
+    else:
+        print("- No fast backends installed (pip install lxml selectolax), skipped")
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+Test the custom JS service pool and renderer against local stand-in render services.
+
+Each stand-in answers POST {"urls": [...]} with one NDJSON result line per
+URL, taking RENDER_SECONDS per URL, and records the batches it got. The
+tests cover how the pool hands out, budgets, probes and shares services,
+and how the renderer batches, streams and releases them when a render
+finishes, fails or is abandoned.
+
+Run directly (python test_service_pool.py) or with pytest.
+"""
+
+import asyncio
+import importlib.util
+import json
+import random
+import time
+from typing import Iterator, List, Optional, Tuple
+from aiohttp import web
+from url_to_html.async_multi_service_js_renderer import AsyncMultiServiceJSRenderer
+from url_to_html import service_pool_manager
+from url_to_html.service_pool_manager import ServicePoolManager, ServiceStatus, get_service_pool
+
+RENDER_SECONDS = 0.05
+HANG_SECONDS = 3
+
+
+class StandInRenderService:
+    """Minimal render service on a local port."""
+
+    content_type = "application/x-ndjson"
+
+    def __init__(self, render_seconds: float = RENDER_SECONDS):
+        self.render_seconds = render_seconds
+        self.batch_sizes = []
+        self.urls_rendered = []
+        self.runner = None
+        self.endpoint = None
+
+    def delay(self, url: str) -> float:
+        """Seconds spent rendering one URL."""
+        return self.render_seconds
+
+    def result(self, url: str) -> dict:
+        """Result line for one URL."""
+        return {"url": url, "html": f"<html>{url}</html>", "status": "success"}
+
+    def body(self, urls: List[str]) -> Iterator[Tuple[Optional[str], bytes]]:
+        """Response body in chunks, each with the URL rendered before it is sent (or None)."""
+        for url in urls:
+            yield url, (json.dumps(self.result(url)) + "\n").encode()
+
+    async def render(self, request: web.Request) -> web.StreamResponse:
+        urls = (await request.json())["urls"]
+        self.batch_sizes.append(len(urls))
+        self.urls_rendered.extend(urls)
+        response = web.StreamResponse(headers={"Content-Type": self.content_type})
+        await response.prepare(request)
+        try:
+            for url, chunk in self.body(urls):
+                if url is not None:
+                    await asyncio.sleep(self.delay(url))
+                await response.write(chunk)
+            await response.write_eof()
+        except ConnectionResetError:
+            # The renderer hung up (cancelled or abandoned batch)
+            pass
+        return response
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/render", self.render)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", 0).start()
+        host, port = self.runner.addresses[0][:2]
+        self.endpoint = f"http://{host}:{port}/render"
+        return self.endpoint
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class HangingRenderService(StandInRenderService):
+    """Render service that takes HANG_SECONDS over any URL containing "hang"."""
+
+    def delay(self, url: str) -> float:
+        return HANG_SECONDS if "hang" in url else self.render_seconds
+
+
+class ConnectionRecordingRenderService(StandInRenderService):
+    """Render service that records the client port and body encoding of each batch."""
+
+    def __init__(self, render_seconds: float = RENDER_SECONDS):
+        super().__init__(render_seconds)
+        self.client_ports = []
+        self.encodings = []
+
+    async def render(self, request: web.Request) -> web.StreamResponse:
+        self.client_ports.append(request.transport.get_extra_info("peername")[1])
+        self.encodings.append(request.headers.get("Content-Encoding"))
+        return await super().render(request)
+
+
+class JSONRenderService(StandInRenderService):
+    """Render service answering {"results": [...]} as JSON, written one result at a time."""
+
+    content_type = "application/json"
+
+    def body(self, urls: List[str]) -> Iterator[Tuple[Optional[str], bytes]]:
+        yield None, b'{"results": ['
+        for i, url in enumerate(urls):
+            yield url, (", " if i else "").encode() + json.dumps(self.result(url)).encode()
+        yield None, b"]}"
+
+
+class FaultyBody:
+    """
+    Mixin for render services whose response goes wrong at marked URLs: it
+    breaks off half-way through the result of a URL containing "cut", the
+    result of one containing "garbled" is not JSON, and one containing
+    "skip" is left out.
+    """
+
+    def body(self, urls: List[str]) -> Iterator[Tuple[Optional[str], bytes]]:
+        for url, chunk in super().body(urls):
+            if url and "skip" in url:
+                continue
+            if url and "cut" in url:
+                yield url, chunk[:len(chunk) // 2]
+                return
+            if url and "garbled" in url:
+                chunk = chunk.replace(b'"html": "', b'"html": ')
+            yield url, chunk
+
+
+class FaultyNDJSONRenderService(FaultyBody, StandInRenderService):
+    pass
+
+
+class FaultyJSONRenderService(FaultyBody, JSONRenderService):
+    pass
+
+
+def _assert_all_returned(pool: ServicePoolManager):
+    for service in pool.services:
+        assert service.active_batches == 0, service
+        assert service.status != ServiceStatus.PROCESSING, service
+
+
+async def _cancel_mid_render():
+    services = [StandInRenderService(render_seconds=1.0) for _ in range(2)]
+    endpoints = [await service.start() for service in services]
+    pool = ServicePoolManager(endpoints, batch_size=5, rate_limit_window=0)
+    try:
+        renderer = AsyncMultiServiceJSRenderer(endpoints, batch_size=5, timeout=30, service_pool=pool)
+        render = asyncio.create_task(renderer.process_urls([f"https://shop.example/p/{i}" for i in range(10)]))
+        await asyncio.sleep(0.3)
+        assert all(service.status == ServiceStatus.PROCESSING for service in pool.services)
+        render.cancel()
+        try:
+            await render
+        except asyncio.CancelledError:
+            pass
+        _assert_all_returned(pool)
+        # Both services take the next request's batches at once
+        results = await asyncio.wait_for(
+            renderer.process_urls(["https://shop.example/a", "https://shop.example/b"]), timeout=5
+        )
+        assert all(result["status"] == "success" for result in results), results
+    finally:
+        await pool.close()
+        for service in services:
+            await service.stop()
+
+
+async def _abandon_stream():
+    service = StandInRenderService()
+    endpoint = await service.start()
+    pool = ServicePoolManager([endpoint], batch_size=5, rate_limit_window=0)
+    try:
+        renderer = AsyncMultiServiceJSRenderer([endpoint], batch_size=5, timeout=30, service_pool=pool)
+        stream = renderer.process_as_completed([f"https://shop.example/p/{i}" for i in range(5)])
+        first = await stream.__anext__()
+        assert first[0]["status"] == "success"
+        # The consumer stops after the first page (e.g. the client disconnected)
+        await stream.aclose()
+        _assert_all_returned(pool)
+    finally:
+        await pool.close()
+        await service.stop()
+
+
+class CountingRenderer(AsyncMultiServiceJSRenderer):
+    """Renderer that counts the pages it has decoded."""
+
+    decoded = 0
+
+    async def _iter_response_results(self, response):
+        async for result in super()._iter_response_results(response):
+            self.decoded += 1
+            yield result
+
+
+async def _slow_consumer():
+    service = StandInRenderService(render_seconds=0)
+    endpoint = await service.start()
+    pool = ServicePoolManager([endpoint], batch_size=30, rate_limit_window=0)
+    try:
+        renderer = CountingRenderer([endpoint], batch_size=30, timeout=30, service_pool=pool)
+        consumed = 0
+        most_held = 0
+        async for results in renderer.process_as_completed([f"https://shop.example/p/{i}" for i in range(30)]):
+            consumed += len(results)
+            most_held = max(most_held, renderer.decoded - consumed)
+            await asyncio.sleep(0.01)
+        return consumed, most_held
+    finally:
+        await pool.close()
+        await service.stop()
+
+
+async def _budgeted_batches():
+    service = StandInRenderService()
+    endpoint = await service.start()
+    # 5 URLs per 0.5s: refills during a batch must not be spent as 1-2 URL batches
+    pool = ServicePoolManager([endpoint], batch_size=5, rate_limit_urls=5, rate_limit_window=0.5)
+    try:
+        renderer = AsyncMultiServiceJSRenderer([endpoint], batch_size=5, timeout=30, service_pool=pool)
+        results = await renderer.process_urls([f"https://shop.example/p/{i}" for i in range(20)])
+        assert all(result["status"] == "success" for result in results), results
+        return service.batch_sizes
+    finally:
+        await pool.close()
+        await service.stop()
+
+
+async def _probe_spends_budget():
+    async def healthy(service):
+        return True
+
+    pool = ServicePoolManager(
+        ["http://127.0.0.1:9/render"], batch_size=5, rate_limit_window=100,
+        probe=healthy, probe_backoff_seconds=0.01
+    )
+    try:
+        service = await pool.acquire_service(timeout=1)
+        await pool.mark_service_failed(service)
+        await asyncio.sleep(0.2)
+        return service
+    finally:
+        await pool.close()
+
+
+async def _bisect_timeouts():
+    services = [HangingRenderService(render_seconds=0.01) for _ in range(3)]
+    endpoints = [await service.start() for service in services]
+    pool = ServicePoolManager(endpoints, batch_size=8, rate_limit_window=0)
+    try:
+        renderer = AsyncMultiServiceJSRenderer(endpoints, batch_size=8, timeout=0.5, service_pool=pool)
+        urls = [f"https://shop.example/p/{i}" for i in range(24)]
+        urls[5] = "https://shop.example/hang"
+        started = time.monotonic()
+        results = await renderer.process_urls(urls)
+        return urls, results, time.monotonic() - started
+    finally:
+        await pool.close()
+        for service in services:
+            await service.stop()
+
+
+async def _failed_service_recovers():
+    healthy = False
+    probed_at = []
+
+    async def probe(service):
+        probed_at.append(time.monotonic())
+        return healthy
+
+    pool = ServicePoolManager(
+        ["http://127.0.0.1:9/render"], batch_size=5, rate_limit_window=0,
+        probe=probe, probe_backoff_seconds=0.05, max_probe_backoff_seconds=0.2
+    )
+    try:
+        service = await pool.acquire_service(client="first", timeout=1)
+        await pool.mark_service_failed(service)
+        assert service.breaker_state.value == "open"
+        waiter = asyncio.create_task(pool.acquire_service(client="second", timeout=5))
+        await asyncio.sleep(0.6)
+        assert not waiter.done()
+        failed_probes = len(probed_at)
+        healthy = True
+        recovered = await asyncio.wait_for(waiter, timeout=1)
+        gaps = [later - earlier for earlier, later in zip(probed_at, probed_at[1:])]
+        return service, recovered, failed_probes, gaps
+    finally:
+        await pool.close()
+
+
+async def _picks_by_speed():
+    random.seed(7)
+    pool = ServicePoolManager([f"http://127.0.0.1:{9 + i}/render" for i in range(6)], batch_size=5, rate_limit_window=0)
+    try:
+        # Two services render at 0.5s per URL, four at 5s
+        seconds_per_url = {service.endpoint: 0.5 if i < 2 else 5.0 for i, service in enumerate(pool.services)}
+        for service in pool.services:
+            await pool.record_batch_result(service, 5, 5, seconds_per_url[service.endpoint] * 5)
+        fast_picks = 0
+        for _ in range(600):
+            service = await pool.acquire_service(client="c", timeout=1)
+            fast_picks += seconds_per_url[service.endpoint] < 1
+            await pool.release_service(service)
+        fast = {endpoint for endpoint, seconds in seconds_per_url.items() if seconds < 1}
+        avoided = await pool.acquire_service(client="c", timeout=1, avoid=fast)
+        return fast_picks, avoided.endpoint not in fast
+    finally:
+        await pool.close()
+
+
+async def _keep_alive_batches():
+    service = ConnectionRecordingRenderService(render_seconds=0)
+    endpoint = await service.start()
+    pool = ServicePoolManager([endpoint], batch_size=5, rate_limit_window=0, compress_requests=True)
+    try:
+        renderer = AsyncMultiServiceJSRenderer([endpoint], batch_size=5, timeout=30, service_pool=pool)
+        results = await renderer.process_urls([f"https://shop.example/p/{i}" for i in range(30)])
+        assert all(result["status"] == "success" for result in results), results
+        session = pool.sessions.get_session(endpoint)
+    finally:
+        await pool.close()
+        await service.stop()
+    return service, session
+
+
+async def _private_pool_connections():
+    service = StandInRenderService(render_seconds=0)
+    endpoint = await service.start()
+    urls = [f"https://shop.example/p/{i}" for i in range(10)]
+    try:
+        renderer = AsyncMultiServiceJSRenderer([endpoint], batch_size=5, cooldown_seconds=0, timeout=30)
+        used = renderer.service_pool.sessions.get_session(endpoint)
+        first = await renderer.process_urls(urls)
+        # Released after the render, but the renderer still works
+        released = used.closed
+        second = await renderer.process_urls(urls)
+        async with AsyncMultiServiceJSRenderer([endpoint], batch_size=5, cooldown_seconds=0, timeout=30) as managed:
+            third = await managed.process_urls(urls)
+        assert all(result["status"] == "success" for result in first + second + third)
+        return released, renderer.service_pool.sessions, managed.service_pool
+    finally:
+        await service.stop()
+
+
+async def _handoffs():
+    pool = ServicePoolManager(["http://127.0.0.1:9/render"], batch_size=5, rate_limit_window=0)
+    try:
+        held = await pool.acquire_service(client="greedy", timeout=1)
+        served = []
+
+        async def wait(client):
+            service = await pool.acquire_service(client=client, timeout=5)
+            served.append((client, time.monotonic()))
+            return service
+
+        waiters = [asyncio.create_task(wait("greedy")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        waiters.append(asyncio.create_task(wait("other")))
+        await asyncio.sleep(0.01)
+        released = []
+        for _ in waiters:
+            released.append(time.monotonic())
+            await pool.release_service(held)
+            await asyncio.sleep(0.01)
+            held = next(task.result() for task in waiters if task.done() and task.result() is held)
+        handoff_delays = [at - released[i] for i, (_, at) in enumerate(served)]
+
+        # A service in cooldown wakes its waiter when the cooldown ends, not on a polling tick
+        await pool.mark_service_cooldown(held, cooldown_seconds=0.2)
+        started = time.monotonic()
+        await pool.acquire_service(client="other", timeout=5)
+        return [client for client, _ in served], handoff_delays, time.monotonic() - started
+    finally:
+        await pool.close()
+
+
+async def _batches_by_speed():
+    fast, slow = StandInRenderService(render_seconds=0.005), StandInRenderService(render_seconds=0.03)
+    endpoints = [await fast.start(), await slow.start()]
+    pool = ServicePoolManager(endpoints, batch_size=10, rate_limit_window=0)
+    try:
+        # 10 slow URLs take 0.3s: twice the target once its speed is known
+        renderer = AsyncMultiServiceJSRenderer(
+            endpoints, batch_size=10, timeout=30, target_batch_seconds=0.15, service_pool=pool
+        )
+        results = await renderer.process_urls([f"https://shop.example/p/{i}" for i in range(300)])
+        assert all(result["status"] == "success" for result in results), results
+        return fast.batch_sizes, slow.batch_sizes
+    finally:
+        await pool.close()
+        await fast.stop()
+        await slow.stop()
+
+
+async def _shared_pools():
+    endpoints = ["http://127.0.0.1:9/render", "http://127.0.0.1:10/render"]
+    pool = get_service_pool(endpoints, batch_size=5, cooldown_seconds=60)
+    reordered = get_service_pool(list(reversed(endpoints)), batch_size=5, cooldown_seconds=60)
+    other_batch_size = get_service_pool(endpoints, batch_size=10, cooldown_seconds=60)
+    try:
+        get_service_pool(endpoints, batch_size=5, cooldown_seconds=10)
+        conflict = None
+    except ValueError as e:
+        conflict = str(e)
+    other_services = get_service_pool(endpoints[:1], batch_size=5, cooldown_seconds=10)
+    sessions = [shared.sessions.get_session(endpoints[0]) for shared in (pool, other_services)]
+    return pool, [reordered, other_batch_size], conflict, other_services, sessions
+
+
+async def _decode(service: StandInRenderService, urls: List[str], stream_results: bool = True):
+    endpoint = await service.start()
+    pool = ServicePoolManager([endpoint], batch_size=len(urls), rate_limit_window=0)
+    try:
+        renderer = AsyncMultiServiceJSRenderer(
+            [endpoint], batch_size=len(urls), timeout=30, service_pool=pool, stream_results=stream_results
+        )
+        started = time.monotonic()
+        first_result_after = None
+        results = []
+        async for decoded in renderer.process_as_completed(urls):
+            if first_result_after is None:
+                first_result_after = time.monotonic() - started
+            results.extend(decoded)
+        _assert_all_returned(pool)
+        return results, first_result_after
+    finally:
+        await pool.close()
+        await service.stop()
+
+
+def test_timed_out_batch_is_bisected_to_the_slow_url():
+    urls, results, elapsed = asyncio.run(_bisect_timeouts())
+    assert [result["url"] for result in results] == urls
+    failed = [result for result in results if result["status"] != "success"]
+    # Only the hanging URL failed, flagged for the slow lane; its batch mates were re-rendered
+    assert [result["url"] for result in failed] == ["https://shop.example/hang"], failed
+    assert failed[0].get("slow_lane") is True
+    assert elapsed < HANG_SECONDS, elapsed
+
+
+def test_failed_service_is_probed_and_readmitted():
+    service, recovered, failed_probes, gaps = asyncio.run(_failed_service_recovers())
+    # The waiting client got the service as soon as a probe passed
+    assert recovered is service
+    assert service.breaker_state.value == "closed"
+    # Probes backed off (doubling, capped at max_probe_backoff_seconds) instead of hammering it
+    assert 2 <= failed_probes <= 5, failed_probes
+    assert gaps[1] > gaps[0] * 1.5, gaps
+    assert max(gaps) < 0.35, gaps
+
+
+def test_fast_services_are_preferred():
+    fast_picks, avoided = asyncio.run(_picks_by_speed())
+    # Uniform picks would give the two fast services a third of the batches;
+    # two random choices keeping the faster one gives them 60%
+    assert fast_picks > 600 * 0.5, fast_picks
+    assert avoided
+
+
+def test_batches_reuse_one_keep_alive_connection():
+    service, session = asyncio.run(_keep_alive_batches())
+    assert service.batch_sizes == [5] * 6
+    # Every batch went over the same connection, with a gzipped body
+    assert len(set(service.client_ports)) == 1, service.client_ports
+    assert service.encodings == ["gzip"] * 6, service.encodings
+    assert session.closed
+
+
+def test_private_pool_connections_are_released():
+    released, sessions, managed_pool = asyncio.run(_private_pool_connections())
+    assert released
+    assert sessions._sessions == {}
+    # async with closed the pool itself
+    assert managed_pool.sessions._sessions == {} and managed_pool._timer is None
+
+
+def test_free_service_is_handed_over_in_turn():
+    order, handoff_delays, cooldown_wait = asyncio.run(_handoffs())
+    # The client that queued three requests does not starve the one that queued one
+    assert order == ["greedy", "other", "greedy", "greedy"], order
+    assert max(handoff_delays) < 0.05, handoff_delays
+    assert 0.19 <= cooldown_wait < 0.3, cooldown_wait
+
+
+def test_batches_are_sized_per_service():
+    fast, slow = asyncio.run(_batches_by_speed())
+    # Sized from its EWMA seconds per URL after the first batch, to stay within target_batch_seconds
+    assert len(slow) >= 2, slow
+    assert max(slow[1:]) <= 5, slow
+    # The fast service keeps full batches up to the tail
+    assert all(size == 10 for size in fast[:-2]), fast
+    assert sum(fast) > sum(slow)
+
+
+def test_one_shared_pool_per_set_of_services():
+    pool, same_services, conflict, other_services, sessions = asyncio.run(_shared_pools())
+    # Batch sizes are per request: the same services share one pool whatever the batch size
+    assert all(shared is pool for shared in same_services)
+    assert pool.cooldown_seconds == 60
+    # Conflicting pool-wide settings are rejected rather than split into a second pool
+    assert conflict and "cooldown_seconds=10" in conflict, conflict
+    assert other_services is not pool
+    # asyncio.run() shut the loop down: its pools were closed and dropped
+    assert all(session.closed for session in sessions)
+    assert service_pool_manager._shared_pools == {}
+
+
+def test_cancelled_render_returns_services():
+    asyncio.run(_cancel_mid_render())
+
+
+def test_abandoned_stream_returns_service():
+    asyncio.run(_abandon_stream())
+
+
+def test_slow_consumer_holds_back_decoding():
+    consumed, most_held = asyncio.run(_slow_consumer())
+    assert consumed == 30
+    # One page in the queue and one waiting to be put, not the whole batch
+    assert most_held <= 2, most_held
+
+
+def test_budget_refills_into_full_batches():
+    assert asyncio.run(_budgeted_batches()) == [5, 5, 5, 5]
+
+
+def test_probe_render_spends_budget():
+    service = asyncio.run(_probe_spends_budget())
+    # Re-admitted by the probe, but one token short of a batch
+    assert service.breaker_state.value == "closed"
+    assert service.tokens < 4.1
+    assert service.status == ServiceStatus.COOLDOWN
+
+
+def _succeeded(results: List[dict], urls: List[str]) -> List[str]:
+    # Every URL of the batch got exactly one result
+    assert sorted(result["url"] for result in results) == sorted(urls), results
+    return [result["url"] for result in results if result["status"] == "success"]
+
+
+def test_results_are_decoded_as_they_stream_in():
+    urls = [f"https://shop.example/p/{i}" for i in range(3)]
+    formats = [(StandInRenderService, True, True), (JSONRenderService, False, False)]
+    if importlib.util.find_spec("ijson"):
+        formats.append((JSONRenderService, True, True))
+    for service_class, stream_results, incremental in formats:
+        results, first_result_after = asyncio.run(_decode(service_class(render_seconds=0.3), urls, stream_results))
+        assert _succeeded(results, urls) == urls, (service_class, stream_results)
+        # Streamed: the first page comes out after one URL's render time, not the whole body's
+        assert (first_result_after < 0.6) == incremental, (service_class, stream_results, first_result_after)
+
+
+def test_broken_responses_still_answer_every_url():
+    for service_class, stream_results in [
+        (FaultyNDJSONRenderService, True), (FaultyJSONRenderService, True), (FaultyJSONRenderService, False)
+    ]:
+        streamed = stream_results and (
+            service_class is FaultyNDJSONRenderService or importlib.util.find_spec("ijson") is not None
+        )
+        for fault in ["cut", "garbled", "skip"]:
+            urls = ["https://shop.example/p/0", f"https://shop.example/p/1-{fault}", "https://shop.example/p/2"]
+            results, _ = asyncio.run(_decode(service_class(), urls, stream_results))
+            if fault == "skip":
+                expected = [urls[0], urls[2]]
+            else:
+                # Pages decoded before the fault are kept when the body is streamed
+                expected = urls[:1] if streamed else []
+            assert _succeeded(results, urls) == expected, (service_class, stream_results, fault, results)
+
+
+if __name__ == "__main__":
+    test_cancelled_render_returns_services()
+    print("✓ Cancelled render handed its services back")
+    test_abandoned_stream_returns_service()
+    print("✓ Abandoned result stream handed its service back")
+    test_slow_consumer_holds_back_decoding()
+    print("✓ Slow consumer held back page decoding")
+    test_budget_refills_into_full_batches()
+    print("✓ Token budget refilled into full batches")
+    test_probe_render_spends_budget()
+    print("✓ Probe render spent a token")
+    test_timed_out_batch_is_bisected_to_the_slow_url()
+    print("✓ Timed-out batch bisected down to its slow URL")
+    test_failed_service_is_probed_and_readmitted()
+    print("✓ Failed service probed with backoff and re-admitted to a waiting client")
+    test_fast_services_are_preferred()
+    print("✓ Faster services picked more often, avoided ones passed over")
+    test_batches_reuse_one_keep_alive_connection()
+    print("✓ Batches reused one keep-alive connection with gzipped bodies")
+    test_private_pool_connections_are_released()
+    print("✓ Renderer with its own pool released its connections")
+    test_free_service_is_handed_over_in_turn()
+    print("✓ Freed service handed to waiting clients in turn, without polling")
+    test_batches_are_sized_per_service()
+    print("✓ Slow service got batches sized to its speed, fast one full batches")
+    test_one_shared_pool_per_set_of_services()
+    print("✓ One shared pool per set of services, closed with its loop")
+    test_results_are_decoded_as_they_stream_in()
+    print("✓ NDJSON and JSON results decoded as they streamed in")
+    test_broken_responses_still_answer_every_url()
+    print("✓ Cut-off, malformed and incomplete responses still answered every URL")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test the keep-alive session pool of the synchronous fetch tiers.
+
+A local stand-in site sets a cookie on every response and records the
+Cookie header it receives: pooled sessions must never send a cookie
+back, and the pool must close the least recently used host's session
+once it holds max_hosts sessions.
+
+Run directly (python test_session_pool.py) or with pytest.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from url_to_html.session_pool import SessionPool
+
+
+class CookieSettingHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.cookies_received.append(self.headers.get("Cookie"))
+        self.send_response(200)
+        self.send_header("Set-Cookie", "session=visitor-1; Path=/")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_site() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CookieSettingHandler)
+    server.cookies_received = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _stop_site(server: ThreadingHTTPServer):
+    server.shutdown()
+    server.server_close()
+
+
+def test_cookies_are_not_persisted():
+    site = _start_site()
+    pool = SessionPool()
+    url = f"http://127.0.0.1:{site.server_address[1]}/"
+    try:
+        for _ in range(3):
+            assert pool.get(url, timeout=5).status_code == 200
+        assert site.cookies_received == [None, None, None]
+        assert len(pool.get_session(url).cookies) == 0
+        # Cookies passed with a request are still sent
+        pool.get(url, timeout=5, cookies={"consent": "yes"})
+        assert site.cookies_received[-1] == "consent=yes"
+    finally:
+        pool.close()
+        _stop_site(site)
+
+
+def test_least_recently_used_host_is_closed():
+    sites = [_start_site() for _ in range(3)]
+    urls = [f"http://127.0.0.1:{site.server_address[1]}/" for site in sites]
+    pool = SessionPool(max_hosts=2)
+    try:
+        first = pool.get_session(urls[0])
+        second = pool.get_session(urls[1])
+        assert pool.get(urls[1], timeout=5).status_code == 200
+        assert any(adapter.poolmanager.pools for adapter in second.adapters.values())
+        assert pool.get(urls[0], timeout=5).status_code == 200
+        # Third host: the second (least recently used) is closed, the first kept
+        pool.get_session(urls[2])
+        assert pool.get_session(urls[0]) is first
+        assert len(pool._sessions) == 2
+        assert all(not adapter.poolmanager.pools for adapter in second.adapters.values())
+        assert pool.get_session(urls[1]) is not second
+    finally:
+        pool.close()
+        for site in sites:
+            _stop_site(site)
+
+
+if __name__ == "__main__":
+    test_cookies_are_not_persisted()
+    print("✓ Pooled sessions did not send cookies back")
+    test_least_recently_used_host_is_closed()
+    print("✓ Least recently used host's session was closed")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test the async static/XHR processor against a local stand-in site.
+
+Every request to the site takes RESPONSE_SECONDS and returns a skeleton
+page, so no XHR candidate wins the race and all of them run, up to
+xhr_max_parallel at a time. With a request timeout of a few response
+times, a candidate only gets its response in time if it does not queue
+for a connection behind the other candidates of its URL.
+
+Run directly (python test_static_xhr_processor.py) or with pytest.
+"""
+
+import asyncio
+from aiohttp import web
+from url_to_html.async_static_xhr_processor import AsyncStaticXHRProcessor
+from url_to_html.xhr_pattern_index import generate_api_candidates
+
+RESPONSE_SECONDS = 0.3
+SKELETON = "<html><body><div id='root'></div></body></html>"
+
+
+async def slow_page(request: web.Request) -> web.Response:
+    await asyncio.sleep(RESPONSE_SECONDS)
+    return web.Response(text=SKELETON, content_type="text/html")
+
+
+class StatusRecordingProcessor(AsyncStaticXHRProcessor):
+    """AsyncStaticXHRProcessor that records the status each XHR candidate got (0: no response)."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.candidate_statuses = {}
+
+    async def _fetch_xhr_candidate(self, session, endpoint, headers, semaphore):
+        content, status = await super()._fetch_xhr_candidate(session, endpoint, headers, semaphore)
+        self.candidate_statuses[endpoint] = status
+        return content, status
+
+
+async def _xhr_candidates_in_parallel():
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", slow_page)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    host, port = runner.addresses[0][:2]
+    url = f"http://{host}:{port}/p/1"
+    try:
+        processor = StatusRecordingProcessor(timeout=1, max_concurrent=1, xhr_max_parallel=4)
+        results = await processor.process_batch([url], start_tiers={url: "xhr"})
+        return url, results, processor.candidate_statuses
+    finally:
+        await runner.cleanup()
+
+
+def test_xhr_candidates_do_not_queue_for_connections():
+    url, results, statuses = asyncio.run(_xhr_candidates_in_parallel())
+    assert results[0]["needs_js"]
+    # The page and every generated endpoint were answered; none timed out waiting for a connection
+    assert len(statuses) == 1 + len(generate_api_candidates(url))
+    assert set(statuses.values()) == {200}, statuses
+
+
+if __name__ == "__main__":
+    test_xhr_candidates_do_not_queue_for_connections()
+    print("✓ XHR candidates of a URL got their own connections")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Test learned tier routing.
+
+Unit checks of TierRouter.choose_start_tier() (skipping only tiers with
+enough failing samples, never the last tier, exploration, fading old
+outcomes, persistence, flushing at exit), then a Fetcher against a
+local stand-in site whose page is a skeleton for plain requests: once
+static fetches keep failing on the domain, fetches must start at the
+XHR tier.
+
+Run directly (python test_tier_router.py) or with pytest.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from url_to_html.fetcher import Fetcher, FetcherConfig
+from url_to_html.tier_router import BATCH_TIERS, SYNC_TIERS, TierRouter, get_tier_router
+
+URL = "https://shop.example/p/1"
+
+FULL_PAGE = (
+    "<html><head><title>Shop</title></head><body>"
+    + "".join(f"<div class='product'><h2>Product {i}</h2><p>{'Well made and in stock. ' * 5}</p></div>" for i in range(40))
+    + "</body></html>"
+)
+SKELETON_PAGE = "<html><body><div id='root'></div></body></html>"
+
+
+def _router(tmp: str, **options) -> TierRouter:
+    options.setdefault("exploration_rate", 0)
+    return TierRouter(os.path.join(tmp, "tiers.sqlite3"), **options)
+
+
+def _record(router: TierRouter, tier: str, successes: int, failures: int, url: str = URL):
+    for _ in range(successes):
+        router.record(url, tier, True)
+    for _ in range(failures):
+        router.record(url, tier, False)
+
+
+def test_failing_tiers_are_skipped_after_enough_samples():
+    with tempfile.TemporaryDirectory() as tmp:
+        router = _router(tmp, min_samples=10, skip_below=0.1)
+        try:
+            _record(router, "static", 0, 9)
+            assert router.choose_start_tier(URL) == "static"
+            _record(router, "static", 0, 1)
+            assert router.choose_start_tier(URL) == "xhr"
+            # www. is the same domain; other domains are unaffected
+            assert router.choose_start_tier("https://www.shop.example/p/2") == "xhr"
+            assert router.choose_start_tier("https://other.example/p/1") == "static"
+            # A tier that works now and then is kept
+            _record(router, "xhr", 2, 8)
+            assert router.choose_start_tier(URL) == "xhr"
+        finally:
+            router.close()
+
+
+def test_last_tier_is_never_skipped():
+    with tempfile.TemporaryDirectory() as tmp:
+        router = _router(tmp, min_samples=5)
+        try:
+            for tier in BATCH_TIERS:
+                _record(router, tier, 0, 5)
+            assert router.choose_start_tier(URL, BATCH_TIERS) == "decodo"
+            _record(router, "js", 0, 5)
+            assert router.choose_start_tier(URL, SYNC_TIERS) == "js"
+        finally:
+            router.close()
+
+
+def test_exploration_starts_at_the_first_tier():
+    with tempfile.TemporaryDirectory() as tmp:
+        router = _router(tmp, min_samples=5, exploration_rate=1)
+        try:
+            _record(router, "static", 0, 20)
+            assert router.choose_start_tier(URL) == "static"
+        finally:
+            router.close()
+
+
+def test_old_outcomes_fade():
+    with tempfile.TemporaryDirectory() as tmp:
+        router = _router(tmp, min_samples=10, skip_below=0.1, window=40)
+        try:
+            _record(router, "static", 0, 40)
+            assert router.choose_start_tier(URL) == "xhr"
+            # The site stopped blocking static fetches: the halved history lets them back in
+            router.record_path(URL, ["static"], True)
+            _record(router, "static", 2, 0)
+            assert router.choose_start_tier(URL) == "static"
+        finally:
+            router.close()
+
+
+def test_stats_survive_a_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        router = _router(tmp, min_samples=5)
+        router.record_path(URL, ["static", "xhr", "custom_js"], True)
+        _record(router, "static", 0, 4)
+        router.close()
+        reopened = _router(tmp, min_samples=5)
+        try:
+            assert reopened.choose_start_tier(URL) == "xhr"
+        finally:
+            reopened.close()
+
+
+def test_shared_router_is_flushed_at_exit():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tiers.sqlite3")
+        # Fewer outcomes than a flush interval's worth: only the exit hook writes them
+        script = (
+            "from url_to_html.tier_router import get_tier_router\n"
+            f"router = get_tier_router({path!r}, exploration_rate=0)\n"
+            "router.flush_interval = 3600\n"
+            "router.record_path({url!r}, ['static', 'xhr', 'custom_js'], True)\n"
+            "for _ in range(4):\n"
+            "    router.record({url!r}, 'static', False)\n"
+        ).replace("{url!r}", repr(URL))
+        subprocess.run([sys.executable, "-c", script], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        reopened = _router(tmp, min_samples=5)
+        try:
+            assert reopened.choose_start_tier(URL) == "xhr"
+        finally:
+            reopened.close()
+
+
+class SkeletonHandler(BaseHTTPRequestHandler):
+    """Skeleton page for plain requests, full page from the API endpoint."""
+
+    def do_GET(self):
+        xhr = self.headers.get("X-Requested-With") == "XMLHttpRequest"
+        self.server.requested.append(("xhr" if xhr else "static", self.path))
+        if self.path == "/p/1":
+            self._send(SKELETON_PAGE)
+        elif self.path == "/api/p/1":
+            self._send(FULL_PAGE)
+        else:
+            self.send_error(404)
+
+    def _send(self, page: str):
+        body = page.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_fetcher_starts_at_the_learned_tier():
+    site = ThreadingHTTPServer(("127.0.0.1", 0), SkeletonHandler)
+    site.requested = []
+    threading.Thread(target=site.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{site.server_address[1]}/p/1"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config = FetcherConfig(
+                tier_stats_path=os.path.join(tmp, "tiers.sqlite3"),
+                tier_exploration_rate=0,
+                save_outputs=False
+            )
+            fetcher = Fetcher(config)
+            router = get_tier_router(config.tier_stats_path)
+            try:
+                for _ in range(router.min_samples):
+                    assert fetcher.fetch(url) == FULL_PAGE
+                assert ("static", "/p/1") in site.requested
+                site.requested.clear()
+                assert fetcher.fetch(url) == FULL_PAGE
+                # Static fetch skipped: every request came from the XHR tier
+                assert site.requested and all(kind == "xhr" for kind, _ in site.requested), site.requested
+            finally:
+                router.close()
+    finally:
+        site.shutdown()
+        site.server_close()
+
+
+if __name__ == "__main__":
+    test_failing_tiers_are_skipped_after_enough_samples()
+    print("✓ Tier skipped once enough samples show it failing")
+    test_last_tier_is_never_skipped()
+    print("✓ Last tier never skipped")
+    test_exploration_starts_at_the_first_tier()
+    print("✓ Exploration started at the first tier")
+    test_old_outcomes_fade()
+    print("✓ Old outcomes faded and a recovered tier came back")
+    test_stats_survive_a_restart()
+    print("✓ Tier stats persisted across a restart")
+    test_shared_router_is_flushed_at_exit()
+    print("✓ Shared router flushed at interpreter exit")
+    test_fetcher_starts_at_the_learned_tier()
+    print("✓ Fetcher started at the learned tier")
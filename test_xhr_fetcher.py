@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test XHR candidate racing against a local stand-in site.
+
+The original URL answers 200 but trickles its body forever, one API
+endpoint serves a skeleton page and another the full page. The full page
+must win without waiting for the trickling response, whose connection
+must be dropped rather than read to the end, candidates must be
+validated on the fetch threads, and candidates queued behind the winner
+must never be requested.
+
+Run directly (python test_xhr_fetcher.py) or with pytest.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from url_to_html import xhr_fetcher
+from url_to_html.content_analyzer import ContentAnalyzer
+from url_to_html.session_pool import SessionPool
+from url_to_html.xhr_fetcher import XHRFetcher, get_xhr_executor, shutdown_xhr_executor
+
+FULL_PAGE = (
+    "<html><head><title>Shop</title></head><body>"
+    + "".join(f"<div class='product'><h2>Product {i}</h2><p>{'Well made and in stock. ' * 5}</p></div>" for i in range(40))
+    + "</body></html>"
+)
+SKELETON_PAGE = "<html><body><div id='root'></div></body></html>"
+TRICKLE_SECONDS = 10
+
+
+class StandInSite(ThreadingHTTPServer):
+    """Site whose page and API endpoints behave as described above."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.requested = []
+        self.trickle_dropped = threading.Event()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def page_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/p/1"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requested.append(self.path)
+        if self.path == "/p/1":
+            self._trickle()
+        elif self.path == "/api/p/1":
+            time.sleep(0.05)
+            self._send(SKELETON_PAGE)
+        elif self.path == "/api/v1/p/1":
+            time.sleep(0.1)
+            self._send(FULL_PAGE)
+        else:
+            self.send_error(404)
+
+    def _send(self, page: str):
+        body = page.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _trickle(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        deadline = time.monotonic() + TRICKLE_SECONDS
+        try:
+            while time.monotonic() < deadline:
+                self.wfile.write(b"<p>loading</p>" * 100)
+                self.wfile.flush()
+                time.sleep(0.05)
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.trickle_dropped.set()
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadRecordingAnalyzer(ContentAnalyzer):
+    """ContentAnalyzer that records the threads it runs on."""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def should_fallback(self, html_content, status_code):
+        self.threads.append(threading.current_thread().name)
+        return super().should_fallback(html_content, status_code)
+
+
+def test_winner_cancels_the_race():
+    site = StandInSite()
+    pool = SessionPool()
+    analyzer = ThreadRecordingAnalyzer()
+    try:
+        fetcher = XHRFetcher(timeout=30, session_pool=pool, max_parallel=2, content_analyzer=analyzer)
+        started = time.monotonic()
+        content, status, verdict = fetcher.fetch_validated(site.page_url)
+        elapsed = time.monotonic() - started
+        assert status == 200 and content == FULL_PAGE
+        assert verdict is not None and not verdict[0]
+        assert elapsed < 2, elapsed
+        # The trickling original response was hung up on, not read to the end
+        assert site.trickle_dropped.wait(2)
+        # Skeleton and full page were both validated off the calling thread
+        assert len(analyzer.threads) == 2
+        assert all(name.startswith("xhr-fetch") for name in analyzer.threads), analyzer.threads
+        # Two candidates in flight at a time: nothing queued after the winner was requested
+        assert "/p/1.json" not in site.requested, site.requested
+    finally:
+        pool.close()
+        site.stop()
+
+
+def test_fetchers_share_one_executor():
+    first = XHRFetcher(max_parallel=2, session_pool=SessionPool())
+    second = XHRFetcher(max_parallel=8, session_pool=SessionPool())
+    assert first._executor is second._executor is get_xhr_executor()
+    assert first._executor._max_workers == xhr_fetcher.XHR_EXECUTOR_WORKERS
+    shutdown_xhr_executor()
+    assert get_xhr_executor() is not first._executor
+    # The shut down pool no longer takes work
+    try:
+        first._executor.submit(time.time)
+        assert False, "shut down executor still accepts work"
+    except RuntimeError:
+        pass
+
+
+if __name__ == "__main__":
+    test_winner_cancels_the_race()
+    print("✓ Full page won, trickling loser was hung up on, candidates validated on fetch threads")
+    test_fetchers_share_one_executor()
+    print("✓ XHR fetchers share one bounded executor that shuts down")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test the learned per-domain XHR endpoint pattern index.
+
+Unit checks of which candidates select() keeps (proven patterns only,
+failing patterns skipped, exploration, persistence), then a race against
+the stand-in site from test_xhr_fetcher.py: once a domain's working
+endpoint is known, later fetches must only probe it.
+
+Run directly (python test_xhr_pattern_index.py) or with pytest.
+"""
+
+import os
+import tempfile
+from url_to_html.content_analyzer import ContentAnalyzer
+from url_to_html.session_pool import SessionPool
+from url_to_html.xhr_fetcher import XHRFetcher
+from url_to_html.xhr_pattern_index import XHRPatternIndex, generate_api_candidates
+from test_xhr_fetcher import FULL_PAGE, StandInSite
+
+URL = "https://shop.example/p/1"
+
+
+def _keys(candidates):
+    return [key for key, _ in candidates]
+
+
+def test_only_proven_patterns_are_probed():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = XHRPatternIndex(os.path.join(tmp, "patterns.sqlite3"), exploration_rate=0)
+        try:
+            candidates = generate_api_candidates(URL)
+            # Nothing known about the domain: probe everything
+            assert index.select(URL, candidates) == candidates
+            index.record(URL, "api_v2", True)
+            index.record(URL, "api", False)
+            # www. is the same domain
+            assert _keys(index.select("https://www.shop.example/p/2", generate_api_candidates(URL))) == ["api_v2"]
+            # Another domain is unaffected
+            other = generate_api_candidates("https://other.example/p/1")
+            assert index.select("https://other.example/p/1", other) == other
+        finally:
+            index.close()
+
+
+def test_failing_patterns_are_skipped():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = XHRPatternIndex(os.path.join(tmp, "patterns.sqlite3"), exploration_rate=0, max_failures=3)
+        try:
+            for _ in range(3):
+                index.record(URL, "json", False)
+            for _ in range(2):
+                index.record(URL, "data", False)
+            # Skipped even while nothing on the domain has worked yet
+            keys = _keys(index.select(URL, generate_api_candidates(URL)))
+            assert "json" not in keys and "data" in keys
+            # A success resets the streak
+            index.record(URL, "data", True)
+            index.record(URL, "data", False)
+            index.record(URL, "data", False)
+            assert _keys(index.select(URL, generate_api_candidates(URL))) == ["data"]
+        finally:
+            index.close()
+
+
+def test_exploration_adds_one_unproven_pattern():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = XHRPatternIndex(os.path.join(tmp, "patterns.sqlite3"), exploration_rate=1)
+        try:
+            index.record(URL, "json", True)
+            candidates = generate_api_candidates(URL)
+            selected = index.select(URL, candidates)
+            assert len(selected) == 2 and "json" in _keys(selected)
+            # Priority order kept
+            assert selected == [candidate for candidate in candidates if candidate in selected]
+        finally:
+            index.close()
+
+
+def test_stats_survive_a_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "patterns.sqlite3")
+        index = XHRPatternIndex(path, exploration_rate=0)
+        index.record(URL, "api_v1", True)
+        index.close()
+        reopened = XHRPatternIndex(path, exploration_rate=0)
+        try:
+            assert _keys(reopened.select(URL, generate_api_candidates(URL))) == ["api_v1"]
+        finally:
+            reopened.close()
+
+
+def test_fetcher_probes_only_the_learned_endpoint():
+    site = StandInSite()
+    pool = SessionPool()
+    with tempfile.TemporaryDirectory() as tmp:
+        index = XHRPatternIndex(os.path.join(tmp, "patterns.sqlite3"), exploration_rate=0)
+        try:
+            fetcher = XHRFetcher(
+                session_pool=pool, max_parallel=2, content_analyzer=ContentAnalyzer(), pattern_index=index
+            )
+            assert fetcher.fetch_validated(site.page_url)[0] == FULL_PAGE
+            site.requested.clear()
+            assert fetcher.fetch_validated(site.page_url)[0] == FULL_PAGE
+            # Original URL plus the one endpoint that worked; the skeleton endpoint was not asked again
+            assert sorted(site.requested) == ["/api/v1/p/1", "/p/1"], site.requested
+        finally:
+            index.close()
+            pool.close()
+            site.stop()
+
+
+if __name__ == "__main__":
+    test_only_proven_patterns_are_probed()
+    print("✓ Only proven patterns probed once a domain has one")
+    test_failing_patterns_are_skipped()
+    print("✓ Patterns failing max_failures times in a row skipped")
+    test_exploration_adds_one_unproven_pattern()
+    print("✓ Exploration added one unproven pattern")
+    test_stats_survive_a_restart()
+    print("✓ Pattern stats persisted across a restart")
+    test_fetcher_probes_only_the_learned_endpoint()
+    print("✓ XHR fetcher probed only the learned endpoint")
@@ -13,7 +13,7 @@ except ImportError:
     # python-dotenv not installed, skip loading .env file
     pass
 
-from .fetcher import fetch_html, FetcherConfig
+from .fetcher import fetch_html, Fetcher, FetcherConfig
 from .js_renderer import JSrend
 from .async_batch_fetcher import async_fetch_batch
 from .batch_config import BatchFetcherConfig
@@ -29,6 +29,7 @@ from .exceptions import (
 __version__ = "0.1.0"
 __all__ = [
     "fetch_html",
+    "Fetcher",
     "JSrend",
     "async_fetch_batch",
     "FetcherConfig",
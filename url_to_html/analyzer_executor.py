@@ -0,0 +1,186 @@
+"""
+Process-pool executor for ContentAnalyzer checks.
+
+Parsing large pages takes tens to hundreds of milliseconds, which
+stalls every other socket when done on the event loop. AnalyzerExecutor runs
+the checks in worker processes; the event loop only awaits the verdict.
+
+Workers are started with forkserver (spawn where that is unavailable), not
+fork, since the parent is a threaded asyncio server. If a worker dies (e.g.
+OOM-killed on a huge page), the pool is replaced once and the check retried
+in the new pool; a document that breaks that pool too gets a fallback
+verdict instead of being parsed in the server process.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+from .content_analyzer import ContentAnalyzer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYZER_WORKERS = min(4, os.cpu_count() or 1)
+
+# Verdict for a document whose analysis keeps killing workers: send it on to the next tier
+WORKER_CRASH_VERDICT = (True, "Content analysis crashed the analyzer worker")
+
+
+def _worker_context():
+    """Start method for worker processes: never fork a threaded parent."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _shutdown_pool(pool: ProcessPoolExecutor, wait: bool):
+    """Shut a pool down, dropping its queued work where supported (Python 3.9+)."""
+    if sys.version_info >= (3, 9):
+        pool.shutdown(wait=wait, cancel_futures=True)
+    else:
+        pool.shutdown(wait=wait)
+
+
+def _analyze(analyzer: ContentAnalyzer, method: str, html_content: str, args: tuple):
+    """Run an analyzer method in a worker process."""
+    return getattr(analyzer, method)(html_content, *args)
+
+
+class AnalyzerExecutor:
+    """Runs ContentAnalyzer checks in a process pool so they never block the event loop."""
+
+    def __init__(self, workers: int = DEFAULT_ANALYZER_WORKERS):
+        """
+        Initialize the analyzer executor.
+
+        Args:
+            workers: Number of worker processes (0 runs every check inline
+                     on the calling thread, as before)
+        """
+        self.workers = max(0, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        if self.workers:
+            self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=_worker_context())
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """Swap a broken pool for a new one, once, however many callers saw it break."""
+        with self._pool_lock:
+            if self._pool is not broken:
+                # Already replaced by another caller (or shut down)
+                return
+            logger.warning("Analyzer process pool broke (a worker died), restarting it")
+            self._pool = self._new_pool()
+        _shutdown_pool(broken, wait=False)
+
+    async def _run(self, analyzer: ContentAnalyzer, method: str, html_content: str, *args):
+        """Run an analyzer method in the pool and await its result."""
+        loop = asyncio.get_running_loop()
+        for _ in range(2):
+            pool = self._pool
+            if pool is None:
+                return getattr(analyzer, method)(html_content, *args)
+            try:
+                return await loop.run_in_executor(pool, _analyze, analyzer, method, html_content, args)
+            except BrokenProcessPool:
+                self._replace_pool(pool)
+        logger.error(
+            f"Analyzer worker died twice on a {len(html_content)}-character document, "
+            f"giving up on {method}"
+        )
+        return WORKER_CRASH_VERDICT
+
+    async def should_fallback(
+        self,
+        analyzer: ContentAnalyzer,
+        html_content: Optional[str],
+        status_code: int
+    ) -> Tuple[bool, str]:
+        """
+        Run ContentAnalyzer.should_fallback off the event loop.
+
+        Args:
+            analyzer: Analyzer whose thresholds apply
+            html_content: HTML content (None if request failed)
+            status_code: HTTP status code
+
+        Returns:
+            Tuple of (should_fallback: bool, reason: str)
+        """
+        # Cheap verdicts that never reach the parser stay inline
+        if (
+            html_content is None
+            or analyzer.is_blocked(status_code)
+            or len(html_content) < analyzer.min_content_length
+        ):
+            return analyzer.should_fallback(html_content, status_code)
+        return await self._run(analyzer, 'should_fallback', html_content, status_code)
+
+    async def is_custom_js_skeleton(
+        self,
+        analyzer: ContentAnalyzer,
+        html_content: str,
+        url: str = "",
+        min_products: int = 1
+    ) -> Tuple[bool, str]:
+        """
+        Run ContentAnalyzer.is_custom_js_skeleton off the event loop.
+
+        Args:
+            analyzer: Analyzer to use
+            html_content: HTML content from custom JS rendering
+            url: URL of the page
+            min_products: Minimum number of products/items expected
+
+        Returns:
+            Tuple of (is_skeleton: bool, reason: str)
+        """
+        if not html_content:
+            return analyzer.is_custom_js_skeleton(html_content, url, min_products)
+        return await self._run(analyzer, 'is_custom_js_skeleton', html_content, url, min_products)
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker processes."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            _shutdown_pool(pool, wait)
+
+
+_shared_executors: Dict[int, AnalyzerExecutor] = {}
+_shared_executors_lock = threading.Lock()
+
+
+def get_analyzer_executor(workers: int = DEFAULT_ANALYZER_WORKERS) -> AnalyzerExecutor:
+    """
+    Get the process-wide analyzer executor with the given worker count.
+
+    Args:
+        workers: Number of worker processes (0 = analyze inline)
+
+    Returns:
+        Shared AnalyzerExecutor instance
+    """
+    with _shared_executors_lock:
+        executor = _shared_executors.get(workers)
+        if executor is None:
+            executor = AnalyzerExecutor(workers=workers)
+            _shared_executors[workers] = executor
+        return executor
+
+
+def shutdown_analyzer_executors():
+    """Shut down every shared analyzer executor (call on application shutdown)."""
+    with _shared_executors_lock:
+        executors = list(_shared_executors.values())
+        _shared_executors.clear()
+    for executor in executors:
+        executor.shutdown()
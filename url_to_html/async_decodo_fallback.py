@@ -9,8 +9,13 @@ import os
 import asyncio
 import aiohttp
 import base64
-from typing import List, Dict, Optional
+import time
+from typing import List, Dict, Optional, Set, Tuple
+from urllib.parse import urlparse
 from .exceptions import JSRenderError, TimeoutError
+from .decodo_callbacks import get_callback_router, signed_callback_url
+from .decodo_task_journal import DecodoTaskJournal
+from .decodo_poll_scheduler import CheckResult, DecodoPollScheduler, DEFAULT_POLL_MASS_STEP, MAX_POLL_INTERVAL
 
 # Load environment variables from .env file
 try:
@@ -34,6 +39,18 @@ DECODO_RESULTS_ENDPOINT = os.getenv(
 DECODO_MAX_CONCURRENT = int(os.getenv("DECODO_MAX_CONCURRENT", "50"))
 DECODO_POLL_INTERVAL = int(os.getenv("DECODO_POLL_INTERVAL", "2"))
 DECODO_MAX_POLL_ATTEMPTS = int(os.getenv("DECODO_MAX_POLL_ATTEMPTS", "30"))
+DECODO_SUBMIT_CHUNK_SIZE = int(os.getenv("DECODO_SUBMIT_CHUNK_SIZE", "25"))
+DECODO_SUBMIT_RETRIES = int(os.getenv("DECODO_SUBMIT_RETRIES", "2"))
+DECODO_MAX_CONCURRENT_SUBMISSIONS = int(os.getenv("DECODO_MAX_CONCURRENT_SUBMISSIONS", "4"))
+DECODO_POLL_QPS = float(os.getenv("DECODO_POLL_QPS", "20"))
+DECODO_POLL_MASS_STEP = float(os.getenv("DECODO_POLL_MASS_STEP", str(DEFAULT_POLL_MASS_STEP)))
+DECODO_CALLBACK_URL = os.getenv("DECODO_CALLBACK_URL") or None  # Public URL of our callback route
+DECODO_CALLBACK_TOKEN = os.getenv("DECODO_CALLBACK_TOKEN") or None  # Secret the callback route requires
+DECODO_CALLBACK_POLL_INTERVAL = float(os.getenv("DECODO_CALLBACK_POLL_INTERVAL", "30"))
+
+# Age after which a reattached task Decodo answers 404 for is taken as gone
+# (younger tasks may simply not be visible yet)
+REATTACH_GRACE_SECONDS = 60.0
 
 logger = logging.getLogger(__name__)
 
@@ -53,7 +70,15 @@ class AsyncDecodoFallback:
         results_endpoint: Optional[str] = None,
         poll_interval: int = DECODO_POLL_INTERVAL,
         max_poll_attempts: int = DECODO_MAX_POLL_ATTEMPTS,
-        max_concurrent: int = DECODO_MAX_CONCURRENT
+        max_concurrent: int = DECODO_MAX_CONCURRENT,
+        submit_chunk_size: int = DECODO_SUBMIT_CHUNK_SIZE,
+        submit_retries: int = DECODO_SUBMIT_RETRIES,
+        max_concurrent_submissions: int = DECODO_MAX_CONCURRENT_SUBMISSIONS,
+        poll_qps: float = DECODO_POLL_QPS,
+        poll_mass_step: float = DECODO_POLL_MASS_STEP,
+        callback_url: Optional[str] = None,
+        callback_poll_interval: float = DECODO_CALLBACK_POLL_INTERVAL,
+        task_journal: Optional[DecodoTaskJournal] = None
     ):
         """
         Initialize Decodo Web Scraping API fallback processor.
@@ -70,6 +95,22 @@ class AsyncDecodoFallback:
             poll_interval: Time in seconds to wait between polling attempts
             max_poll_attempts: Maximum number of polling attempts
             max_concurrent: Max concurrent polling requests (default: 50)
+            submit_chunk_size: Max URLs per batch submission; each chunk is polled
+                               as soon as its task IDs come back (default: 25)
+            submit_retries: Times a failed chunk submission is retried on its own (default: 2)
+            max_concurrent_submissions: Chunk submissions in flight at once (default: 4)
+            poll_qps: Result polls per second across all pending tasks (default: 20;
+                      0 disables the limit)
+            poll_mass_step: Once completion times for a domain are known, each poll
+                            waits until this share of the tasks still running is
+                            expected to have finished (default: 0.3)
+            callback_url: URL Decodo posts finished tasks to (our callback route);
+                          results are then pushed and polling is only a safety net
+                          (default: from env; unset = polling only)
+            callback_poll_interval: Safety-net poll interval in callback mode (default: 30)
+            task_journal: Durable record of submitted tasks; URLs with a task still
+                          in flight are reattached to it instead of resubmitted
+                          (default: None)
         """
         self.timeout = aiohttp.ClientTimeout(total=timeout)
         self.location = location
@@ -81,6 +122,17 @@ class AsyncDecodoFallback:
         self.poll_interval = poll_interval
         self.max_poll_attempts = max_poll_attempts
         self.max_concurrent = max_concurrent
+        self.submit_chunk_size = max(1, submit_chunk_size)
+        self.submit_retries = max(0, submit_retries)
+        self.max_concurrent_submissions = max(1, max_concurrent_submissions)
+        self.poll_qps = poll_qps
+        self.poll_mass_step = poll_mass_step
+        self.callback_url = callback_url or signed_callback_url(DECODO_CALLBACK_URL, DECODO_CALLBACK_TOKEN)
+        self.callback_poll_interval = callback_poll_interval
+        self.task_journal = task_journal
+        self._poll_scheduler: Optional[DecodoPollScheduler] = None
+        # Reattached tasks old enough that a 404 means Decodo no longer has them
+        self._missing_is_final: Set[str] = set()
         
         # Get credentials - support both username:password and Basic Auth Token
         self.username = DECODO_USERNAME
@@ -146,6 +198,8 @@ class AsyncDecodoFallback:
             payload["geo"] = self.location
         if self.language:
             payload["locale"] = self.language
+        if self.callback_url:
+            payload["callback_url"] = self.callback_url
         
         try:
             headers = {
@@ -168,7 +222,10 @@ class AsyncDecodoFallback:
                 else:
                     error_text = await response.text()
                     logger.error(f"Decodo batch submission failed: status {response.status}, {error_text[:200]}")
-                    return {"error": f"Status {response.status}: {error_text[:200]}"}
+                    return {
+                        "error": f"Status {response.status}: {error_text[:200]}",
+                        "status_code": response.status
+                    }
                     
         except asyncio.TimeoutError:
             logger.error("Decodo batch submission timeout")
@@ -216,15 +273,14 @@ class AsyncDecodoFallback:
         
         return task_map
     
-    async def _poll_task_result(
+    async def _check_task(
         self,
         session: aiohttp.ClientSession,
         task_id: str,
         original_url: Optional[str] = None
-    ) -> Dict[str, any]:
+    ) -> CheckResult:
         """
-        Poll task result until completed or failed with robust error handling.
-        Based on the working test script polling logic.
+        Check a task's result once (the poll scheduler decides when).
         
         Args:
             session: aiohttp session
@@ -232,244 +288,159 @@ class AsyncDecodoFallback:
             original_url: Original URL (for mapping result)
             
         Returns:
-            Result dictionary with status, html, and error fields
+            (result, None) once the task completed or failed for good,
+            (None, None) while it is still processing, or
+            (None, error) after a transient error worth checking again
         """
         result_url = f"{self.results_endpoint}/{task_id}/results"
         headers = {"Authorization": self._get_auth_header()}
         
-        waited = 0.0
-        interval = float(self.poll_interval)
-        max_wait = self.timeout.total
-        consecutive_errors = 0
-        max_consecutive_errors = 5  # Stop after 5 consecutive errors
-        
-        while waited < max_wait:
-            try:
-                async with session.get(
-                    result_url,
-                    headers=headers,
-                    timeout=self.timeout,
-                    ssl=False
-                ) as response:
-                    # Handle "not ready yet" status codes
-                    if response.status in (404, 204):
-                        # 404 = task not found yet, 204 = no content (still processing)
-                        if waited == 0:
-                            logger.debug(f"Task {task_id} not ready yet (status {response.status}), starting polling...")
-                        consecutive_errors = 0  # Reset error counter on expected status
-                        await asyncio.sleep(interval)
-                        waited += interval
-                        interval = min(interval * 1.2, 10.0)
-                        continue
-                    
-                    # Handle server errors (500-599) with retry
-                    if 500 <= response.status < 600:
-                        error_text = await response.text()
-                        consecutive_errors += 1
-                        logger.warning(f"Server error for task {task_id} (consecutive #{consecutive_errors}): status {response.status}")
-                        
-                        if consecutive_errors >= max_consecutive_errors:
-                            logger.error(f"Too many consecutive server errors ({consecutive_errors}) for task {task_id}, giving up")
-                            return {
-                                "url": original_url or "",
-                                "html": None,
-                                "status": "failed",
-                                "error": f"Server error {response.status} after {consecutive_errors} attempts: {error_text[:100]}"
-                            }
-                        await asyncio.sleep(interval)
-                        waited += interval
-                        interval = min(interval * 1.5, 10.0)
-                        continue
-                    
-                    # Handle client errors (400-499, except 404)
-                    if 400 <= response.status < 500:
-                        error_text = await response.text()
-                        logger.error(f"Client error for task {task_id}: status {response.status}, {error_text[:200]}")
-                        return {
-                            "url": original_url or "",
-                            "html": None,
-                            "status": "failed",
-                            "error": f"Client error {response.status}: {error_text[:200]}"
-                        }
-                    
-                    # Handle unexpected status codes
-                    if response.status != 200:
-                        error_text = await response.text()
-                        consecutive_errors += 1
-                        logger.warning(f"Unexpected status {response.status} for task {task_id} (consecutive #{consecutive_errors})")
-                        
-                        if consecutive_errors >= max_consecutive_errors:
-                            return {
-                                "url": original_url or "",
-                                "html": None,
-                                "status": "failed",
-                                "error": f"Unexpected status {response.status} after {consecutive_errors} attempts: {error_text[:200]}"
-                            }
-                        await asyncio.sleep(interval)
-                        waited += interval
-                        interval = min(interval * 1.5, 10.0)
-                        continue
-                    
-                    # Try to parse JSON response
-                    try:
-                        data = await response.json()
-                        consecutive_errors = 0  # Reset on successful parse
-                    except aiohttp.ContentTypeError as e:
-                        consecutive_errors += 1
-                        logger.warning(f"Task {task_id}: Invalid JSON content type (consecutive #{consecutive_errors})")
-                        
-                        if consecutive_errors >= max_consecutive_errors:
-                            return {
-                                "url": original_url or "",
-                                "html": None,
-                                "status": "failed",
-                                "error": f"Invalid JSON response after {consecutive_errors} attempts"
-                            }
-                        await asyncio.sleep(interval)
-                        waited += interval
-                        interval = min(interval * 1.5, 10.0)
-                        continue
-                    except Exception as e:
-                        consecutive_errors += 1
-                        logger.warning(f"Task {task_id}: JSON parse error (consecutive #{consecutive_errors}): {type(e).__name__}")
-                        
-                        if consecutive_errors >= max_consecutive_errors:
-                            return {
-                                "url": original_url or "",
-                                "html": None,
-                                "status": "failed",
-                                "error": f"JSON parse error after {consecutive_errors} attempts: {type(e).__name__}"
-                            }
-                        await asyncio.sleep(interval)
-                        waited += interval
-                        interval = min(interval * 1.5, 10.0)
-                        continue
-                    
-                    # Check task status
-                    status = None
-                    if isinstance(data, dict):
-                        status = data.get("status") or data.get("state")
-                    
-                    # Check if task explicitly failed
-                    if status in ("failed", "error"):
-                        error_msg = None
-                        if isinstance(data.get("error"), dict):
-                            error_msg = data["error"].get("message") or data["error"].get("error")
-                        elif isinstance(data.get("error"), str):
-                            error_msg = data["error"]
-                        error_msg = error_msg or data.get("message") or "Task failed (no error message)"
-                        
-                        logger.warning(f"Task {task_id} failed on Decodo side: {error_msg}")
-                        return {
-                            "url": original_url or data.get("url", ""),
-                            "html": None,
-                            "status": "failed",
-                            "error": f"Decodo task failed: {error_msg}"
-                        }
-                    
-                    # Check if task completed (status "done" or result fields present)
-                    if status == "done" or "results" in data or "result" in data or "data" in data:
-                        # Extract HTML from various possible response formats
-                        html = None
-                        
-                        # Format 1: results array (most common for batch API)
-                        if isinstance(data, dict) and "results" in data:
-                            results_list = data["results"]
-                            if results_list and isinstance(results_list, list) and len(results_list) > 0:
-                                r0 = results_list[0]
-                                html = r0.get("content") or r0.get("html") or r0.get("text")
-                                # Check individual result status
-                                result_status = r0.get("status")
-                                if result_status == "failed":
-                                    error_msg = r0.get("error") or "Result failed"
-                                    logger.warning(f"Task {task_id} result failed: {error_msg}")
-                                    return {
-                                        "url": original_url or r0.get("url", ""),
-                                        "html": None,
-                                        "status": "failed",
-                                        "error": f"Result failed: {error_msg}"
-                                    }
-                        
-                        # Format 2: direct content/html/text fields
-                        if not html and isinstance(data, dict):
-                            html = data.get("html") or data.get("content") or data.get("text")
-                        
-                        # Success: HTML found
-                        if html and len(html) > 0:
-                            logger.debug(f"Task {task_id} completed successfully: {len(html)} bytes")
-                            return {
-                                "url": original_url or data.get("url", ""),
-                                "html": html,
-                                "status": "success",
-                                "error": None
-                            }
-                        else:
-                            # Task completed but no HTML
-                            error_msg = data.get("error", {}).get("message") if isinstance(data.get("error"), dict) else data.get("error")
-                            error_msg = error_msg or "Task completed but response contains no HTML content"
-                            logger.warning(f"Task {task_id} completed but no HTML found for {original_url}")
-                            return {
-                                "url": original_url or data.get("url", ""),
-                                "html": None,
-                                "status": "failed",
-                                "error": error_msg
-                            }
-                    
-                    # Task still processing - wait and retry
-                    logger.debug(f"Task {task_id} status: {status or 'unknown'}, waiting {interval:.1f}s...")
-                    await asyncio.sleep(interval)
-                    waited += interval
-                    interval = min(interval * 1.2, 10.0)
-                    
-            except asyncio.TimeoutError:
-                consecutive_errors += 1
-                logger.warning(f"Polling timeout for task {task_id} (consecutive #{consecutive_errors})")
-                
-                if consecutive_errors >= max_consecutive_errors:
+        try:
+            async with session.get(
+                result_url,
+                headers=headers,
+                timeout=self.timeout,
+                ssl=False
+            ) as response:
+                if response.status == 404 and task_id in self._missing_is_final:
                     return {
                         "url": original_url or "",
                         "html": None,
                         "status": "failed",
-                        "error": f"Request timeout after {consecutive_errors} attempts"
-                    }
+                        "error": "Task no longer known to Decodo"
+                    }, None
                 
-                await asyncio.sleep(interval)
-                waited += interval
-                interval = min(interval * 1.5, 10.0)
+                # Handle "not ready yet" status codes
+                if response.status in (404, 204):
+                    # 404 = task not found yet, 204 = no content (still processing)
+                    return None, None
                 
-            except aiohttp.ClientError as e:
-                consecutive_errors += 1
-                logger.warning(f"Network error polling task {task_id} (consecutive #{consecutive_errors}): {type(e).__name__}: {str(e)[:100]}")
+                # Handle server errors (500-599) with retry
+                if 500 <= response.status < 600:
+                    error_text = await response.text()
+                    return None, f"Server error {response.status}: {error_text[:100]}"
                 
-                if consecutive_errors >= max_consecutive_errors:
+                # Handle client errors (400-499, except 404)
+                if 400 <= response.status < 500:
+                    error_text = await response.text()
+                    logger.error(f"Client error for task {task_id}: status {response.status}, {error_text[:200]}")
                     return {
                         "url": original_url or "",
                         "html": None,
                         "status": "failed",
-                        "error": f"Network error after {consecutive_errors} attempts: {type(e).__name__}"
-                    }
+                        "error": f"Client error {response.status}: {error_text[:200]}"
+                    }, None
                 
-                await asyncio.sleep(interval)
-                waited += interval
-                interval = min(interval * 1.5, 10.0)
+                # Handle unexpected status codes
+                if response.status != 200:
+                    error_text = await response.text()
+                    return None, f"Unexpected status {response.status}: {error_text[:200]}"
                 
-            except Exception as e:
-                logger.error(f"Unexpected error polling task {task_id} for {original_url}: {type(e).__name__}: {str(e)[:200]}")
+                # Try to parse JSON response
+                try:
+                    data = await response.json()
+                except aiohttp.ContentTypeError:
+                    return None, "Invalid JSON response"
+                except Exception as e:
+                    return None, f"JSON parse error: {type(e).__name__}"
+                
+        except asyncio.TimeoutError:
+            return None, "Request timeout"
+        except aiohttp.ClientError as e:
+            return None, f"Network error: {type(e).__name__}: {str(e)[:100]}"
+        
+        return self._parse_task_data(task_id, original_url, data), None
+    
+    def _parse_task_data(
+        self,
+        task_id: str,
+        original_url: Optional[str],
+        data: any
+    ) -> Optional[Dict[str, any]]:
+        """
+        Turn a task's result payload (polled or delivered by callback) into a result.
+        
+        Args:
+            task_id: Task ID
+            original_url: Original URL (for mapping result)
+            data: Decoded JSON payload
+            
+        Returns:
+            Result dictionary, or None while the task is still processing
+        """
+        # Check task status
+        status = None
+        if isinstance(data, dict):
+            status = data.get("status") or data.get("state")
+        
+        # Check if task explicitly failed
+        if status in ("failed", "error"):
+            error_msg = None
+            if isinstance(data.get("error"), dict):
+                error_msg = data["error"].get("message") or data["error"].get("error")
+            elif isinstance(data.get("error"), str):
+                error_msg = data["error"]
+            error_msg = error_msg or data.get("message") or "Task failed (no error message)"
+            
+            logger.warning(f"Task {task_id} failed on Decodo side: {error_msg}")
+            return {
+                "url": original_url or data.get("url", ""),
+                "html": None,
+                "status": "failed",
+                "error": f"Decodo task failed: {error_msg}"
+            }
+        
+        # Check if task completed (status "done" or result fields present)
+        if status == "done" or "results" in data or "result" in data or "data" in data:
+            # Extract HTML from various possible response formats
+            html = None
+            
+            # Format 1: results array (most common for batch API)
+            if isinstance(data, dict) and "results" in data:
+                results_list = data["results"]
+                if results_list and isinstance(results_list, list) and len(results_list) > 0:
+                    r0 = results_list[0]
+                    html = r0.get("content") or r0.get("html") or r0.get("text")
+                    # Check individual result status
+                    result_status = r0.get("status")
+                    if result_status == "failed":
+                        error_msg = r0.get("error") or "Result failed"
+                        logger.warning(f"Task {task_id} result failed: {error_msg}")
+                        return {
+                            "url": original_url or r0.get("url", ""),
+                            "html": None,
+                            "status": "failed",
+                            "error": f"Result failed: {error_msg}"
+                        }
+            
+            # Format 2: direct content/html/text fields
+            if not html and isinstance(data, dict):
+                html = data.get("html") or data.get("content") or data.get("text")
+            
+            # Success: HTML found
+            if html and len(html) > 0:
+                logger.debug(f"Task {task_id} completed successfully: {len(html)} bytes")
                 return {
-                    "url": original_url or "",
+                    "url": original_url or data.get("url", ""),
+                    "html": html,
+                    "status": "success",
+                    "error": None
+                }
+            else:
+                # Task completed but no HTML
+                error_msg = data.get("error", {}).get("message") if isinstance(data.get("error"), dict) else data.get("error")
+                error_msg = error_msg or "Task completed but response contains no HTML content"
+                logger.warning(f"Task {task_id} completed but no HTML found for {original_url}")
+                return {
+                    "url": original_url or data.get("url", ""),
                     "html": None,
                     "status": "failed",
-                    "error": f"Unexpected error: {type(e).__name__}: {str(e)[:200]}"
+                    "error": error_msg
                 }
         
-        # Max wait time reached without completion
-        logger.warning(f"Task {task_id} for {original_url} did not complete within {max_wait}s (waited: {waited:.1f}s)")
-        return {
-            "url": original_url or "",
-            "html": None,
-            "status": "failed",
-            "error": f"Polling timeout: task did not complete within {max_wait}s"
-        }
+        # Task still processing
+        logger.debug(f"Task {task_id} status: {status or 'unknown'}")
+        return None
     
     async def process_urls(
         self,
@@ -478,6 +449,9 @@ class AsyncDecodoFallback:
         """
         Process failed URLs through Decodo Web Scraping API (batch processing with polling).
         
+        Concurrent calls share one poll scheduler, so max_concurrent and
+        poll_qps hold across all of them.
+        
         Args:
             urls: List of URLs that failed in custom JS service
             
@@ -500,102 +474,294 @@ class AsyncDecodoFallback:
                 for url in urls
             ]
         
-        logger.info(f"Processing {len(urls)} failed URLs through Decodo Web Scraping API (max {self.max_concurrent} concurrent polls)")
+        # Tasks already paid for (e.g. before a restart) are polled, not resubmitted
+        reattached: Dict[str, Optional[str]] = {}
+        if self.task_journal is not None:
+            in_flight = self.task_journal.find_in_flight(urls, self.target)
+            reattached = {task_id: url for url, (task_id, _) in in_flight.items()}
+            now = time.time()
+            self._missing_is_final.update(
+                task_id for task_id, submitted_at in in_flight.values()
+                if now - submitted_at > REATTACH_GRACE_SECONDS
+            )
+            if reattached:
+                logger.info(f"Reattaching to {len(reattached)} Decodo tasks already in flight")
+        reattached_urls = set(reattached.values())
+        to_submit = [url for url in urls if url not in reattached_urls]
+        
+        chunks = [
+            to_submit[i:i + self.submit_chunk_size]
+            for i in range(0, len(to_submit), self.submit_chunk_size)
+        ]
+        logger.info(
+            f"Processing {len(urls)} failed URLs through Decodo Web Scraping API in {len(chunks)} "
+            f"submissions (max {self.max_concurrent_submissions} concurrent submissions, "
+            f"{self.max_concurrent} concurrent polls)"
+        )
         
-        # Create session for batch submission and polling
-        connector = aiohttp.TCPConnector(limit=self.max_concurrent, ssl=False)
+        # Create session for batch submission (polls go through the scheduler's own session)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrent_submissions, ssl=False)
         
         async with aiohttp.ClientSession(
             timeout=self.timeout,
             connector=connector
         ) as session:
-            # Step 1: Submit batch request
-            batch_response = await self._submit_batch(session, urls)
-            
-            if "error" in batch_response:
-                error_msg = batch_response.get("error", "Failed to submit batch to Decodo API")
-                logger.error(f"Failed to submit batch to Decodo API: {error_msg}")
-                return [
-                    {
-                        "url": url,
-                        "html": None,
-                        "status": "failed",
-                        "error": error_msg
-                    }
-                    for url in urls
-                ]
-            
-            # Step 2: Extract task IDs from batch response
-            task_map = self._extract_task_ids(batch_response)
+            # Chunks are submitted concurrently and each is polled as soon as its
+            # task IDs come back, so submission and polling overlap
+            submit_semaphore = asyncio.Semaphore(self.max_concurrent_submissions)
+            chunk_results = await asyncio.gather(
+                *(
+                    self._process_chunk(session, chunk, submit_semaphore)
+                    for chunk in chunks
+                ),
+                self._resume_tasks(session, reattached, submit_semaphore)
+            )
+        
+        results_by_url = {
+            result["url"]: result
+            for results in chunk_results
+            for result in results
+        }
+        processed_results = [results_by_url[url] for url in urls]
+        
+        successful = sum(1 for r in processed_results if r["status"] == "success")
+        failed = len(processed_results) - successful
+        logger.info(f"Decodo Web Scraping API fallback completed: {successful} successful, {failed} failed")
+        
+        return processed_results
+    
+    def _completion_keys(self, url: Optional[str]) -> Tuple[Tuple[Optional[str], str], ...]:
+        """Completion time history keys of a URL: its domain and target, then the target alone."""
+        domain = urlparse(url).hostname if url else None
+        if domain:
+            return ((domain, self.target), (None, self.target))
+        return ((None, self.target),)
+    
+    def _get_poll_scheduler(self) -> DecodoPollScheduler:
+        """Get the poll scheduler of the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        if self._poll_scheduler is None or self._poll_scheduler.loop is not loop:
+            if self.callback_url:
+                # Results are pushed to the callback route; polls only catch lost callbacks
+                mode_options = dict(
+                    poll_interval=self.callback_poll_interval,
+                    adaptive=False,
+                    max_interval=max(self.callback_poll_interval, MAX_POLL_INTERVAL),
+                    callback_router=get_callback_router()
+                )
+            else:
+                mode_options = dict(poll_interval=self.poll_interval)
+            self._poll_scheduler = DecodoPollScheduler(
+                check=self._check_task,
+                session_factory=lambda: aiohttp.ClientSession(
+                    timeout=self.timeout,
+                    connector=aiohttp.TCPConnector(limit=self.max_concurrent, ssl=False)
+                ),
+                max_wait=self.timeout.total,
+                max_concurrent=self.max_concurrent,
+                max_qps=self.poll_qps,
+                poll_mass_step=self.poll_mass_step,
+                parse=self._parse_task_data,
+                on_complete=self.task_journal.remove if self.task_journal is not None else None,
+                **mode_options
+            )
+        return self._poll_scheduler
+    
+    async def _submit_chunk(
+        self,
+        session: aiohttp.ClientSession,
+        urls: List[str],
+        semaphore: asyncio.Semaphore
+    ) -> Tuple[Dict[str, Optional[str]], Optional[str]]:
+        """
+        Submit one chunk of URLs, retrying the chunk on its own if the submission fails.
+        
+        Args:
+            session: aiohttp session
+            urls: URLs of the chunk
+            semaphore: Limits the submissions in flight
             
-            if not task_map:
-                logger.error("No task IDs received from Decodo batch submission")
-                logger.debug(f"Batch response: {batch_response}")
-                return [
-                    {
-                        "url": url,
-                        "html": None,
-                        "status": "failed",
-                        "error": "No task IDs received from batch submission"
-                    }
-                    for url in urls
-                ]
+        Returns:
+            (task_id -> url map, None) on success, or ({}, error message)
+        """
+        error = None
+        for attempt in range(self.submit_retries + 1):
+            if attempt:
+                delay = self.poll_interval * 2 ** (attempt - 1)
+                logger.warning(
+                    f"Retrying Decodo submission of {len(urls)} URLs in {delay}s "
+                    f"(attempt {attempt + 1}/{self.submit_retries + 1}): {error}"
+                )
+                await asyncio.sleep(delay)
             
-            logger.info(f"Received {len(task_map)} task IDs, starting polling")
+            async with semaphore:
+                batch_response = await self._submit_batch(session, urls)
             
-            # Step 3: Poll results concurrently
-            semaphore = asyncio.Semaphore(self.max_concurrent)
+            if "error" in batch_response:
+                error = batch_response.get("error") or "Failed to submit batch to Decodo API"
+                status_code = batch_response.get("status_code")
+                if status_code is not None and 400 <= status_code < 500 and status_code != 429:
+                    # Rejected request (e.g. bad credentials): resubmitting will not help
+                    break
+                continue
             
-            async def poll_with_semaphore(task_id: str, url: Optional[str]):
-                async with semaphore:
-                    return await self._poll_task_result(session, task_id, url)
+            task_map = self._extract_task_ids(batch_response)
+            if task_map:
+                if self.task_journal is not None:
+                    # Durable before polling starts, so a restart can pick the tasks up
+                    self.task_journal.record_submitted(task_map, self.target)
+                return task_map, None
+            logger.debug(f"Batch response: {batch_response}")
+            error = "No task IDs received from batch submission"
+        
+        return {}, error
+    
+    async def _process_chunk(
+        self,
+        session: aiohttp.ClientSession,
+        urls: List[str],
+        submit_semaphore: asyncio.Semaphore
+    ) -> List[Dict[str, any]]:
+        """
+        Submit one chunk of URLs and poll its tasks.
+        
+        Args:
+            session: aiohttp session
+            urls: URLs of the chunk
+            submit_semaphore: Limits the submissions in flight
             
-            # Create polling tasks
-            polling_tasks = [
-                poll_with_semaphore(task_id, url)
-                for task_id, url in task_map.items()
+        Returns:
+            List of result dictionaries, in the order of urls
+        """
+        task_map, error = await self._submit_chunk(session, urls, submit_semaphore)
+        if error is not None:
+            logger.error(f"Failed to submit {len(urls)} URLs to Decodo API: {error}")
+            return [
+                {
+                    "url": url,
+                    "html": None,
+                    "status": "failed",
+                    "error": error
+                }
+                for url in urls
             ]
+        
+        logger.info(f"Received {len(task_map)} task IDs, starting polling")
+        return await self._poll_tasks(task_map, urls)
+    
+    async def _resume_tasks(
+        self,
+        session: aiohttp.ClientSession,
+        task_map: Dict[str, Optional[str]],
+        submit_semaphore: asyncio.Semaphore
+    ) -> List[Dict[str, any]]:
+        """
+        Poll tasks reattached from the task journal, resubmitting the URLs whose task is dead.
+        
+        Args:
+            session: aiohttp session
+            task_map: task_id -> URL of the reattached tasks
+            submit_semaphore: Limits the submissions in flight
             
-            # Execute all polling tasks concurrently
-            poll_results = await asyncio.gather(*polling_tasks, return_exceptions=True)
-            
-            # Map poll results back to URLs
-            task_id_to_result = {
-                task_id: result
-                for task_id, result in zip(task_map.keys(), poll_results)
-            }
-            
-            # Build final results list, ensuring all URLs have results
-            processed_results = []
-            url_to_task_id = {url: tid for tid, url in task_map.items() if url}
+        Returns:
+            List of result dictionaries, one per URL
+        """
+        if not task_map:
+            return []
+        try:
+            results = await self._poll_tasks(task_map, list(task_map.values()), record_timing=False)
+        finally:
+            self._missing_is_final.difference_update(task_map)
+        
+        # Failed, timed out or gone (their journal entries are dropped by now):
+        # the task already paid for is lost, so pay for a new one
+        retry = [result["url"] for result in results if result["status"] != "success"]
+        if not retry:
+            return results
+        logger.info(f"{len(retry)} reattached Decodo tasks did not complete, resubmitting their URLs")
+        resubmitted = await asyncio.gather(*(
+            self._process_chunk(session, retry[i:i + self.submit_chunk_size], submit_semaphore)
+            for i in range(0, len(retry), self.submit_chunk_size)
+        ))
+        return [result for result in results if result["status"] == "success"] + [
+            result for chunk_results in resubmitted for result in chunk_results
+        ]
+    
+    async def _poll_tasks(
+        self,
+        task_map: Dict[str, Optional[str]],
+        urls: List[str],
+        record_timing: bool = True
+    ) -> List[Dict[str, any]]:
+        """
+        Wait for submitted tasks through the shared poll scheduler.
+        
+        Args:
+            task_map: task_id -> URL
+            urls: URLs the tasks were submitted for
+            record_timing: Learn completion times from these tasks (False for
+                           reattached tasks, whose submission time is unknown here)
             
-            for url in urls:
-                task_id = url_to_task_id.get(url)
-                if task_id and task_id in task_id_to_result:
-                    result = task_id_to_result[task_id]
-                    if isinstance(result, Exception):
-                        logger.error(f"Error polling task {task_id} for {url}: {result}")
-                        processed_results.append({
-                            "url": url,
-                            "html": None,
-                            "status": "failed",
-                            "error": str(result)
-                        })
-                    else:
-                        # Update URL in result to match original
-                        result["url"] = url
-                        processed_results.append(result)
-                else:
-                    # URL didn't get a task ID or result
+        Returns:
+            List of result dictionaries, in the order of urls
+        """
+        if not task_map:
+            return []
+        
+        # Hand the tasks to the shared poll scheduler
+        scheduler = self._get_poll_scheduler()
+        poll_results = await asyncio.gather(
+            *(
+                scheduler.submit(task_id, url, self._completion_keys(url) if record_timing else ())
+                for task_id, url in task_map.items()
+            ),
+            return_exceptions=True
+        )
+        
+        # Map poll results back to URLs
+        task_id_to_result = {
+            task_id: result
+            for task_id, result in zip(task_map.keys(), poll_results)
+        }
+        
+        if self.task_journal is not None:
+            # Given up on (timeout, repeated errors, gone): no longer worth reattaching to.
+            # Cancelled polls (shutdown) keep their entries for the next process.
+            self.task_journal.remove_many([
+                task_id for task_id, result in task_id_to_result.items()
+                if isinstance(result, dict) and result.get("status") != "success"
+            ])
+        
+        # Build the results, ensuring all URLs have results
+        processed_results = []
+        url_to_task_id = {url: tid for tid, url in task_map.items() if url}
+        
+        for url in urls:
+            task_id = url_to_task_id.get(url)
+            if task_id and task_id in task_id_to_result:
+                result = task_id_to_result[task_id]
+                if isinstance(result, BaseException):
+                    # Includes CancelledError (e.g. the scheduler was closed), which is
+                    # not an Exception but still only fails this URL
+                    error = str(result) or type(result).__name__
+                    logger.error(f"Error polling task {task_id} for {url}: {error}")
                     processed_results.append({
                         "url": url,
                         "html": None,
                         "status": "failed",
-                        "error": "No task ID assigned for this URL"
+                        "error": error
                     })
-        
-        successful = sum(1 for r in processed_results if r["status"] == "success")
-        failed = len(processed_results) - successful
-        logger.info(f"Decodo Web Scraping API fallback completed: {successful} successful, {failed} failed")
+                else:
+                    # Update URL in result to match original
+                    result = dict(result, url=url)
+                    processed_results.append(result)
+            else:
+                # URL didn't get a task ID or result
+                processed_results.append({
+                    "url": url,
+                    "html": None,
+                    "status": "failed",
+                    "error": "No task ID assigned for this URL"
+                })
         
         return processed_results
@@ -1,250 +1,346 @@
 """
 Async multi-service JS renderer that distributes URLs across multiple services in parallel.
+
+Batches are formed on demand: whenever a service becomes free it takes the
+next URLs off a shared queue, in a batch sized for that service from its
+observed render time and page sizes. Near the end of the queue the
+remaining URLs are split across all idle services instead of going to the
+first free one as a single full batch.
+
+Callers that retry URLs pass the services each URL was already sent to;
+retries then go to a service that has not tried them whenever one is free.
+
+A batch that times out is bisected: its halves are re-dispatched as
+separate batches, recursively, until the URLs that hang are isolated. An
+isolated slow URL gets one attempt in the slow lane (a longer timeout) if
+one is configured, otherwise it is returned with slow_lane set so the
+caller can hand it to Decodo.
 """
 
 import logging
 import asyncio
 import aiohttp
-from typing import List, Dict, Optional
+import math
+import json
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, List, Dict, Optional, Set
 from .service_pool_manager import ServicePoolManager, ServiceInfo
 from .exceptions import JSRenderError
 
 logger = logging.getLogger(__name__)
 
+try:
+    import ijson as _ijson
+except ImportError:
+    _ijson = None
+
+# Response size a single batch should stay under (rendered HTML)
+DEFAULT_MAX_BATCH_BYTES = 50 * 1024 * 1024
+
+# Error of the results of a batch that timed out
+TIMEOUT_ERROR = "Request timeout"
+
+# Read size for NDJSON responses
+NDJSON_CHUNK_SIZE = 64 * 1024
+
 
 class AsyncMultiServiceJSRenderer:
-    """Multi-service batch processor for JS rendering with parallel service utilization."""
+    """
+    Multi-service batch processor for JS rendering with parallel service utilization.
+    
+    A renderer without a shared service_pool creates its own pool; use it as
+    an async context manager (or call close()) to close that pool:
+    
+        async with AsyncMultiServiceJSRenderer(endpoints) as renderer:
+            results = await renderer.process_urls(urls)
+    
+    Its connections are also released after every render, so a renderer
+    that is never closed does not leak them.
+    """
     
     def __init__(
         self,
         service_endpoints: List[str],
         batch_size: int = 20,
         cooldown_seconds: int = 120,
-        timeout: int = 300
+        timeout: int = 300,
+        service_pool: Optional[ServicePoolManager] = None,
+        min_batch_size: int = 1,
+        target_batch_seconds: Optional[float] = None,
+        max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+        bisect_timeouts: bool = True,
+        slow_lane_timeout: Optional[int] = None,
+        stream_results: bool = True
     ):
         """
         Initialize the multi-service JS renderer.
         
         Args:
             service_endpoints: List of service endpoint URLs
-            batch_size: Number of URLs per batch (default: 20)
-            cooldown_seconds: Cooldown period after each batch (default: 120)
+            batch_size: Maximum number of URLs per batch (default: 20)
+            cooldown_seconds: Window in which a service of a private pool may render
+                              batch_size URLs (default: 120)
             timeout: Request timeout in seconds
+            service_pool: Pool shared with other renderers (default: a private
+                          pool over service_endpoints, closed by close())
+            min_batch_size: Smallest batch sent to a service (default: 1)
+            target_batch_seconds: Render time a batch is sized for, from the
+                                  service's observed seconds per URL
+                                  (default: a fifth of the timeout)
+            max_batch_bytes: Rendered HTML a batch is sized to stay under, from
+                             the service's observed page sizes (default: 50 MB)
+            bisect_timeouts: Split timed-out batches to isolate the slow URLs (default: True)
+            slow_lane_timeout: Timeout for a last, single-URL attempt at an isolated
+                               slow URL (default: None, no attempt; the URL is
+                               returned with slow_lane set)
+            stream_results: Decode service responses incrementally: ask for NDJSON,
+                            and parse JSON with ijson when it is installed (default: True)
         """
-        self.service_pool = ServicePoolManager(
-            service_endpoints=service_endpoints,
-            batch_size=batch_size,
-            cooldown_seconds=cooldown_seconds
-        )
+        self._owns_pool = service_pool is None
+        if service_pool is None:
+            service_pool = ServicePoolManager(
+                service_endpoints=service_endpoints,
+                batch_size=batch_size,
+                cooldown_seconds=cooldown_seconds
+            )
+        self.service_pool = service_pool
         self.batch_size = batch_size
+        self.cooldown_seconds = cooldown_seconds
         self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.min_batch_size = max(1, min(min_batch_size, batch_size))
+        self.target_batch_seconds = target_batch_seconds or timeout / 5
+        self.max_batch_bytes = max_batch_bytes
+        self.bisect_timeouts = bisect_timeouts
+        self.slow_lane_timeout = aiohttp.ClientTimeout(total=slow_lane_timeout) if slow_lane_timeout else None
+        self.stream_results = stream_results
+    
+    def _batch_size_for(self, service: ServiceInfo, remaining: int, idle_services: int) -> int:
+        """
+        Number of URLs to send to a service that just became free.
+        
+        Args:
+            service: Service the batch goes to
+            remaining: URLs still waiting for a service
+            idle_services: Other services that are free right now
+            
+        Returns:
+            Batch size between min_batch_size and batch_size
+        """
+        size = self.batch_size
+        if service.ewma_seconds_per_url:
+            size = min(size, int(self.target_batch_seconds / service.ewma_seconds_per_url))
+        if service.ewma_bytes_per_url:
+            size = min(size, int(self.max_batch_bytes / service.ewma_bytes_per_url))
+        
+        # Tail: share what is left with the idle services rather than taking it all
+        if remaining < size * (idle_services + 1):
+            size = math.ceil(remaining / (idle_services + 1))
+        
+        return max(self.min_batch_size, size)
     
     async def _process_batch_with_service(
         self,
-        session: aiohttp.ClientSession,
         service: ServiceInfo,
         urls: List[str],
-        batch_id: int
+        batch_id: int,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        timeout_is_failure: bool = True
     ) -> List[Dict[str, any]]:
         """
         Process a batch of URLs using a specific service.
         
         Args:
-            session: aiohttp session
             service: Service to use
             urls: List of URLs to process
             batch_id: Batch identifier for logging
-            
+            timeout: Request timeout (default: the renderer's)
+            timeout_is_failure: Count a timeout against the service; False when
+                                the batch is known to hold slow URLs
+        
         Returns:
             List of result dictionaries
         """
+        return [
+            result
+            async for result in self._stream_batch_with_service(
+                service, urls, batch_id, timeout, timeout_is_failure
+            )
+        ]
+    
+    async def _stream_batch_with_service(
+        self,
+        service: ServiceInfo,
+        urls: List[str],
+        batch_id: int,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        timeout_is_failure: bool = True
+    ) -> AsyncIterator[Dict[str, any]]:
+        """
+        Process a batch of URLs using a specific service, yielding each result as it is decoded.
+        
+        If the batch fails part-way (e.g. times out while the response is
+        streaming, or the response is cut off or malformed) or the response
+        leaves URLs out, the URLs without a result are yielded as failed.
+        
+        Args:
+            service: Service to use
+            urls: List of URLs to process
+            batch_id: Batch identifier for logging
+            timeout: Request timeout (default: the renderer's)
+            timeout_is_failure: Count a timeout against the service; False when
+                                the batch is known to hold slow URLs
+        
+        Yields:
+            Result dictionaries
+        """
         logger.info(f"Processing batch {batch_id} with service {service.endpoint} ({len(urls)} URLs)")
         
+        answered = set()
+        successful = failed = 0
+        error = None
+        # How the service goes back: None until the batch ends, then
+        # finish_batch or mark_service_failed
+        give_back = None
         try:
             payload = {"urls": urls}
+            headers = {'Content-Type': 'application/json'}
+            if self.stream_results:
+                headers['Accept'] = 'application/x-ndjson, application/json;q=0.9'
             
-            async with session.post(
+            # Pooled keep-alive connection: no TCP/TLS handshake per batch
+            async with self.service_pool.sessions.post(
                 service.endpoint,
                 json=payload,
-                headers={'Content-Type': 'application/json'}
+                headers=headers,
+                timeout=timeout or self.timeout
             ) as response:
                 if response.status != 200:
                     error_text = await response.text()
                     logger.error(f"Service {service.endpoint} returned status {response.status}: {error_text[:200]}")
-                    await self.service_pool.mark_service_failed(service)
-                    # Return failed results
-                    return [
-                        {
-                            "url": url,
-                            "html": None,
-                            "status": "failed",
-                            "error": f"Service returned status {response.status}: {error_text[:200]}"
-                        }
-                        for url in urls
-                    ]
-                
-                data = await response.json()
-                
-                # Process results
-                results = []
-                if "results" in data:
-                    for result in data["results"]:
-                        results.append({
-                            "url": result.get("url", ""),
-                            "html": result.get("html") if result.get("status") == "success" else None,
-                            "status": result.get("status", "failed"),
-                            "error": result.get("error") if result.get("status") != "success" else None
-                        })
+                    give_back = self.service_pool.mark_service_failed
+                    error = f"Service returned status {response.status}: {error_text[:200]}"
                 else:
-                    logger.warning(f"Unexpected response format from service {service.endpoint}")
-                    return [
-                        {
-                            "url": url,
-                            "html": None,
-                            "status": "failed",
-                            "error": "Unexpected response format from API"
+                    async for result in self._iter_response_results(response):
+                        status = result.get("status", "failed")
+                        answered.add(result.get("url", ""))
+                        if status == "success":
+                            successful += 1
+                        else:
+                            failed += 1
+                        yield {
+                            "url": result.get("url", ""),
+                            "html": result.get("html") if status == "success" else None,
+                            "status": status,
+                            "error": result.get("error") if status != "success" else None
                         }
-                        for url in urls
-                    ]
-                
-                successful = sum(1 for r in results if r["status"] == "success")
-                failed = len(results) - successful
-                logger.info(f"Batch {batch_id} completed on {service.endpoint}: {successful} successful, {failed} failed")
-                
-                # Mark service as in cooldown
-                await self.service_pool.mark_service_cooldown(service)
-                
-                return results
-                
+                    
+                    if not answered:
+                        logger.warning(f"Unexpected response format from service {service.endpoint}")
+                        error = "Unexpected response format from API"
+                    elif not answered.issuperset(urls):
+                        logger.warning(
+                            f"Batch {batch_id} on {service.endpoint}: no result for "
+                            f"{len(set(urls) - answered)} of {len(urls)} URLs"
+                        )
+                        error = "No result in service response"
+                    else:
+                        logger.info(f"Batch {batch_id} completed on {service.endpoint}: {successful} successful, {failed} failed")
+                    
+                    # Back to the pool; free again once its URL budget allows
+                    give_back = self.service_pool.finish_batch
+        
         except asyncio.TimeoutError:
-            logger.error(f"Batch {batch_id} timed out on service {service.endpoint}")
-            await self.service_pool.mark_service_failed(service)
-            return [
-                {
-                    "url": url,
-                    "html": None,
-                    "status": "failed",
-                    "error": "Request timeout"
-                }
-                for url in urls
-            ]
+            logger.error(
+                f"Batch {batch_id} timed out on service {service.endpoint} "
+                f"({len(answered)} of {len(urls)} results received)"
+            )
+            if timeout_is_failure:
+                give_back = self.service_pool.mark_service_failed
+            else:
+                give_back = self.service_pool.finish_batch
+            error = TIMEOUT_ERROR
         except Exception as e:
             logger.error(f"Batch {batch_id} failed on service {service.endpoint}: {e}")
-            await self.service_pool.mark_service_failed(service)
-            return [
-                {
-                    "url": url,
-                    "html": None,
-                    "status": "failed",
-                    "error": str(e)
-                }
-                for url in urls
-            ]
+            give_back = self.service_pool.mark_service_failed
+            error = str(e)
+        finally:
+            if give_back is None:
+                # Cancelled, or the consumer stopped iterating (GeneratorExit): the batch
+                # says nothing about the service, but it must not stay reserved
+                logger.debug(f"Batch {batch_id} on {service.endpoint} interrupted, returning the service")
+                give_back = self.service_pool.finish_batch
+            # Shielded so a repeated cancellation cannot leave the service reserved
+            await asyncio.shield(give_back(service))
+        
+        if error is not None:
+            for url in urls:
+                if url not in answered:
+                    yield {
+                        "url": url,
+                        "html": None,
+                        "status": "failed",
+                        "error": error
+                    }
+    
+    async def _iter_response_results(self, response: aiohttp.ClientResponse) -> AsyncIterator[Dict[str, any]]:
+        """
+        Decode the per-URL results of a render service response.
+        
+        NDJSON responses (one result object per line) and, with ijson
+        installed, JSON responses are decoded incrementally, so only one
+        page is held in memory at a time. Otherwise the whole JSON body is
+        decoded at once.
+        
+        Args:
+            response: Render service response
+        
+        Yields:
+            Raw result objects
+        """
+        content_type = response.headers.get('Content-Type', '')
+        if self.stream_results and 'ndjson' in content_type:
+            buffer = b''
+            async for chunk in response.content.iter_chunked(NDJSON_CHUNK_SIZE):
+                buffer += chunk
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+            if buffer.strip():
+                yield json.loads(buffer)
+        elif self.stream_results and _ijson is not None:
+            async for result in _ijson.items_async(response.content, 'results.item', use_float=True):
+                yield result
+        else:
+            data = await response.json()
+            if isinstance(data, dict) and "results" in data:
+                for result in data["results"]:
+                    yield result
     
     async def process_urls(
         self,
-        urls: List[str]
+        urls: List[str],
+        tried_services: Optional[Dict[str, Set[str]]] = None
     ) -> List[Dict[str, any]]:
         """
         Process URLs by distributing them across all available services in parallel.
         
         Args:
             urls: List of URLs that need JS rendering
+            tried_services: URL -> endpoints that already rendered it, used to send
+                            retries to a different service (updated in place)
             
         Returns:
-            List of result dictionaries with html, status, and error fields
+            List of result dictionaries with html, status, and error fields,
+            in input order
         """
-        if not urls:
-            return []
-        
-        # Split URLs into batches
-        batches = []
-        for i in range(0, len(urls), self.batch_size):
-            batch = urls[i:i + self.batch_size]
-            batches.append(batch)
-        
-        logger.info(f"Processing {len(urls)} URLs in {len(batches)} batches across {self.service_pool.get_service_count()} services")
-        
         all_results = []
-        batch_queue = asyncio.Queue()
+        async for results in self.process_as_completed(urls, tried_services):
+            all_results.extend(results)
         
-        # Add all batches to queue
-        for batch_num, batch_urls in enumerate(batches, 1):
-            await batch_queue.put((batch_num, batch_urls))
-        
-        async def process_batch_worker():
-            """Worker coroutine that processes batches from queue."""
-            while True:
-                batch_num = None
-                batch_urls = None
-                try:
-                    # Get batch from queue
-                    try:
-                        batch_num, batch_urls = await asyncio.wait_for(batch_queue.get(), timeout=1.0)
-                    except asyncio.TimeoutError:
-                        # Check if queue is empty
-                        if batch_queue.empty():
-                            break
-                        continue
-                    
-                    # Wait for an available service
-                    service = await self.service_pool.wait_for_available_service(timeout=300)
-                    if not service:
-                        logger.error(f"Timeout waiting for available service for batch {batch_num}")
-                        # Add failed results
-                        all_results.extend([
-                            {
-                                "url": url,
-                                "html": None,
-                                "status": "failed",
-                                "error": "No available service (timeout)"
-                            }
-                            for url in batch_urls
-                        ])
-                        batch_queue.task_done()
-                        continue
-                    
-                    # Mark service as processing
-                    await self.service_pool.mark_service_processing(service)
-                    
-                    # Process batch
-                    try:
-                        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                            batch_results = await self._process_batch_with_service(
-                                session, service, batch_urls, batch_num
-                            )
-                            all_results.extend(batch_results)
-                    finally:
-                        batch_queue.task_done()
-                    
-                except Exception as e:
-                    logger.error(f"Error in batch worker: {e}")
-                    if batch_num is not None and batch_urls is not None:
-                        # Add failed results
-                        all_results.extend([
-                            {
-                                "url": url,
-                                "html": None,
-                                "status": "failed",
-                                "error": str(e)
-                            }
-                            for url in batch_urls
-                        ])
-                        batch_queue.task_done()
-        
-        # Start worker tasks (one per service for maximum parallelism)
-        num_workers = min(len(batches), self.service_pool.get_service_count())
-        workers = [asyncio.create_task(process_batch_worker()) for _ in range(num_workers)]
-        
-        # Wait for all batches to complete
-        await batch_queue.join()
-        
-        # Cancel workers
-        for worker in workers:
-            worker.cancel()
-        
-        # Wait for workers to finish
-        await asyncio.gather(*workers, return_exceptions=True)
+        order = {url: i for i, url in reversed(list(enumerate(urls)))}
+        all_results.sort(key=lambda result: order.get(result["url"], len(urls)))
         
         # Separate successful and failed URLs
         successful = [r for r in all_results if r["status"] == "success"]
@@ -255,4 +351,298 @@ class AsyncMultiServiceJSRenderer:
         logger.info(f"Service status: {status_summary}")
         
         return all_results
-
+    
+    async def process_as_completed(
+        self,
+        urls: List[str],
+        tried_services: Optional[Dict[str, Set[str]]] = None
+    ) -> AsyncIterator[List[Dict[str, any]]]:
+        """
+        Render URLs across the services, yielding results as the services return them.
+        
+        A URL is preferably sent to a service that has not rendered it yet:
+        workers ask the pool to avoid the services that already tried the
+        next pending URL, and fill each batch with URLs new to the service
+        they got. Timed-out batches are bisected until their slow URLs are
+        isolated; those come back failed with "slow_lane": True.
+        
+        Args:
+            urls: List of URLs that need JS rendering
+            tried_services: URL -> endpoints that already rendered it (updated in place)
+            
+        Yields:
+            Lists of result dictionaries, each page's result as soon as it is decoded
+        """
+        if not urls:
+            return
+        if tried_services is None:
+            tried_services = {}
+        
+        pending = list(urls)
+        # Halves of timed-out batches, each sent on its own
+        suspects: Deque[List[str]] = deque()
+        # Isolated slow URLs waiting for their slow lane attempt
+        slow_lane: Deque[str] = deque()
+        workers: Set[asyncio.Task] = set()
+        max_workers = self.service_pool.get_service_count() * self.service_pool.max_concurrent_batches
+        # Decoded pages waiting for the consumer: about one per running batch. A full
+        # queue holds the batches back (and with them the reads of their responses).
+        done: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_workers))
+        batch_counter = 0
+        holding = 0  # workers that got a service and have not taken their batch yet
+        
+        logger.info(f"Processing {len(urls)} URLs across {self.service_pool.get_service_count()} services")
+        
+        def has_work() -> bool:
+            return bool(pending or suspects or slow_lane)
+        
+        def next_url() -> str:
+            return slow_lane[0] if slow_lane else suspects[0][0] if suspects else pending[0]
+        
+        def spawn_worker():
+            if sum(1 for task in workers if not task.done()) < max_workers:
+                workers.add(asyncio.create_task(worker()))
+        
+        def take_batch(service: ServiceInfo, size: int) -> List[str]:
+            """
+            Take up to size pending URLs, preferring ones the service has not tried,
+            most-tried first (they have the fewest other services left).
+            """
+            fresh = [i for i, url in enumerate(pending) if service.endpoint not in tried_services.get(url, ())]
+            fresh.sort(key=lambda i: -len(tried_services.get(pending[i], ())))
+            # Every pending URL was already tried here: retry on the same service
+            picked = set((fresh or range(len(pending)))[:size])
+            batch = [url for i, url in enumerate(pending) if i in picked]
+            pending[:] = [url for i, url in enumerate(pending) if i not in picked]
+            return batch
+        
+        def slow_results(batch_urls: List[str]) -> List[Dict[str, any]]:
+            return [
+                {
+                    "url": url,
+                    "html": None,
+                    "status": "failed",
+                    "error": "Slow URL: timed out on its own",
+                    "slow_lane": True
+                }
+                for url in batch_urls
+            ]
+        
+        async def run_batch(
+            service: ServiceInfo,
+            batch_num: int,
+            batch_urls: List[str],
+            suspect: bool = False,
+            in_slow_lane: bool = False
+        ):
+            """
+            Render one batch on a reserved service, passing each result on as
+            soon as it is decoded, and record how the batch went.
+            
+            URLs that time out are bisected or sent to the slow lane instead.
+            """
+            for url in batch_urls:
+                tried_services.setdefault(url, set()).add(service.endpoint)
+            started = time.monotonic()
+            delivered = set()
+            timed_out: List[str] = []
+            successful = html_bytes = 0
+            stream = self._stream_batch_with_service(
+                service, batch_urls, batch_num,
+                timeout=self.slow_lane_timeout if in_slow_lane else None,
+                # A batch already known to hold slow URLs says nothing about the service
+                timeout_is_failure=not (suspect or in_slow_lane)
+            )
+            try:
+                async for result in stream:
+                    delivered.add(result["url"])
+                    if result["error"] == TIMEOUT_ERROR and self.bisect_timeouts:
+                        timed_out.append(result["url"])
+                        continue
+                    if result["status"] == "success":
+                        successful += 1
+                        html_bytes += len(result["html"] or "")
+                    await done.put([result])
+            except Exception as e:
+                # Raised here, not by the service: the stream still returns the service
+                logger.error(f"Error processing batch {batch_num}: {e}")
+                await done.put([
+                    {
+                        "url": url,
+                        "html": None,
+                        "status": "failed",
+                        "error": str(e)
+                    }
+                    for url in batch_urls
+                    if url not in delivered
+                ])
+            finally:
+                # Left early (error or cancellation): the stream returns the service as it closes
+                await stream.aclose()
+            
+            # Feed the service's averages used for service selection and batch sizing
+            await self.service_pool.record_batch_result(
+                service,
+                url_count=len(batch_urls),
+                successful=successful,
+                elapsed=time.monotonic() - started,
+                html_bytes=html_bytes
+            )
+            
+            if not timed_out:
+                return
+            if in_slow_lane or (len(timed_out) == 1 and self.slow_lane_timeout is None):
+                await done.put(slow_results(timed_out))
+            elif len(timed_out) == 1:
+                logger.info(f"Isolated slow URL {timed_out[0]}, retrying it in the slow lane")
+                slow_lane.append(timed_out[0])
+                spawn_worker()
+            else:
+                # Bisect: each half runs on its own so the healthy one is not held back
+                middle = len(timed_out) // 2
+                logger.info(f"Batch {batch_num} timed out, bisecting {len(timed_out)} URLs")
+                suspects.append(timed_out[:middle])
+                suspects.append(timed_out[middle:])
+                spawn_worker()
+                spawn_worker()
+        
+        async def worker():
+            """Take work sized for each service this renderer gets, until none is left."""
+            nonlocal batch_counter, holding
+            while has_work():
+                service = await self.service_pool.acquire_service(
+                    client=self,
+                    timeout=300,
+                    avoid=tried_services.get(next_url())
+                )
+                if service and not (suspects or slow_lane) and pending and all(
+                    service.endpoint in tried_services.get(url, ()) for url in pending
+                ):
+                    # The URLs left have all been tried here: swap once for a service
+                    # that has not tried the next one (the same one if no other is free)
+                    await self.service_pool.release_service(service)
+                    service = await self.service_pool.acquire_service(
+                        client=self,
+                        timeout=300,
+                        avoid=tried_services.get(next_url()) if has_work() else None
+                    )
+                if not service:
+                    # Nothing freed up in time: fail everything not yet taken
+                    timed_out = pending + [url for group in suspects for url in group] + list(slow_lane)
+                    logger.error(f"Timeout waiting for available service ({len(timed_out)} URLs left)")
+                    pending.clear()
+                    suspects.clear()
+                    slow_lane.clear()
+                    await done.put([
+                        {
+                            "url": url,
+                            "html": None,
+                            "status": "failed",
+                            "error": "No available service (timeout)"
+                        }
+                        for url in timed_out
+                    ])
+                    return
+                
+                # Services handed to other workers in the same dispatch count as idle too
+                holding += 1
+                try:
+                    await asyncio.sleep(0)
+                    idle_services = len(await self.service_pool.get_all_available_services()) + holding - 1
+                except BaseException:
+                    # Cancelled before the batch started: the service goes back unused
+                    await asyncio.shield(self.service_pool.release_service(service))
+                    raise
+                finally:
+                    holding -= 1
+                if not has_work():
+                    # Other workers took the rest while this one waited
+                    await self.service_pool.release_service(service)
+                    return
+                
+                suspect = in_slow_lane = False
+                if slow_lane:
+                    batch_urls = [slow_lane.popleft()]
+                    in_slow_lane = True
+                elif suspects:
+                    batch_urls = suspects.popleft()
+                    suspect = True
+                else:
+                    batch_urls = None
+                
+                try:
+                    size = await self.service_pool.reserve_urls(
+                        service,
+                        len(batch_urls) if batch_urls else self._batch_size_for(service, len(pending), idle_services)
+                    )
+                except BaseException:
+                    await asyncio.shield(self.service_pool.release_service(service))
+                    raise
+                if batch_urls is not None and size < len(batch_urls):
+                    # Not enough budget for the whole group: put the rest back
+                    if in_slow_lane:
+                        slow_lane.appendleft(batch_urls[0])
+                    else:
+                        suspects.appendleft(batch_urls[size:])
+                    batch_urls = batch_urls[:size]
+                if not size:
+                    # Another batch on this service used up its budget first
+                    await self.service_pool.release_service(service)
+                    continue
+                if batch_urls is None:
+                    batch_urls = take_batch(service, size)
+                
+                batch_counter += 1
+                await run_batch(service, batch_counter, batch_urls, suspect, in_slow_lane)
+        
+        async def run_workers():
+            # One worker per service this renderer could use at once; the pool decides the order.
+            # Bisection adds workers for the halves of timed-out batches.
+            consumer_gone = False
+            try:
+                for _ in range(max(1, min(max_workers, math.ceil(len(urls) / self.min_batch_size)))):
+                    spawn_worker()
+                while workers:
+                    finished, _ = await asyncio.wait(set(workers), return_when=asyncio.FIRST_COMPLETED)
+                    workers.difference_update(finished)
+                    for task in finished:
+                        task.result()
+            except asyncio.CancelledError:
+                # Only cancelled once the consumer has stopped reading
+                consumer_gone = True
+                raise
+            finally:
+                for task in workers:
+                    task.cancel()
+                # Let cancelled workers hand their services back before finishing
+                await asyncio.gather(*workers, return_exceptions=True)
+                if not consumer_gone:
+                    await done.put(None)
+        
+        runner = asyncio.create_task(run_workers())
+        try:
+            while True:
+                results = await done.get()
+                if results is None:
+                    break
+                yield results
+            await runner
+        finally:
+            if not runner.done():
+                # Consumer stopped early or was cancelled: wait until every service is returned
+                runner.cancel()
+                await asyncio.gather(runner, return_exceptions=True)
+            if self._owns_pool:
+                # Keep-alive only pays off across this render's batches; the next render reconnects
+                await self.service_pool.sessions.close()
+    
+    async def close(self):
+        """Close the renderer's own service pool and its connections (a shared pool is left open)."""
+        if self._owns_pool:
+            await self.service_pool.close()
+    
+    async def __aenter__(self) -> "AsyncMultiServiceJSRenderer":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,93 @@
+"""
+Shared aiohttp connection pooling for the custom JS render services.
+"""
+
+import logging
+import aiohttp
+from typing import Dict
+from .session_pool import SessionPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEPALIVE_TIMEOUT = 75  # seconds an idle connection is kept open
+DEFAULT_DNS_CACHE_TTL = 300  # seconds a resolved address is reused
+
+
+class AsyncSessionPool:
+    """Pool of long-lived keep-alive aiohttp sessions, one per host."""
+
+    def __init__(
+        self,
+        limit_per_host: int = 2,
+        keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = DEFAULT_DNS_CACHE_TTL,
+        compress_requests: bool = False
+    ):
+        """
+        Initialize the session pool.
+
+        Sessions are created on first use, so the pool must be used from the
+        event loop that will run the requests.
+
+        Args:
+            limit_per_host: Maximum number of connections per host
+            keepalive_timeout: Seconds an idle connection is kept open for reuse
+            dns_cache_ttl: Seconds a DNS lookup is cached (0 disables the cache)
+            compress_requests: Gzip request bodies (the host must accept
+                               Content-Encoding: gzip; responses are always
+                               accepted compressed)
+        """
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.compress_requests = compress_requests
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Create a session with a keep-alive connector and DNS cache."""
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=self.dns_cache_ttl > 0,
+            ttl_dns_cache=self.dns_cache_ttl or None
+        )
+        # Timeouts are set per request
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=None)
+        )
+
+    def get_session(self, url: str) -> aiohttp.ClientSession:
+        """
+        Get the long-lived session for the host of a URL.
+
+        Args:
+            url: URL whose host the session is keyed on
+
+        Returns:
+            aiohttp.ClientSession shared by every request to that host
+        """
+        key = SessionPool._host_key(url)
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = self._create_session()
+            self._sessions[key] = session
+            logger.debug(f"Created pooled aiohttp session for {key}")
+        return session
+
+    def post(self, url: str, **kwargs):
+        """
+        Issue a POST request through the pooled session for the URL's host.
+
+        Use as ``async with pool.post(url, json=...) as response``.
+        """
+        if self.compress_requests and "compress" not in kwargs:
+            kwargs["compress"] = "gzip"
+        return self.get_session(url).post(url, **kwargs)
+
+    async def close(self):
+        """Close every pooled session and drop their connections."""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            await session.close()
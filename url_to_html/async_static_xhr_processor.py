@@ -5,9 +5,10 @@ Async processor for static and XHR fetches with high concurrency.
 import logging
 import asyncio
 import aiohttp
-from typing import List, Dict, Optional, Tuple
-from urllib.parse import urljoin, urlparse
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from .content_analyzer import ContentAnalyzer
+from .analyzer_executor import AnalyzerExecutor
+from .xhr_pattern_index import XHRPatternIndex, generate_api_candidates
 from .exceptions import TimeoutError, InvalidURLError
 
 logger = logging.getLogger(__name__)
@@ -20,7 +21,11 @@ class AsyncStaticXHRProcessor:
         self,
         timeout: int = 30,
         headers: Optional[Dict[str, str]] = None,
-        max_concurrent: int = 50
+        max_concurrent: int = 50,
+        xhr_max_parallel: int = 4,
+        pattern_index: Optional[XHRPatternIndex] = None,
+        analyzer_executor: Optional[AnalyzerExecutor] = None,
+        parser_backend: Optional[str] = "auto"
     ):
         """
         Initialize the async processor.
@@ -28,10 +33,19 @@ class AsyncStaticXHRProcessor:
         Args:
             timeout: Request timeout in seconds
             headers: Custom headers to include in requests
-            max_concurrent: Maximum concurrent requests
+            max_concurrent: Maximum URLs processed at once (each with up to
+                            xhr_max_parallel requests in flight)
+            xhr_max_parallel: Maximum XHR candidate endpoints in flight per URL (per host)
+            pattern_index: Learned per-domain index restricting which XHR
+                           endpoint patterns are probed (default: probe all)
+            analyzer_executor: Process pool that runs content analysis off the
+                               event loop (default: analyze inline)
+            parser_backend: HTML parser for content analysis (default: lxml if installed)
         """
         self.timeout = aiohttp.ClientTimeout(total=timeout)
         self.max_concurrent = max_concurrent
+        self.xhr_max_parallel = max(1, xhr_max_parallel)
+        self.pattern_index = pattern_index
         self.default_headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -43,7 +57,16 @@ class AsyncStaticXHRProcessor:
         if headers:
             self.default_headers.update(headers)
         
-        self.content_analyzer = ContentAnalyzer()
+        self.content_analyzer = ContentAnalyzer(parser_backend=parser_backend)
+        self.analyzer_executor = analyzer_executor
+    
+    async def _should_fallback(self, html_content: str, status_code: int) -> Tuple[bool, str]:
+        """Run ContentAnalyzer.should_fallback, in the analyzer process pool if configured."""
+        if self.analyzer_executor is None:
+            return self.content_analyzer.should_fallback(html_content, status_code)
+        return await self.analyzer_executor.should_fallback(
+            self.content_analyzer, html_content, status_code
+        )
     
     async def _fetch_static(
         self,
@@ -80,39 +103,57 @@ class AsyncStaticXHRProcessor:
     
     def _generate_api_endpoints(self, url: str) -> List[str]:
         """Generate potential API endpoints based on the URL."""
-        parsed = urlparse(url)
-        base_url = f"{parsed.scheme}://{parsed.netloc}"
-        path = parsed.path.rstrip('/')
-        
-        endpoints = []
-        api_patterns = [
-            '/api' + path,
-            '/api/v1' + path,
-            '/api/v2' + path,
-            '/api/data' + path,
-            path + '/data',
-            path + '/api',
-            '/data' + path,
-        ]
-        
-        for pattern in api_patterns:
-            endpoints.append(urljoin(base_url, pattern))
-        
-        if path:
-            endpoints.append(urljoin(base_url, path + '.json'))
-        
-        if parsed.query:
-            for pattern in api_patterns[:3]:
-                endpoints.append(urljoin(base_url, pattern + '?' + parsed.query))
+        return [endpoint for _, endpoint in generate_api_candidates(url)]
+    
+    async def _fetch_xhr_candidate(
+        self,
+        session: aiohttp.ClientSession,
+        endpoint: str,
+        headers: Dict[str, str],
+        semaphore: asyncio.Semaphore
+    ) -> Tuple[Optional[str], int]:
+        """
+        Fetch one XHR candidate endpoint.
         
-        return endpoints
+        Returns:
+            Tuple of (response text for a 200 response else None, status_code).
+            status_code is 0 if no response was received.
+        """
+        async with semaphore:
+            try:
+                async with session.get(endpoint, headers=headers) as response:
+                    if response.status != 200:
+                        return None, response.status
+                    try:
+                        return await response.text(), response.status
+                    except Exception:
+                        content = await response.read()
+                        try:
+                            return content.decode('utf-8'), response.status
+                        except:
+                            return content.decode('utf-8', errors='ignore'), response.status
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug(f"XHR fetch failed for endpoint {endpoint}: {e}")
+                return None, 0
     
     async def _fetch_xhr(
         self,
         session: aiohttp.ClientSession,
         url: str
-    ) -> Tuple[Optional[str], int]:
-        """Fetch URL using XHR/API endpoints."""
+    ) -> Tuple[Optional[str], int, Optional[Tuple[bool, str]]]:
+        """
+        Fetch URL using XHR/API endpoints.
+        
+        The original URL and all generated endpoints are raced concurrently
+        (at most xhr_max_parallel in flight). The first response that passes
+        ContentAnalyzer.should_fallback wins and the rest are cancelled; if
+        none passes, the highest-priority 200 response is returned.
+        
+        Returns:
+            Tuple of (html_content, status_code, (should_fallback, reason))
+        """
         xhr_headers = self.default_headers.copy()
         xhr_headers.update({
             'Accept': 'application/json, text/html, */*',
@@ -120,91 +161,111 @@ class AsyncStaticXHRProcessor:
             'Referer': url,
         })
         
-        # Try original URL with XHR headers
+        # (pattern_key, endpoint); the original URL has no pattern key
+        api_candidates = generate_api_candidates(url)
+        if self.pattern_index is not None:
+            api_candidates = self.pattern_index.select(url, api_candidates)
+        candidates = [(None, url)] + api_candidates
+        
+        semaphore = asyncio.Semaphore(self.xhr_max_parallel)
+        tasks = {
+            asyncio.ensure_future(
+                self._fetch_xhr_candidate(session, endpoint, xhr_headers, semaphore)
+            ): index
+            for index, (_, endpoint) in enumerate(candidates)
+        }
+        # (priority, content, verdict) of the best rejected 200 response
+        fallback = None
+        
         try:
-            async with session.get(url, headers=xhr_headers) as response:
-                if response.status == 200:
-                    try:
-                        content = await response.text()
-                        logger.debug(f"XHR fetch successful (original): {url}")
-                        return content, response.status
-                    except Exception:
-                        content = await response.read()
-                        try:
-                            content = content.decode('utf-8')
-                        except:
-                            content = content.decode('utf-8', errors='ignore')
-                        return content, response.status
-        except Exception as e:
-            logger.debug(f"XHR fetch failed for original URL {url}: {e}")
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = tasks[task]
+                    pattern, endpoint = candidates[index]
+                    content, candidate_status = task.result()
+                    accepted = False
+                    if content is not None:
+                        verdict = await self._should_fallback(content, 200)
+                        accepted = not verdict[0]
+                        if not accepted and (fallback is None or index < fallback[0]):
+                            fallback = (index, content, verdict)
+                    
+                    # Network errors say nothing about the pattern itself
+                    if pattern is not None and self.pattern_index is not None and candidate_status:
+                        self.pattern_index.record(url, pattern, accepted)
+                    
+                    if accepted:
+                        logger.debug(f"XHR fetch successful ({'original' if index == 0 else 'endpoint'}): {endpoint}")
+                        return content, 200, verdict
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
         
-        # Try alternative endpoints
-        api_endpoints = self._generate_api_endpoints(url)
-        for endpoint in api_endpoints:
-            try:
-                async with session.get(endpoint, headers=xhr_headers) as response:
-                    if response.status == 200:
-                        try:
-                            content = await response.text()
-                            logger.debug(f"XHR fetch successful (endpoint): {endpoint}")
-                            return content, response.status
-                        except Exception:
-                            content = await response.read()
-                            try:
-                                content = content.decode('utf-8')
-                            except:
-                                content = content.decode('utf-8', errors='ignore')
-                            return content, response.status
-            except Exception:
-                continue
+        if fallback is not None:
+            return fallback[1], 200, fallback[2]
         
         logger.debug(f"XHR fetch failed for all endpoints: {url}")
-        return None, 0
+        return None, 0, None
     
     async def _process_single_url(
         self,
         session: aiohttp.ClientSession,
-        url: str
+        url: str,
+        skip_static: bool = False
     ) -> Dict[str, any]:
         """
         Process a single URL through static and XHR fetches.
         
+        Args:
+            session: aiohttp session
+            url: URL to process
+            skip_static: Start at the XHR tier (static is known to fail for this domain)
+        
         Returns:
             {
                 "url": str,
                 "html": Optional[str],
                 "method": "static" | "xhr" | None,
                 "needs_js": bool,
-                "error": Optional[str]
+                "error": Optional[str],
+                "tiers_tried": List[str]
             }
         """
-        # Try static fetch first
-        html_content, status_code = await self._fetch_static(session, url)
+        tiers_tried = []
         
-        if html_content is not None:
-            should_fallback, reason = self.content_analyzer.should_fallback(
-                html_content, status_code
-            )
+        # Try static fetch first
+        if not skip_static:
+            tiers_tried.append("static")
+            html_content, status_code = await self._fetch_static(session, url)
             
-            if not should_fallback:
-                logger.debug(f"Static fetch successful for {url}")
-                return {
-                    "url": url,
-                    "html": html_content,
-                    "method": "static",
-                    "needs_js": False,
-                    "error": None
-                }
-            else:
-                logger.debug(f"Static fetch returned insufficient content for {url}: {reason}")
+            if html_content is not None:
+                should_fallback, reason = await self._should_fallback(
+                    html_content, status_code
+                )
+                
+                if not should_fallback:
+                    logger.debug(f"Static fetch successful for {url}")
+                    return {
+                        "url": url,
+                        "html": html_content,
+                        "method": "static",
+                        "needs_js": False,
+                        "error": None,
+                        "tiers_tried": tiers_tried
+                    }
+                else:
+                    logger.debug(f"Static fetch returned insufficient content for {url}: {reason}")
         
         # Try XHR fetch
-        html_content, status_code = await self._fetch_xhr(session, url)
+        tiers_tried.append("xhr")
+        # Candidates are raced and validated inside _fetch_xhr
+        html_content, status_code, verdict = await self._fetch_xhr(session, url)
         
         if html_content is not None:
-            should_fallback, reason = self.content_analyzer.should_fallback(
-                html_content, status_code
-            )
+            should_fallback, reason = verdict
             
             if not should_fallback:
                 logger.debug(f"XHR fetch successful for {url}")
@@ -213,7 +274,8 @@ class AsyncStaticXHRProcessor:
                     "html": html_content,
                     "method": "xhr",
                     "needs_js": False,
-                    "error": None
+                    "error": None,
+                    "tiers_tried": tiers_tried
                 }
             else:
                 logger.debug(f"XHR fetch returned insufficient content for {url}: {reason}")
@@ -225,51 +287,98 @@ class AsyncStaticXHRProcessor:
             "html": None,
             "method": None,
             "needs_js": True,
-            "error": "Static and XHR fetches failed or returned skeleton content"
+            "error": "Static and XHR fetches failed or returned skeleton content",
+            "tiers_tried": tiers_tried
         }
     
-    async def process_batch(
+    async def _process_indexed(
         self,
-        urls: List[str]
-    ) -> List[Dict[str, any]]:
+        urls: List[str],
+        start_tiers: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Tuple[int, Dict[str, any]]]:
         """
-        Process a batch of URLs with high concurrency.
+        Process URLs with high concurrency, yielding (index, result) as each URL finishes.
         
         Args:
             urls: List of URLs to process
-            
-        Returns:
-            List of result dictionaries
+            start_tiers: Optional URL -> starting tier ("static" or "xhr")
         """
         semaphore = asyncio.Semaphore(self.max_concurrent)
+        start_tiers = start_tiers or {}
         
-        async def process_with_semaphore(session: aiohttp.ClientSession, url: str):
+        async def process_with_semaphore(session: aiohttp.ClientSession, index: int, url: str):
             async with semaphore:
-                return await self._process_single_url(session, url)
+                try:
+                    return index, await self._process_single_url(
+                        session, url, skip_static=start_tiers.get(url) == "xhr"
+                    )
+                except Exception as e:
+                    logger.error(f"Error processing {url}: {e}")
+                    return index, {
+                        "url": url,
+                        "html": None,
+                        "method": None,
+                        "needs_js": True,
+                        "error": str(e),
+                        "tiers_tried": []
+                    }
         
-        connector = aiohttp.TCPConnector(limit=self.max_concurrent)
+        # Each URL may have xhr_max_parallel candidate requests in flight; time spent
+        # waiting for a free connection would count against the request timeout
+        connector = aiohttp.TCPConnector(limit=self.max_concurrent * self.xhr_max_parallel)
         async with aiohttp.ClientSession(
             timeout=self.timeout,
             connector=connector,
             headers=self.default_headers
         ) as session:
-            tasks = [process_with_semaphore(session, url) for url in urls]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            tasks = [
+                asyncio.ensure_future(process_with_semaphore(session, index, url))
+                for index, url in enumerate(urls)
+            ]
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    yield await next_result
+            finally:
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+                if self.pattern_index is not None:
+                    self.pattern_index.flush()
+    
+    async def process_as_completed(
+        self,
+        urls: List[str],
+        start_tiers: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Dict[str, any]]:
+        """
+        Process URLs with high concurrency, yielding each result as soon as it is ready.
+        
+        Args:
+            urls: List of URLs to process
+            start_tiers: Optional URL -> starting tier ("static" or "xhr")
             
-            # Handle exceptions
-            processed_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logger.error(f"Error processing {urls[i]}: {result}")
-                    processed_results.append({
-                        "url": urls[i],
-                        "html": None,
-                        "method": None,
-                        "needs_js": True,
-                        "error": str(result)
-                    })
-                else:
-                    processed_results.append(result)
+        Yields:
+            Result dictionaries in completion order
+        """
+        async for _, result in self._process_indexed(urls, start_tiers):
+            yield result
+    
+    async def process_batch(
+        self,
+        urls: List[str],
+        start_tiers: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, any]]:
+        """
+        Process a batch of URLs with high concurrency.
+        
+        Args:
+            urls: List of URLs to process
+            start_tiers: Optional URL -> starting tier ("static" or "xhr")
             
-            return processed_results
-
+        Returns:
+            List of result dictionaries (same order as urls)
+        """
+        processed_results = [None] * len(urls)
+        async for index, result in self._process_indexed(urls, start_tiers):
+            processed_results[index] = result
+        return processed_results
@@ -4,6 +4,25 @@ Configuration for batch processing.
 
 from typing import Optional, Dict, List
 from urllib.parse import urlparse
+from .analyzer_executor import DEFAULT_ANALYZER_WORKERS
+
+
+# Custom JS rendering services used when none are configured
+DEFAULT_CUSTOM_JS_SERVICE_ENDPOINTS = (
+    "easygoing-strength-copy-2-copy-2-production.up.railway.app",
+    "easygoing-strength-copy-2-copy-1-production.up.railway.app",
+    "easygoing-strength-copy-copy-1-production.up.railway.app",
+    "easygoing-strength-copy-2-copy-production.up.railway.app",
+    "easygoing-strength-copy-2-production.up.railway.app",
+    "easygoing-strength-copy-production.up.railway.app",
+    "easygoing-strength-copy-1-production.up.railway.app",
+    "easygoing-strength-copy-copy-production.up.railway.app",
+    "easygoing-strength-production-d985.up.railway.app",
+    "easygoing-strength-copy-3-production.up.railway.app",
+    "easygoing-strength-copy-copy-copy-2-production.up.railway.app",
+    "easygoing-strength-copy-copy-copy-production.up.railway.app",
+    "easygoing-strength-copy-copy-copy-1-production.up.railway.app",
+)
 
 
 def _normalize_domain(value: Optional[str]) -> Optional[str]:
@@ -43,14 +62,33 @@ class BatchFetcherConfig:
         static_xhr_concurrency: int = 50,
         static_xhr_timeout: int = 30,
         static_xhr_headers: Optional[Dict[str, str]] = None,
+        xhr_max_parallel: int = 4,
+        xhr_pattern_index_path: Optional[str] = None,
+        xhr_pattern_exploration_rate: float = 0.1,
+        xhr_pattern_max_failures: int = 5,
         
         # Custom JS Service (Multi-Service)
         custom_js_service_endpoints: Optional[List[str]] = None,
         custom_js_batch_size: int = 20,
         custom_js_cooldown_seconds: int = 120,  # 2 minutes
+        custom_js_rate_limit_urls: Optional[int] = None,
+        custom_js_rate_limit_window_seconds: Optional[float] = None,
+        custom_js_max_concurrent_batches: int = 1,
         custom_js_timeout: int = 300,  # 5 minutes for batch
+        custom_js_bisect_timeouts: bool = True,
+        custom_js_slow_lane_timeout: Optional[int] = None,
+        custom_js_stream_results: bool = True,
+        custom_js_keepalive_timeout: float = 75,
+        custom_js_dns_cache_ttl: int = 300,
+        custom_js_compress_requests: bool = False,
         custom_js_max_retries: int = 10,  # Max retry attempts for failed/skeleton URLs
+        custom_js_retry_backoff_seconds: float = 2.0,
+        custom_js_max_retry_backoff_seconds: float = 60.0,
         custom_js_skip_domains: Optional[List[str]] = None,
+        custom_js_probe_url: Optional[str] = None,
+        custom_js_probe_backoff_seconds: int = 30,
+        custom_js_min_batch_size: int = 1,
+        custom_js_target_batch_seconds: Optional[float] = None,
         
         # Decodo Web Scraping API (fallback only)
         decodo_enabled: bool = True,
@@ -65,12 +103,32 @@ class BatchFetcherConfig:
         decodo_results_endpoint: Optional[str] = None,
         decodo_poll_interval: int = 2,
         decodo_max_poll_attempts: int = 30,
+        decodo_submit_chunk_size: int = 25,
+        decodo_submit_retries: int = 2,
+        decodo_max_concurrent_submissions: int = 4,
+        decodo_poll_qps: float = 20,
+        decodo_poll_mass_step: float = 0.3,
+        decodo_callback_url: Optional[str] = None,
+        decodo_callback_poll_interval: float = 30,
+        decodo_task_journal_path: Optional[str] = None,
+        decodo_task_journal_max_age: float = 3600,
+        
+        # Learned tier routing
+        tier_stats_path: Optional[str] = None,
+        tier_exploration_rate: float = 0.05,
+        
+        # Streaming pipeline
+        pipeline_queue_size: int = 1000,
+        pipeline_linger_seconds: float = 0.5,
+        pipeline_decodo_batch_size: int = 100,
         
         # Content analyzer
         min_content_length: int = 1000,
         min_text_length: int = 200,
         min_meaningful_elements: int = 5,
         text_to_markup_ratio: float = 0.001,
+        analyzer_workers: int = DEFAULT_ANALYZER_WORKERS,
+        parser_backend: str = "auto",
         
         # General
         save_outputs: bool = True,
@@ -84,13 +142,43 @@ class BatchFetcherConfig:
             static_xhr_concurrency: Max concurrent static/XHR requests
             static_xhr_timeout: Timeout for static/XHR requests
             static_xhr_headers: Custom headers for static/XHR
+            xhr_max_parallel: Max XHR candidate endpoints raced in parallel per URL (default: 4)
+            xhr_pattern_index_path: SQLite file for the learned per-domain XHR pattern index (default: disabled)
+            xhr_pattern_exploration_rate: Chance of probing an unproven pattern on a learned domain (default: 0.1)
+            xhr_pattern_max_failures: Consecutive failures before a pattern is skipped on a domain (default: 5)
             
             custom_js_api_url: Custom JS rendering API endpoint
-            custom_js_batch_size: URLs per batch (default: 20)
-            custom_js_cooldown_seconds: Cooldown between batches (default: 120)
+            custom_js_batch_size: Maximum URLs per batch (default: 20)
+            custom_js_cooldown_seconds: Window in which a service may render
+                                        custom_js_batch_size URLs (default: 120)
+            custom_js_rate_limit_urls: URLs per service per window, also the burst size
+                                       (default: custom_js_batch_size)
+            custom_js_rate_limit_window_seconds: Window of that budget; 0 disables it
+                                                 (default: custom_js_cooldown_seconds)
+            custom_js_max_concurrent_batches: Batches one service may run at once (default: 1)
             custom_js_timeout: Timeout for batch requests
+            custom_js_bisect_timeouts: Split timed-out batches until the slow URLs are
+                                       isolated (default: True)
+            custom_js_slow_lane_timeout: Timeout of one last custom JS attempt at an
+                                         isolated slow URL (default: None, straight to Decodo)
+            custom_js_stream_results: Decode render service responses result by result
+                                      (NDJSON, or JSON with ijson installed) (default: True)
+            custom_js_keepalive_timeout: Seconds an idle connection to a render service
+                                         is kept open for the next batch (default: 75)
+            custom_js_dns_cache_ttl: Seconds render service DNS lookups are cached (default: 300)
+            custom_js_compress_requests: Gzip batch request bodies; the services must
+                                         accept Content-Encoding: gzip (default: False)
             custom_js_max_retries: Max retry attempts for failed/skeleton URLs (default: 10)
+            custom_js_retry_backoff_seconds: Wait before a URL's first retry, doubled per
+                                             further attempt (default: 2)
+            custom_js_max_retry_backoff_seconds: Cap on the per-URL retry wait (default: 60)
             custom_js_skip_domains: Domains that should bypass custom JS and go straight to Decodo
+            custom_js_probe_url: Page rendered to health-check a failed service (default: example.com)
+            custom_js_probe_backoff_seconds: Wait before probing a failed service, doubled per
+                                             consecutive failed probe (default: 30)
+            custom_js_min_batch_size: Smallest batch sent to a service (default: 1)
+            custom_js_target_batch_seconds: Render time batches are sized for, per service
+                                            (default: a fifth of custom_js_timeout)
             
             decodo_enabled: Whether to use Decodo as fallback
             decodo_max_concurrent: Max concurrent Decodo polling requests (default: 50)
@@ -104,11 +192,37 @@ class BatchFetcherConfig:
             decodo_results_endpoint: Results API endpoint base (default: from env)
             decodo_poll_interval: Polling interval in seconds (default: 2)
             decodo_max_poll_attempts: Max polling attempts per task (default: 30)
+            decodo_submit_chunk_size: Max URLs per Decodo submission; each chunk is
+                                      polled as soon as it is accepted (default: 25)
+            decodo_submit_retries: Retries of a failed chunk submission (default: 2)
+            decodo_max_concurrent_submissions: Decodo submissions in flight at once (default: 4)
+            decodo_poll_qps: Decodo result polls per second across all pending tasks;
+                             0 disables the limit (default: 20)
+            decodo_poll_mass_step: Share of the still-running tasks each poll waits to
+                                   see finish, from observed completion times (default: 0.3)
+            decodo_callback_url: URL Decodo posts finished tasks to; polling becomes a
+                                 safety net (default: None, polling only)
+            decodo_callback_poll_interval: Safety-net poll interval in callback mode (default: 30)
+            decodo_task_journal_path: SQLite file recording submitted Decodo tasks, so URLs
+                                      with a task still in flight (e.g. from before a
+                                      restart) are reattached, not resubmitted
+                                      (default: None, disabled)
+            decodo_task_journal_max_age: Seconds a journaled task is still reattached (default: 3600)
+            
+            tier_stats_path: SQLite file for learned per-domain tier routing (default: disabled)
+            tier_exploration_rate: Chance of sending a URL down the full tier chain anyway (default: 0.05)
+            
+            pipeline_queue_size: Max URLs waiting between two pipeline stages (default: 1000)
+            pipeline_linger_seconds: Max wait to fill a partial custom JS/Decodo batch (default: 0.5)
+            pipeline_decodo_batch_size: Max URLs per Decodo submission from the pipeline (default: 100)
             
             min_content_length: Minimum content length threshold
             min_text_length: Minimum text length threshold
             min_meaningful_elements: Minimum meaningful elements
             text_to_markup_ratio: Text to markup ratio threshold
+            analyzer_workers: Processes running content analysis off the event loop (0 = inline)
+            parser_backend: HTML parser for content analysis: "auto", "selectolax", "lxml"
+                            or "html.parser" (default: "auto", lxml if installed)
             
             save_outputs: Whether to save HTML outputs
             output_dir: Directory for saved outputs
@@ -118,31 +232,36 @@ class BatchFetcherConfig:
         self.static_xhr_concurrency = static_xhr_concurrency
         self.static_xhr_timeout = static_xhr_timeout
         self.static_xhr_headers = static_xhr_headers or {}
+        self.xhr_max_parallel = xhr_max_parallel
+        self.xhr_pattern_index_path = xhr_pattern_index_path
+        self.xhr_pattern_exploration_rate = xhr_pattern_exploration_rate
+        self.xhr_pattern_max_failures = xhr_pattern_max_failures
         
         # Custom JS Service (Multi-Service)
         # Default service endpoints if not provided
         if custom_js_service_endpoints is None:
-            custom_js_service_endpoints = [
-                "easygoing-strength-copy-2-copy-2-production.up.railway.app",
-                "easygoing-strength-copy-2-copy-1-production.up.railway.app",
-                "easygoing-strength-copy-copy-1-production.up.railway.app",
-                "easygoing-strength-copy-2-copy-production.up.railway.app",
-                "easygoing-strength-copy-2-production.up.railway.app",
-                "easygoing-strength-copy-production.up.railway.app",
-                "easygoing-strength-copy-1-production.up.railway.app",
-                "easygoing-strength-copy-copy-production.up.railway.app",
-                "easygoing-strength-production-d985.up.railway.app",
-                "easygoing-strength-copy-3-production.up.railway.app",
-                "easygoing-strength-copy-copy-copy-2-production.up.railway.app",
-                "easygoing-strength-copy-copy-copy-production.up.railway.app",
-                "easygoing-strength-copy-copy-copy-1-production.up.railway.app",
-            ]
+            custom_js_service_endpoints = list(DEFAULT_CUSTOM_JS_SERVICE_ENDPOINTS)
         self.custom_js_service_endpoints = custom_js_service_endpoints
         self.custom_js_batch_size = custom_js_batch_size
         self.custom_js_cooldown_seconds = custom_js_cooldown_seconds
+        self.custom_js_rate_limit_urls = custom_js_rate_limit_urls
+        self.custom_js_rate_limit_window_seconds = custom_js_rate_limit_window_seconds
+        self.custom_js_max_concurrent_batches = custom_js_max_concurrent_batches
         self.custom_js_timeout = custom_js_timeout
+        self.custom_js_bisect_timeouts = custom_js_bisect_timeouts
+        self.custom_js_slow_lane_timeout = custom_js_slow_lane_timeout
+        self.custom_js_stream_results = custom_js_stream_results
+        self.custom_js_keepalive_timeout = custom_js_keepalive_timeout
+        self.custom_js_dns_cache_ttl = custom_js_dns_cache_ttl
+        self.custom_js_compress_requests = custom_js_compress_requests
         self.custom_js_max_retries = custom_js_max_retries
+        self.custom_js_retry_backoff_seconds = custom_js_retry_backoff_seconds
+        self.custom_js_max_retry_backoff_seconds = custom_js_max_retry_backoff_seconds
         self.custom_js_skip_domains = _normalize_domain_list(custom_js_skip_domains)
+        self.custom_js_probe_url = custom_js_probe_url
+        self.custom_js_probe_backoff_seconds = custom_js_probe_backoff_seconds
+        self.custom_js_min_batch_size = custom_js_min_batch_size
+        self.custom_js_target_batch_seconds = custom_js_target_batch_seconds
         
         # Decodo Web Scraping API
         self.decodo_enabled = decodo_enabled
@@ -157,12 +276,32 @@ class BatchFetcherConfig:
         self.decodo_results_endpoint = decodo_results_endpoint
         self.decodo_poll_interval = decodo_poll_interval
         self.decodo_max_poll_attempts = decodo_max_poll_attempts
+        self.decodo_submit_chunk_size = decodo_submit_chunk_size
+        self.decodo_submit_retries = decodo_submit_retries
+        self.decodo_max_concurrent_submissions = decodo_max_concurrent_submissions
+        self.decodo_poll_qps = decodo_poll_qps
+        self.decodo_poll_mass_step = decodo_poll_mass_step
+        self.decodo_callback_url = decodo_callback_url
+        self.decodo_callback_poll_interval = decodo_callback_poll_interval
+        self.decodo_task_journal_path = decodo_task_journal_path
+        self.decodo_task_journal_max_age = decodo_task_journal_max_age
+        
+        # Learned tier routing
+        self.tier_stats_path = tier_stats_path
+        self.tier_exploration_rate = tier_exploration_rate
+        
+        # Streaming pipeline
+        self.pipeline_queue_size = pipeline_queue_size
+        self.pipeline_linger_seconds = pipeline_linger_seconds
+        self.pipeline_decodo_batch_size = pipeline_decodo_batch_size
         
         # Content analyzer
         self.min_content_length = min_content_length
         self.min_text_length = min_text_length
         self.min_meaningful_elements = min_meaningful_elements
         self.text_to_markup_ratio = text_to_markup_ratio
+        self.analyzer_workers = analyzer_workers
+        self.parser_backend = parser_backend
         
         # General
         self.save_outputs = save_outputs
@@ -0,0 +1,461 @@
+"""
+Streaming pipeline that connects the batch fetch stages.
+
+Static + XHR, custom JS and Decodo run concurrently, linked by bounded
+queues: a URL moves to the custom JS stage as soon as Phase 1 rejects it,
+and to Decodo as soon as its custom JS retries run out, instead of waiting
+for the whole batch to clear each phase.
+
+Custom JS retries are per URL: a failed or skeleton URL is re-queued on its
+own after an exponential backoff, and the renderer steers it to a service
+that has not tried it yet.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlparse
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from .async_static_xhr_processor import AsyncStaticXHRProcessor
+from .async_multi_service_js_renderer import AsyncMultiServiceJSRenderer
+from .async_decodo_fallback import AsyncDecodoFallback
+from .decodo_task_journal import get_decodo_task_journal
+from .batch_config import BatchFetcherConfig
+from .content_analyzer import ContentAnalyzer
+from .analyzer_executor import AnalyzerExecutor
+from .result_aggregator import ResultAggregator
+
+logger = logging.getLogger(__name__)
+
+
+def _save_html_to_file(html_content: str, url: str, method: str, output_dir: str = "outputs") -> str:
+    """Save HTML content to a file for verification."""
+    os.makedirs(output_dir, exist_ok=True)
+
+    parsed = urlparse(url)
+    domain = parsed.netloc.replace('.', '_')
+    path = parsed.path.replace('/', '_').strip('_') or 'index'
+    query = parsed.query.replace('&', '_').replace('=', '_') if parsed.query else ''
+
+    filename_base = f"{domain}_{path}"
+    if query:
+        filename_base += f"_{query[:50]}"
+    filename_base = filename_base[:100]
+
+    timestamp = int(time.time())
+    filename = f"{method}_{filename_base}_{timestamp}.html"
+    filename = "".join(c for c in filename if c.isalnum() or c in ('_', '-', '.'))
+
+    filepath = os.path.join(output_dir, filename)
+
+    try:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        logger.debug(f"Saved {method} output to: {filepath}")
+        return filepath
+    except Exception as e:
+        logger.warning(f"Failed to save {method} output: {e}")
+        return ""
+
+
+def _extract_hostname(url: str) -> str:
+    """Return normalized hostname (without www.) from URL."""
+    parsed = urlparse(url)
+    hostname = (parsed.netloc or parsed.path).lower()
+    if hostname.startswith("www."):
+        hostname = hostname[4:]
+    return hostname
+
+
+def _should_skip_custom_js(url: str, excluded_domains: Optional[List[str]]) -> bool:
+    """Determine if URL should bypass custom JS based on configured domains."""
+    if not excluded_domains:
+        return False
+    hostname = _extract_hostname(url)
+    return any(
+        hostname == domain or hostname.endswith(f".{domain}")
+        for domain in excluded_domains
+    )
+
+
+class BatchPipeline:
+    """Runs one batch through static/XHR -> custom JS -> Decodo as a streaming pipeline."""
+
+    def __init__(
+        self,
+        config: BatchFetcherConfig,
+        aggregator: ResultAggregator,
+        static_xhr_processor: AsyncStaticXHRProcessor,
+        js_renderer: AsyncMultiServiceJSRenderer,
+        content_analyzer: ContentAnalyzer,
+        tiers_tried: Dict[str, List[str]],
+        analyzer_executor: Optional[AnalyzerExecutor] = None
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            config: Batch configuration
+            aggregator: Aggregator every final result is added to
+            static_xhr_processor: Phase 1 processor
+            js_renderer: Custom JS multi-service renderer
+            content_analyzer: Analyzer used for custom JS skeleton detection
+            tiers_tried: URL -> tiers attempted so far (updated in place)
+            analyzer_executor: Process pool for skeleton detection (default: inline)
+        """
+        self.config = config
+        self.aggregator = aggregator
+        self.static_xhr_processor = static_xhr_processor
+        self.js_renderer = js_renderer
+        self.content_analyzer = content_analyzer
+        self.tiers_tried = tiers_tried
+        self.analyzer_executor = analyzer_executor
+
+        self.linger = config.pipeline_linger_seconds
+        # One batch in flight per service slot keeps every service busy without
+        # draining the queue faster than the services can take it
+        self.js_max_inflight = max(
+            1,
+            js_renderer.service_pool.get_service_count() * js_renderer.service_pool.max_concurrent_batches
+        )
+
+        self._decodo_fallback: Optional[AsyncDecodoFallback] = None
+        self._js_attempts: Dict[str, int] = defaultdict(int)
+        # URL -> render services that already tried it
+        self._js_services_tried: Dict[str, Set[str]] = {}
+        self._js_retry_tasks = set()
+        self._js_outstanding = 0
+        self._phase1_done = False
+        self._js_done = False
+        self._counts: Dict[str, int] = defaultdict(int)
+
+    async def run(
+        self,
+        phase1_urls: List[str],
+        start_tiers: Optional[Dict[str, str]] = None,
+        routed_js_urls: Optional[List[str]] = None,
+        routed_decodo_urls: Optional[List[str]] = None
+    ):
+        """
+        Process the batch, adding every URL's final result to the aggregator.
+
+        Args:
+            phase1_urls: URLs that start at static or XHR
+            start_tiers: URL -> starting tier ("static" or "xhr") for phase 1
+            routed_js_urls: URLs that start directly at custom JS
+            routed_decodo_urls: URLs that start directly at Decodo
+        """
+        self._js_queue: asyncio.Queue = asyncio.Queue(maxsize=self.config.pipeline_queue_size)
+        self._decodo_queue: asyncio.Queue = asyncio.Queue(maxsize=self.config.pipeline_queue_size)
+
+        js_stage = asyncio.create_task(self._run_js_stage())
+        decodo_stage = asyncio.create_task(self._run_decodo_stage())
+
+        try:
+            for url in routed_decodo_urls or []:
+                await self._send_to_decodo(url)
+            for url in routed_js_urls or []:
+                await self._send_to_js(url)
+
+            async for result in self.static_xhr_processor.process_as_completed(phase1_urls, start_tiers):
+                await self._handle_phase1_result(result)
+            self._phase1_done = True
+            logger.info(
+                f"Phase 1 completed: {self._counts['phase1_success']} successful, "
+                f"{self._counts['phase1_rejected']} passed on to JS rendering"
+            )
+
+            await js_stage
+            self._js_done = True
+            logger.info(
+                f"Custom JS stage completed: {self._counts['custom_js_success']} successful, "
+                f"{self._counts['to_decodo']} passed on to Decodo"
+            )
+
+            await decodo_stage
+            if self._counts['to_decodo']:
+                logger.info(
+                    f"Decodo stage completed: {self._counts['decodo_success']} successful, "
+                    f"{self._counts['decodo_failed']} failed"
+                )
+        finally:
+            for task in [js_stage, decodo_stage, *self._js_retry_tasks]:
+                if not task.done():
+                    task.cancel()
+
+    async def _collect_batches(
+        self,
+        queue: asyncio.Queue,
+        batch_size: int,
+        is_finished: Callable[[], bool]
+    ) -> AsyncIterator[List[str]]:
+        """
+        Group queued URLs into batches.
+
+        A batch is released when it is full, or when linger seconds have
+        passed since its first URL arrived. Iteration stops once the queue is
+        idle and is_finished() reports that no more URLs can arrive.
+
+        Args:
+            queue: Stage input queue
+            batch_size: Maximum URLs per batch
+            is_finished: Whether the upstream stages are done feeding this queue
+
+        Yields:
+            Lists of URLs
+        """
+        loop = asyncio.get_event_loop()
+        batch: List[str] = []
+        deadline = None
+
+        while True:
+            timeout = self.linger if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                url = await asyncio.wait_for(queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if batch:
+                    yield batch
+                    batch = []
+                    deadline = None
+                elif is_finished():
+                    return
+                continue
+
+            if not batch:
+                deadline = loop.time() + self.linger
+            batch.append(url)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+                deadline = None
+
+    async def _handle_phase1_result(self, result: Dict[str, any]):
+        """Record a phase 1 success, or pass the URL on to the next stage."""
+        url = result["url"]
+        self.tiers_tried[url].extend(result.get("tiers_tried", []))
+
+        if not result["needs_js"]:
+            self._counts['phase1_success'] += 1
+            self._add_success(url, result["html"], result["method"])
+            return
+
+        self._counts['phase1_rejected'] += 1
+        await self._send_to_js(url)
+
+    async def _send_to_js(self, url: str):
+        """Queue a URL for custom JS rendering (or Decodo if its domain skips custom JS)."""
+        if _should_skip_custom_js(url, self.config.custom_js_skip_domains):
+            logger.debug(f"{url} is configured to skip custom JS, sending directly to Decodo")
+            await self._send_to_decodo(url)
+            return
+        self._js_outstanding += 1
+        await self._js_queue.put(url)
+
+    async def _send_to_decodo(self, url: str):
+        """Queue a URL for Decodo, or fail it if Decodo is disabled."""
+        self._counts['to_decodo'] += 1
+        if not self.config.decodo_enabled:
+            logger.warning(f"Decodo fallback is disabled, marking {url} as failed")
+            self.aggregator.add_result(
+                url=url,
+                html=None,
+                method="decodo",
+                status="failed",
+                error="Decodo fallback disabled",
+                tiers_tried=self.tiers_tried.get(url)
+            )
+            return
+        await self._decodo_queue.put(url)
+
+    def _add_success(self, url: str, html: Optional[str], method: str):
+        """Add a successful result to the aggregator and save it if configured."""
+        self.aggregator.add_result(
+            url=url,
+            html=html,
+            method=method,
+            status="success",
+            error=None,
+            tiers_tried=self.tiers_tried.get(url)
+        )
+        if self.config.save_outputs and html:
+            _save_html_to_file(html, url, method, self.config.output_dir)
+
+    async def _run_js_stage(self):
+        """Render queued URLs in batches as they arrive, one batch in flight per service."""
+        slots = asyncio.Semaphore(self.js_max_inflight)
+        in_flight = set()
+
+        async for batch in self._collect_batches(
+            self._js_queue,
+            self.config.custom_js_batch_size,
+            lambda: self._phase1_done and self._js_outstanding == 0
+        ):
+            await slots.acquire()
+            task = asyncio.create_task(self._render_js_batch(batch, slots))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    async def _render_js_batch(self, batch: List[str], slots: asyncio.Semaphore):
+        """
+        Render one batch and route each URL onward as its service batch finishes.
+
+        Valid results are recorded, failed or skeleton results are retried
+        until custom_js_max_retries attempts are used, then sent to Decodo.
+        """
+        # A URL queued more than once (listed twice in the request) is rendered
+        # once, and its result routed once per copy so each copy is accounted for
+        copies = Counter(batch)
+        unrouted = set(copies)
+        try:
+            for url in copies:
+                self._js_attempts[url] += 1
+                if "custom_js" not in self.tiers_tried[url]:
+                    self.tiers_tried[url].append("custom_js")
+            try:
+                async for results in self.js_renderer.process_as_completed(list(copies), self._js_services_tried):
+                    for result in results:
+                        url = result.get("url")
+                        if url in unrouted:
+                            unrouted.discard(url)
+                            for _ in range(copies[url]):
+                                await self._route_js_result(url, result)
+            except Exception as e:
+                logger.error(f"Custom JS batch failed: {e}")
+        finally:
+            slots.release()
+
+        for url in copies:
+            if url in unrouted:
+                unrouted.discard(url)
+                for _ in range(copies[url]):
+                    await self._route_js_result(url, None)
+
+    async def _route_js_result(self, url: str, result: Optional[Dict[str, any]]):
+        """Record a valid custom JS result, or schedule a retry / send the URL to Decodo."""
+        if result is not None and result["status"] == "success":
+            is_skeleton = False
+            if result["html"]:
+                is_skeleton, skeleton_reason = await self._is_custom_js_skeleton(result["html"], url)
+                if is_skeleton:
+                    logger.info(f"Custom JS result for {url} detected as skeleton: {skeleton_reason}")
+            if not is_skeleton:
+                self._js_outstanding -= 1
+                self._counts['custom_js_success'] += 1
+                logger.debug(f"Custom JS success for {url} on attempt {self._js_attempts[url]}")
+                self._add_success(url, result["html"], "custom_js")
+                return
+        else:
+            error = result.get("error", "Unknown error") if result else "No result returned"
+            logger.debug(f"Custom JS failed for {url} on attempt {self._js_attempts[url]}: {error}")
+            if result and result.get("slow_lane"):
+                # Timed out on its own: more custom JS attempts would only time out again
+                logger.info(f"{url} is too slow for custom JS, sending to Decodo")
+                self._js_outstanding -= 1
+                await self._send_to_decodo(url)
+                return
+
+        if self._js_attempts[url] < self.config.custom_js_max_retries:
+            delay = min(
+                self.config.custom_js_retry_backoff_seconds * 2 ** (self._js_attempts[url] - 1),
+                self.config.custom_js_max_retry_backoff_seconds
+            )
+            task = asyncio.create_task(self._retry_js(url, delay))
+            self._js_retry_tasks.add(task)
+            task.add_done_callback(self._js_retry_tasks.discard)
+        else:
+            self._js_outstanding -= 1
+            await self._send_to_decodo(url)
+
+    async def _retry_js(self, url: str, delay: float):
+        """Re-queue a URL for custom JS rendering after its backoff."""
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._js_queue.put(url)
+
+    async def _is_custom_js_skeleton(self, html_content: str, url: str) -> Tuple[bool, str]:
+        """Run skeleton detection, in the analyzer process pool if configured."""
+        if self.analyzer_executor is None:
+            return self.content_analyzer.is_custom_js_skeleton(html_content, url=url)
+        return await self.analyzer_executor.is_custom_js_skeleton(
+            self.content_analyzer, html_content, url=url
+        )
+
+    async def _run_decodo_stage(self):
+        """Submit queued URLs to Decodo in chunks as they arrive."""
+        in_flight = set()
+
+        async for chunk in self._collect_batches(
+            self._decodo_queue,
+            self.config.pipeline_decodo_batch_size,
+            lambda: self._js_done
+        ):
+            task = asyncio.create_task(self._run_decodo_chunk(chunk))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    def _get_decodo_fallback(self) -> AsyncDecodoFallback:
+        """Create the Decodo fallback on first use."""
+        if self._decodo_fallback is None:
+            config = self.config
+            self._decodo_fallback = AsyncDecodoFallback(
+                timeout=config.decodo_timeout,
+                headless_mode=config.decodo_headless_mode,
+                location=config.decodo_location,
+                language=config.decodo_language,
+                target=config.decodo_target,
+                device_type=config.decodo_device_type,
+                api_endpoint=config.decodo_api_endpoint,
+                results_endpoint=config.decodo_results_endpoint,
+                max_concurrent=config.decodo_max_concurrent,
+                poll_interval=config.decodo_poll_interval,
+                max_poll_attempts=config.decodo_max_poll_attempts,
+                submit_chunk_size=config.decodo_submit_chunk_size,
+                submit_retries=config.decodo_submit_retries,
+                max_concurrent_submissions=config.decodo_max_concurrent_submissions,
+                poll_qps=config.decodo_poll_qps,
+                poll_mass_step=config.decodo_poll_mass_step,
+                callback_url=config.decodo_callback_url,
+                callback_poll_interval=config.decodo_callback_poll_interval,
+                task_journal=get_decodo_task_journal(
+                    config.decodo_task_journal_path,
+                    max_age=config.decodo_task_journal_max_age
+                )
+            )
+        return self._decodo_fallback
+
+    async def _run_decodo_chunk(self, chunk: List[str]):
+        """Process one chunk through Decodo and record the results."""
+        for url in chunk:
+            self.tiers_tried[url].append("decodo")
+
+        try:
+            results = await self._get_decodo_fallback().process_urls(chunk)
+        except Exception as e:
+            logger.error(f"Decodo chunk of {len(chunk)} URLs failed: {e}")
+            results = [
+                {"url": url, "html": None, "status": "failed", "error": str(e)}
+                for url in chunk
+            ]
+
+        for url, result in zip(chunk, results):
+            if result["status"] == "success":
+                self._counts['decodo_success'] += 1
+                self._add_success(url, result["html"], "decodo")
+            else:
+                self._counts['decodo_failed'] += 1
+                self.aggregator.add_result(
+                    url=url,
+                    html=None,
+                    method="custom_js",
+                    status="failed",
+                    error=result["error"],
+                    tiers_tried=self.tiers_tried.get(url)
+                )
@@ -5,11 +5,100 @@ Content analysis and detection for blocked or skeleton content.
 import logging
 import json
 import re
-from bs4 import BeautifulSoup
-from typing import Optional, Tuple
+from typing import FrozenSet, Optional, Tuple
+from .html_metrics import count_distinct_matches
+from .parser_backends import get_parser_backend
 
 logger = logging.getLogger(__name__)
 
+# Heuristic tables are compiled once at import time and shared by every analyzer
+SKELETON_INDICATORS = (
+    'loading',
+    'skeleton',
+    'placeholder',
+    'spinner',
+    'shimmer',
+    'pulse'
+)
+_SKELETON_INDICATOR_RE = re.compile(
+    '|'.join(re.escape(indicator) for indicator in SKELETON_INDICATORS),
+    re.IGNORECASE
+)
+
+# Domains whose custom JS results are accepted without skeleton detection
+CUSTOM_JS_WHITELISTED_DOMAINS = (
+    'myntra.com',
+    'sangeethamobiles.com',
+    'paiinternational.in',
+    'myg.in',
+    'darlingretail.com',
+    'ajio.com',
+    'xtepindia.com',
+    'lakhanifootwear.com',
+    'skechers.in',
+    'somethingsbrewing.in',
+    'shop.ttkprestige.com',
+    'reliancedigital.in',
+    'wonderchef.com',
+    'domesticappliances.philips.co.in',
+    'agarolifestyle.com',
+    'naaptol.com',
+    'rbzone.com'
+)
+
+# "No results" messages (matched against the lowercased document)
+NO_RESULTS_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'oops!?\s*no\s+results?\s+found',
+    r'no\s+results?\s+found',
+    r'nothing\s+found',
+    r'no\s+products?\s+found',
+    r'no\s+items?\s+found',
+    r'try\s+searching\s+for\s+something\s+else',
+    r'don\'?t\s+worry,\s+try\s+searching',
+    r'no\s+results?\s+available',
+    r'we\s+couldn\'?t\s+find',
+    r'no\s+matches?\s+found'
+))
+
+# Empty product listing patterns in inline script data
+EMPTY_LISTING_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'"products"\s*:\s*\[\s*\]',  # products: []
+    r'"items"\s*:\s*\[\s*\]',     # items: []
+    r'"results"\s*:\s*\[\s*\]',   # results: []
+    r'"productsCount"\s*:\s*0',    # productsCount: 0
+    r'"totalProductsCount"\s*:\s*0',  # totalProductsCount: 0
+    r'"itemCount"\s*:\s*0',        # itemCount: 0
+    r'"count"\s*:\s*0\s*,',       # count: 0
+))
+
+# All empty-listing patterns as one alternation (they share the leading quote,
+# so the combined search keeps re's literal-prefix scan)
+_EMPTY_LISTING_RE = re.compile('|'.join(f'(?:{pattern.pattern})' for pattern in EMPTY_LISTING_PATTERNS))
+
+_PRODUCTS_JSON_RE = re.compile(r'\{[^{}]*"products"[^{}]*\}')
+
+# Class/id markers, all found in one scan of an attribute value. The lookahead
+# reports every position, so overlapping markers (e.g. "headerror") are not lost.
+# class: product|card -> product, navigation, loading
+# id:    product -> product, loading
+_ATTRIBUTE_MARKER_RE = re.compile(
+    r'(?=(?P<product>product|item|listing)|(?P<card>card)|'
+    r'(?P<navigation>nav|header|menu)|(?P<loading>loading|error|empty|no-results))',
+    re.I
+)
+_PRODUCT_CLASS_MARKERS = frozenset(('product', 'card'))
+
+NAVIGATION_TAGS = frozenset(('nav', 'header'))
+STRUCTURAL_TAGS = frozenset(('div', 'footer', 'aside')) | NAVIGATION_TAGS
+CONTENT_TAGS = frozenset(('article', 'section', 'main', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'))
+
+
+def _attribute_markers(value: Optional[str]) -> FrozenSet[str]:
+    """Names of the _ATTRIBUTE_MARKER_RE groups found in an attribute value."""
+    if not value:
+        return frozenset()
+    return frozenset(match.lastgroup for match in _ATTRIBUTE_MARKER_RE.finditer(value))
+
 
 class ContentAnalyzer:
     """Analyzes HTML content to detect if it's blocked or skeleton content."""
@@ -19,7 +108,8 @@ class ContentAnalyzer:
         min_content_length: int = 1000,
         min_text_length: int = 200,
         min_meaningful_elements: int = 5,
-        text_to_markup_ratio: float = 0.001
+        text_to_markup_ratio: float = 0.001,
+        parser_backend: Optional[str] = "auto"
     ):
         """
         Initialize the content analyzer.
@@ -29,11 +119,14 @@ class ContentAnalyzer:
             min_text_length: Minimum text content length in characters
             min_meaningful_elements: Minimum number of meaningful elements (text, images, links)
             text_to_markup_ratio: Minimum ratio of text to HTML markup
+            parser_backend: HTML parser to use: "auto" (lxml if installed),
+                            "selectolax", "lxml" or "html.parser"
         """
         self.min_content_length = min_content_length
         self.min_text_length = min_text_length
         self.min_meaningful_elements = min_meaningful_elements
         self.text_to_markup_ratio = text_to_markup_ratio
+        self.parser_backend = get_parser_backend(parser_backend)
     
     def is_blocked(self, status_code: int) -> bool:
         """
@@ -76,7 +169,7 @@ class ContentAnalyzer:
             return True, f"Content too short ({content_length} bytes)"
         
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            metrics = self.parser_backend.parse(html_content).metrics
         except Exception as e:
             logger.warning(f"Failed to parse HTML: {e}")
             # If we can't parse, but content is long enough, assume it's valid
@@ -84,21 +177,14 @@ class ContentAnalyzer:
                 return False, "Valid content (unparseable but sufficient length)"
             return True, f"Unparseable content: {e}"
         
-        # Extract text content
-        text_content = soup.get_text(separator=' ', strip=True)
-        text_length = len(text_content)
-        
-        # Check text length
+        # Check text length (same as soup.get_text(separator=' ', strip=True))
+        text_length = metrics.text_length
         if text_length < self.min_text_length:
             logger.debug(f"Text length {text_length} below threshold {self.min_text_length}")
             return True, f"Text content too short ({text_length} chars)"
         
-        # Count meaningful elements
-        meaningful_elements = (
-            len(soup.find_all(['p', 'article', 'section', 'div'], string=True)) +
-            len(soup.find_all('img', src=True)) +
-            len(soup.find_all('a', href=True))
-        )
+        # Meaningful elements: p/article/section/div holding a string, img[src], a[href]
+        meaningful_elements = metrics.meaningful_elements
         
         if meaningful_elements < self.min_meaningful_elements:
             logger.debug(f"Meaningful elements {meaningful_elements} below threshold {self.min_meaningful_elements}")
@@ -126,17 +212,9 @@ class ContentAnalyzer:
                     logger.debug(f"Large page with low text-to-markup ratio {ratio:.4f}, but content size suggests it's valid")
         
         # Check for common skeleton indicators
-        skeleton_indicators = [
-            'loading',
-            'skeleton',
-            'placeholder',
-            'spinner',
-            'shimmer',
-            'pulse'
-        ]
-        
-        html_lower = html_content.lower()
-        skeleton_count = sum(1 for indicator in skeleton_indicators if indicator in html_lower)
+        skeleton_count = count_distinct_matches(
+            html_content, _SKELETON_INDICATOR_RE, len(SKELETON_INDICATORS)
+        )
         
         # If many skeleton indicators and low content, likely skeleton
         if skeleton_count >= 3 and text_length < self.min_text_length * 2:
@@ -144,10 +222,10 @@ class ContentAnalyzer:
             return True, f"Multiple skeleton indicators ({skeleton_count})"
         
         # Check for minimal content patterns (lots of divs, little text)
-        divs = soup.find_all('div')
-        if len(divs) > 20 and text_length < self.min_text_length * 3:
-            logger.debug(f"Many divs ({len(divs)}) but little text ({text_length})")
-            return True, f"Layout-heavy, content-light ({len(divs)} divs, {text_length} chars)"
+        div_count = metrics.div_count
+        if div_count > 20 and text_length < self.min_text_length * 3:
+            logger.debug(f"Many divs ({div_count}) but little text ({text_length})")
+            return True, f"Layout-heavy, content-light ({div_count} divs, {text_length} chars)"
         
         return False, "Valid content"
     
@@ -177,90 +255,41 @@ class ContentAnalyzer:
             return True, "Empty content"
         
         # Skip skeleton detection for whitelisted domains - accept whatever custom JS returns
-        whitelisted_domains = [
-            'myntra.com',
-            'sangeethamobiles.com',
-            'paiinternational.in',
-            'myg.in',
-            'darlingretail.com',
-            'ajio.com',
-            'xtepindia.com',
-            'lakhanifootwear.com',
-            'skechers.in',
-            'somethingsbrewing.in',
-            'shop.ttkprestige.com',
-            'reliancedigital.in',
-            'wonderchef.com',
-            'domesticappliances.philips.co.in',
-            'agarolifestyle.com',
-            'naaptol.com',
-            'rbzone.com'
-        ]
         if url:
             url_lower = url.lower()
-            for domain in whitelisted_domains:
+            for domain in CUSTOM_JS_WHITELISTED_DOMAINS:
                 if domain in url_lower:
                     logger.debug(f"Skipping skeleton detection for whitelisted domain ({domain}): {url}")
                     return False, f"{domain} - accepting custom JS result"
         
+        # 1. Check for "no results" messages (case-insensitive), before paying for a parse
+        html_lower = html_content.lower()
+        for pattern in NO_RESULTS_PATTERNS:
+            if pattern.search(html_lower):
+                logger.debug(f"Found 'no results' pattern: {pattern.pattern}")
+                return True, f"Found 'no results' message"
+        
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            doc = self.parser_backend.parse(html_content, collect_details=True)
         except Exception as e:
             logger.warning(f"Failed to parse HTML for custom JS skeleton check: {e}")
             return False, "Unparseable content, assuming valid"
         
-        html_lower = html_content.lower()
-        
-        # 1. Check for "no results" messages (case-insensitive)
-        no_results_patterns = [
-            r'oops!?\s*no\s+results?\s+found',
-            r'no\s+results?\s+found',
-            r'nothing\s+found',
-            r'no\s+products?\s+found',
-            r'no\s+items?\s+found',
-            r'try\s+searching\s+for\s+something\s+else',
-            r'don\'?t\s+worry,\s+try\s+searching',
-            r'no\s+results?\s+available',
-            r'we\s+couldn\'?t\s+find',
-            r'no\s+matches?\s+found'
-        ]
-        
-        for pattern in no_results_patterns:
-            if re.search(pattern, html_lower):
-                logger.debug(f"Found 'no results' pattern: {pattern}")
-                return True, f"Found 'no results' message"
-        
-        # 2. Extract and check JSON data from script tags
-        script_tags = soup.find_all('script', type='application/json')
-        script_tags.extend(soup.find_all('script', id=re.compile(r'__NEXT_DATA__|__INITIAL_STATE__|__APP_DATA__', re.I)))
-        
-        # Also check for inline JSON in script tags
-        all_scripts = soup.find_all('script')
-        for script in all_scripts:
-            script_content = script.string or ""
+        # 2. Check inline JSON data in script tags
+        for script_content in doc.scripts:
             if not script_content:
                 continue
             
             # Look for JSON data patterns
-            json_patterns = [
-                r'"products"\s*:\s*\[\s*\]',  # products: []
-                r'"items"\s*:\s*\[\s*\]',     # items: []
-                r'"results"\s*:\s*\[\s*\]',   # results: []
-                r'"productsCount"\s*:\s*0',    # productsCount: 0
-                r'"totalProductsCount"\s*:\s*0',  # totalProductsCount: 0
-                r'"itemCount"\s*:\s*0',        # itemCount: 0
-                r'"count"\s*:\s*0\s*,',       # count: 0
-            ]
-            
-            for pattern in json_patterns:
-                if re.search(pattern, script_content):
-                    logger.debug(f"Found empty product listing pattern: {pattern}")
-                    return True, f"Empty product listing detected"
+            listing_match = _EMPTY_LISTING_RE.search(script_content)
+            if listing_match:
+                logger.debug(f"Found empty product listing pattern: {listing_match.group(0)}")
+                return True, f"Empty product listing detected"
             
             # Try to parse as JSON and check for empty arrays
             try:
                 # Look for JSON objects in script content
-                json_match = re.search(r'\{[^{}]*"products"[^{}]*\}', script_content)
+                json_match = _PRODUCTS_JSON_RE.search(script_content)
                 if json_match:
                     json_str = json_match.group(0)
                     data = json.loads(json_str)
@@ -280,33 +309,55 @@ class ContentAnalyzer:
                 # Not valid JSON, continue checking
                 pass
         
-        # 3. Check for pages with navigation/header but no product cards or listings
-        # Look for common e-commerce/product listing indicators
-        product_indicators = [
-            soup.find_all(class_=re.compile(r'product|item|listing|card', re.I)),
-            soup.find_all(id=re.compile(r'product|item|listing', re.I)),
-            soup.find_all('article'),
-            soup.find_all(attrs={'data-product-id': True}),
-            soup.find_all(attrs={'data-item-id': True}),
-        ]
-        
-        # Flatten and count unique product indicators
-        product_elements = set()
-        for indicator_list in product_indicators:
-            product_elements.update(indicator_list)
-        
-        # Check if we have navigation/header structure
-        has_navigation = (
-            len(soup.find_all(['nav', 'header'])) > 0 or
-            len(soup.find_all(class_=re.compile(r'nav|header|menu', re.I))) > 0
-        )
+        # One pass over the elements for the product, navigation, structure and loading checks
+        product_elements = 0
+        has_navigation = False
+        structural_elements = 0
+        content_elements = 0
+        has_visible_loading = False
+        for tag, attrs in doc.elements:
+            if tag in STRUCTURAL_TAGS:
+                structural_elements += 1
+                if tag in NAVIGATION_TAGS:
+                    has_navigation = True
+            elif tag in CONTENT_TAGS:
+                content_elements += 1
+            if not attrs:
+                if tag == 'article':
+                    product_elements += 1
+                continue
+            
+            class_markers = _attribute_markers(attrs.get('class'))
+            id_markers = _attribute_markers(attrs.get('id'))
+            
+            # Product cards or listings
+            if (
+                class_markers & _PRODUCT_CLASS_MARKERS
+                or 'product' in id_markers
+                or tag == 'article'
+                or 'data-product-id' in attrs
+                or 'data-item-id' in attrs
+            ):
+                product_elements += 1
+            
+            if 'navigation' in class_markers:
+                has_navigation = True
+            
+            # Loading/error state, unless hidden
+            if (
+                not has_visible_loading
+                and ('loading' in class_markers or 'loading' in id_markers)
+                and 'display: none' not in attrs.get('style', '').lower()
+                and 'hidden' not in attrs.get('class', '').lower()
+            ):
+                has_visible_loading = True
+        
+        text_content = doc.text
+        text_length = len(text_content)
         
-        # If we have navigation but no products, likely skeleton
-        if has_navigation and len(product_elements) < min_products:
+        # 3. Check for pages with navigation/header but no product cards or listings
+        if has_navigation and product_elements < min_products:
             # But check if there's substantial text content (might be a content page, not product listing)
-            text_content = soup.get_text(separator=' ', strip=True)
-            text_length = len(text_content)
-            
             # If text is very short, it's likely skeleton
             if text_length < 500:
                 logger.debug(f"Has navigation but no products and minimal text ({text_length} chars)")
@@ -318,31 +369,15 @@ class ContentAnalyzer:
                 return True, f"Navigation present but empty state message detected"
         
         # 4. Check for structure-heavy, content-light pages
-        # Count structural elements vs content elements
-        structural_elements = len(soup.find_all(['div', 'nav', 'header', 'footer', 'aside']))
-        content_elements = len(soup.find_all(['article', 'section', 'main', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']))
-        
-        text_content = soup.get_text(separator=' ', strip=True)
-        text_length = len(text_content)
-        
         # If lots of structure but little content, might be skeleton
         if structural_elements > 50 and content_elements < 5 and text_length < 1000:
             logger.debug(f"Structure-heavy ({structural_elements} divs) but content-light ({content_elements} content elements, {text_length} chars)")
             return True, f"Structure-heavy but content-light page"
         
-        # 5. Check for loading/error states in class names or IDs
-        loading_indicators = soup.find_all(class_=re.compile(r'loading|error|empty|no-results|no-results-found', re.I))
-        loading_indicators.extend(soup.find_all(id=re.compile(r'loading|error|empty|no-results', re.I)))
-        
-        if len(loading_indicators) > 0:
-            # Check if these are visible/active
-            for indicator in loading_indicators:
-                # Check if element is likely visible (not hidden)
-                style = indicator.get('style', '')
-                classes = ' '.join(indicator.get('class', []))
-                if 'display: none' not in style.lower() and 'hidden' not in classes.lower():
-                    logger.debug(f"Found visible loading/error indicator")
-                    return True, f"Visible loading/error state detected"
+        # 5. Check for visible loading/error states in class names or IDs
+        if has_visible_loading:
+            logger.debug(f"Found visible loading/error indicator")
+            return True, f"Visible loading/error state detected"
         
         return False, "Valid content"
     
@@ -0,0 +1,156 @@
+"""
+Delivery of Decodo task callbacks to the tasks waiting for them.
+
+When tasks are submitted with a callback_url, Decodo POSTs each finished
+task to it. The receiving route (see api/main.py) hands the payload to the
+process-wide DecodoCallbackRouter, which passes it to the poll scheduler
+that registered the task, on that scheduler's event loop.
+"""
+
+import hmac
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+# Callbacks kept for tasks not registered yet (payloads hold whole pages)
+MAX_UNCLAIMED_CALLBACKS = 100
+
+_refusal_logged = False
+
+
+def callback_task_id(payload: any) -> Optional[str]:
+    """
+    Task ID of a callback payload.
+
+    Args:
+        payload: Decoded JSON callback body
+
+    Returns:
+        Task ID, or None if the payload carries none
+    """
+    if not isinstance(payload, dict):
+        return None
+    task_id = payload.get("id") or payload.get("task_id") or payload.get("query_id")
+    if task_id is None and isinstance(payload.get("task"), dict):
+        task = payload["task"]
+        task_id = task.get("id") or task.get("task_id")
+    return str(task_id) if task_id else None
+
+
+def signed_callback_url(url: Optional[str], token: Optional[str]) -> Optional[str]:
+    """
+    Callback URL to submit tasks with, carrying the token the callback route checks.
+
+    Callback mode is refused without a token: anyone who can reach the
+    route could otherwise post results for any task.
+
+    Args:
+        url: Public URL of the callback route (None = polling only)
+        token: Shared secret appended as ?token=
+
+    Returns:
+        Callback URL, or None if callback mode is off
+    """
+    global _refusal_logged
+    if not url:
+        return None
+    if not token:
+        if not _refusal_logged:
+            logger.error("Decodo callback URL set without a callback token: callback mode disabled, polling only")
+            _refusal_logged = True
+        return None
+    separator = "&" if "?" in url else "?"
+    return f"{url}{separator}{urlencode({'token': token})}"
+
+
+def callback_token_valid(given: Optional[str], token: Optional[str]) -> bool:
+    """Check a callback's token in constant time; no configured token accepts nothing."""
+    if not token or given is None:
+        return False
+    return hmac.compare_digest(given.encode(), token.encode())
+
+
+class DecodoCallbackRouter:
+    """Routes Decodo callbacks to the poll scheduler waiting for each task."""
+
+    def __init__(self, max_unclaimed: int = MAX_UNCLAIMED_CALLBACKS):
+        """
+        Args:
+            max_unclaimed: Callbacks kept for tasks not registered yet, e.g. when
+                           a task finishes before its submission response is read
+                           (default: 100)
+        """
+        self.max_unclaimed = max_unclaimed
+        # Every scheduler waiting for a task (concurrent requests may share one)
+        self._waiting: Dict[str, List["DecodoPollScheduler"]] = {}
+        self._unclaimed: "OrderedDict[str, any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, task_id: str, scheduler: "DecodoPollScheduler"):
+        """Route callbacks of a task to a scheduler (delivering one that already arrived)."""
+        with self._lock:
+            payload = self._unclaimed.pop(task_id, None)
+            schedulers = self._waiting.setdefault(task_id, [])
+            if scheduler not in schedulers:
+                schedulers.append(scheduler)
+        if payload is not None:
+            scheduler.loop.call_soon_threadsafe(scheduler.deliver, task_id, payload)
+
+    def unregister(self, task_id: str, scheduler: Optional["DecodoPollScheduler"] = None):
+        """Stop routing callbacks of a task to a scheduler (default: to every scheduler)."""
+        with self._lock:
+            schedulers = self._waiting.get(task_id)
+            if schedulers is None:
+                return
+            if scheduler is not None and scheduler in schedulers:
+                schedulers.remove(scheduler)
+            if scheduler is None or not schedulers:
+                del self._waiting[task_id]
+
+    def deliver(self, payload: any, task_id: Optional[str] = None) -> bool:
+        """
+        Hand a callback payload to the scheduler waiting for its task.
+
+        Safe to call from any thread or event loop.
+
+        Args:
+            payload: Decoded JSON callback body
+            task_id: Task ID, if not in the payload (e.g. from the callback URL)
+
+        Returns:
+            True if at least one scheduler was waiting for the task
+        """
+        task_id = task_id or callback_task_id(payload)
+        if not task_id:
+            logger.warning("Decodo callback without a task ID ignored")
+            return False
+        with self._lock:
+            schedulers = list(self._waiting.get(task_id, ()))
+            if not schedulers:
+                self._unclaimed[task_id] = payload
+                while len(self._unclaimed) > self.max_unclaimed:
+                    self._unclaimed.popitem(last=False)
+        if not schedulers:
+            logger.debug(f"Decodo callback for unknown task {task_id} kept for later")
+            return False
+        for scheduler in schedulers:
+            scheduler.loop.call_soon_threadsafe(scheduler.deliver, task_id, payload)
+        return True
+
+    def waiting_count(self) -> int:
+        """Number of tasks waiting for a callback."""
+        with self._lock:
+            return len(self._waiting)
+
+
+# Callbacks arrive on one route for the whole process
+_callback_router = DecodoCallbackRouter()
+
+
+def get_callback_router() -> DecodoCallbackRouter:
+    """Get the process-wide Decodo callback router."""
+    return _callback_router
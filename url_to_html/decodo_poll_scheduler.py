@@ -0,0 +1,455 @@
+"""
+Central poll scheduler for Decodo tasks.
+
+Instead of one sleep/backoff coroutine per task, every pending task sits in
+a heap keyed by its next check time and a single loop dispatches the checks
+that are due, earliest first. Checks are limited both in number (at most
+max_concurrent status requests in flight) and in rate (at most max_qps
+requests per second across all tasks). A task only occupies a slot while
+its status request is in flight, so a slow task never holds up the ones
+due after it.
+
+Check times adapt to how long Decodo actually takes: completion times are
+recorded per (domain, target), and once enough are known a task's first
+check is placed where the fastest tasks finish, and each later check
+where a further share (poll_mass_step) of the remaining probability mass
+has completed. Without enough history, checks back off exponentially
+from poll_interval.
+
+Results can also be pushed: deliver() resolves a task from a Decodo
+callback payload. In that mode polling is only a safety net for lost
+callbacks (adaptive=False, with a long poll_interval).
+"""
+
+import logging
+import asyncio
+import bisect
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+from .decodo_callbacks import DecodoCallbackRouter
+
+logger = logging.getLogger(__name__)
+
+# Growth of a task's check interval while it is still processing / after an error
+POLL_BACKOFF = 1.2
+ERROR_BACKOFF = 1.5
+MAX_POLL_INTERVAL = 10.0
+
+# Smallest gap between two adaptive checks of a task
+MIN_POLL_INTERVAL = 0.5
+
+# Share of the remaining completion probability each adaptive check waits for
+DEFAULT_POLL_MASS_STEP = 0.3
+
+# One status check: (final result, None), (None, None) while processing,
+# or (None, error) after a transient error
+CheckResult = Tuple[Optional[Dict[str, any]], Optional[str]]
+
+# Turns a result payload into a result: parse(task_id, url, payload) -> result or None
+ParseResult = Callable[[str, Optional[str], any], Optional[Dict[str, any]]]
+
+
+class CompletionTimeStats:
+    """Recent Decodo task completion times, per key (e.g. (domain, target))."""
+
+    def __init__(self, max_samples: int = 200, min_samples: int = 5):
+        """
+        Args:
+            max_samples: Completion times kept per key, oldest dropped first (default: 200)
+            min_samples: Completion times a key needs before it is used (default: 5)
+        """
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self._samples: Dict[Hashable, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, keys: Sequence[Hashable], seconds: float):
+        """Record a completion time under every key."""
+        with self._lock:
+            for key in keys:
+                samples = self._samples.get(key)
+                if samples is None:
+                    samples = self._samples[key] = deque(maxlen=self.max_samples)
+                samples.append(seconds)
+
+    def _sorted_samples(self, keys: Sequence[Hashable]) -> Optional[List[float]]:
+        """Sorted completion times of the first key with enough of them."""
+        with self._lock:
+            for key in keys:
+                samples = self._samples.get(key)
+                if samples is not None and len(samples) >= self.min_samples:
+                    return sorted(samples)
+        return None
+
+    def next_check_delay(self, keys: Sequence[Hashable], elapsed: float, mass_step: float) -> Optional[float]:
+        """
+        Delay until a further mass_step share of the tasks still running after
+        elapsed seconds have completed.
+
+        Args:
+            keys: Keys to look up, most specific first
+            elapsed: Seconds since the task was submitted
+            mass_step: Share of the remaining probability mass to wait for
+
+        Returns:
+            Seconds from now, or None without enough history or past every
+            recorded completion time
+        """
+        samples = self._sorted_samples(keys)
+        if samples is None:
+            return None
+        n = len(samples)
+        done = bisect.bisect_right(samples, elapsed) / n
+        if done >= 1.0:
+            return None
+        target = done + mass_step * (1.0 - done)
+        return samples[min(n - 1, max(0, math.ceil(target * n) - 1))] - elapsed
+
+
+class PendingTask:
+    """Polling state of one submitted Decodo task."""
+
+    def __init__(
+        self,
+        task_id: str,
+        url: Optional[str],
+        interval: float,
+        future: asyncio.Future,
+        keys: Sequence[Hashable] = ()
+    ):
+        self.task_id = task_id
+        self.url = url
+        self.interval = interval
+        # One future per submit() of the task (e.g. concurrent requests for one URL)
+        self.waiters: List[asyncio.Future] = [future]
+        self.keys = keys
+        self.submitted_at = time.monotonic()
+        self.last_pending_at = self.submitted_at
+        self.checks = 0
+        self.consecutive_errors = 0
+
+    def done(self) -> bool:
+        """Whether every caller waiting for the task has its result (or is gone)."""
+        return all(waiter.done() for waiter in self.waiters)
+
+
+class DecodoPollScheduler:
+    """Polls every pending Decodo task of one event loop from a single loop."""
+
+    def __init__(
+        self,
+        check: Callable[[aiohttp.ClientSession, str, Optional[str]], Awaitable[CheckResult]],
+        session_factory: Callable[[], aiohttp.ClientSession],
+        poll_interval: float = 2.0,
+        max_wait: float = 180.0,
+        max_concurrent: int = 50,
+        max_qps: float = 20.0,
+        max_consecutive_errors: int = 5,
+        completion_stats: Optional[CompletionTimeStats] = None,
+        poll_mass_step: float = DEFAULT_POLL_MASS_STEP,
+        adaptive: bool = True,
+        max_interval: float = MAX_POLL_INTERVAL,
+        parse: Optional[ParseResult] = None,
+        callback_router: Optional[DecodoCallbackRouter] = None,
+        on_complete: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Initialize the poll scheduler.
+
+        Args:
+            check: Checks a task once: check(session, task_id, url) -> CheckResult
+            session_factory: Creates the session the checks share; it is opened
+                             when the first task arrives and closed once none are left
+            poll_interval: Delay before a task's second check, grown per check (default: 2)
+            max_wait: Seconds after submission a task is given up (default: 180)
+            max_concurrent: Status requests in flight at once (default: 50)
+            max_qps: Status requests per second across all tasks (default: 20;
+                     0 disables the limit)
+            max_consecutive_errors: Transient errors in a row before a task fails (default: 5)
+            completion_stats: Completion time history (default: the process-wide one)
+            poll_mass_step: Share of the remaining completion probability each
+                            adaptive check waits for (default: 0.3)
+            adaptive: Time checks from completion time history (default: True);
+                      False checks first after poll_interval
+            max_interval: Longest gap between two checks of a task (default: 10)
+            parse: Turns callback payloads into results (needed for deliver())
+            callback_router: Registers pending tasks for callback delivery
+                             (default: None, polling only)
+            on_complete: Called with the task ID once Decodo reports a task finished
+                         (not when polling gives up on it)
+        """
+        self.check = check
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_qps = max_qps
+        self.max_consecutive_errors = max_consecutive_errors
+        self.completion_stats = completion_stats or get_completion_time_stats()
+        self.poll_mass_step = min(1.0, max(0.01, poll_mass_step))
+        self.adaptive = adaptive
+        self.max_interval = max_interval
+        self.parse = parse
+        self.callback_router = callback_router
+        self.on_complete = on_complete
+        self.loop = asyncio.get_running_loop()
+
+        # (next check time, sequence, task), earliest first
+        self._heap: List[Tuple[float, int, PendingTask]] = []
+        self._tasks: Dict[str, PendingTask] = {}
+        self._counter = itertools.count()
+        self._checks = set()
+        self._next_request_at = 0.0
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+    def submit(
+        self,
+        task_id: str,
+        url: Optional[str] = None,
+        keys: Sequence[Hashable] = ()
+    ) -> asyncio.Future:
+        """
+        Start polling a task.
+
+        Args:
+            task_id: Decodo task ID
+            url: Original URL (for mapping the result)
+            keys: Completion time history keys, most specific first
+                  (e.g. (domain, target) then (None, target))
+
+        A task that is already pending is polled once: the new caller waits
+        for the same result.
+
+        Returns:
+            Future resolved with the task's result dictionary
+        """
+        future = self.loop.create_future()
+        pending = self._tasks.get(task_id)
+        if pending is not None and not pending.done():
+            pending.waiters.append(future)
+            return future
+        task = PendingTask(task_id, url, float(self.poll_interval), future, keys)
+        self._tasks[task_id] = task
+        if self.adaptive:
+            # First check where the fastest tasks finish, or right away without history
+            first_delay = self.completion_stats.next_check_delay(keys, 0.0, self.poll_mass_step) or 0.0
+        else:
+            first_delay = self.poll_interval
+        self._schedule(task, task.submitted_at + min(first_delay, self.max_interval))
+        if self.callback_router is not None:
+            self.callback_router.register(task_id, self)
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+        return future
+
+    def deliver(self, task_id: str, payload: any) -> bool:
+        """
+        Resolve a pending task from a pushed (callback) result payload.
+
+        Must be called on the scheduler's event loop.
+
+        Args:
+            task_id: Decodo task ID
+            payload: Decoded JSON payload, as returned by the results endpoint
+
+        Returns:
+            True if the payload resolved a pending task
+        """
+        task = self._tasks.get(task_id)
+        if task is None or task.done() or self.parse is None:
+            return False
+        try:
+            result = self.parse(task_id, task.url, payload)
+        except Exception as e:
+            logger.warning(f"Unusable callback payload for task {task_id}: {type(e).__name__}: {e}")
+            return False
+        if result is None:
+            # Still processing: leave it to the next callback or check
+            return False
+        if result.get("status") == "success" and task.keys:
+            self.completion_stats.record(task.keys, time.monotonic() - task.submitted_at)
+        logger.debug(f"Task {task_id} delivered by callback")
+        self._completed(task)
+        self._resolve(task, result)
+        # Lets the loop drop the task's pending check (and stop once none are left)
+        self._wakeup.set()
+        return True
+
+    def pending_count(self) -> int:
+        """Number of tasks waiting for a check or being checked."""
+        return len(self._heap) + len(self._checks)
+
+    def _schedule(self, task: PendingTask, due: float):
+        heapq.heappush(self._heap, (due, next(self._counter), task))
+        self._wakeup.set()
+
+    async def _run(self):
+        """Dispatch due checks until no task is left."""
+        try:
+            # Tasks submitted while the session is closing find this runner
+            # still set, so the outer loop picks them up with a new session
+            while self._heap or self._checks:
+                async with self.session_factory() as session:
+                    await self._dispatch(session)
+        finally:
+            # No await since the last emptiness check: a later submit() starts a new runner
+            self._runner = None
+            for check in list(self._checks):
+                check.cancel()
+            # Tasks waiting in the heap and those whose check was in flight
+            leftover = {id(task): task for _, _, task in self._heap}
+            leftover.update((id(task), task) for task in self._tasks.values())
+            for task in leftover.values():
+                self._forget(task)
+                for waiter in task.waiters:
+                    if not waiter.done():
+                        waiter.cancel()
+            self._heap.clear()
+
+    async def _dispatch(self, session: aiohttp.ClientSession):
+        """Dispatch due checks on one session until no task is left."""
+        while self._heap or self._checks:
+            self._wakeup.clear()
+            now = time.monotonic()
+
+            # Drop tasks already resolved (by callback) or whose caller is gone
+            while self._heap and self._heap[0][2].done():
+                self._forget(heapq.heappop(self._heap)[2])
+            if not self._tasks:
+                self._heap.clear()
+
+            delay = None
+            if self._heap and len(self._checks) < self.max_concurrent:
+                delay = max(self._heap[0][0], self._next_request_at) - now
+            if delay is None or delay > 0:
+                # Sleep until the next check is due, a slot frees up or a task arrives
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, task = heapq.heappop(self._heap)
+            if self.max_qps > 0:
+                self._next_request_at = max(now, self._next_request_at) + 1.0 / self.max_qps
+            check = asyncio.create_task(self._check(session, task))
+            self._checks.add(check)
+            check.add_done_callback(self._check_done)
+
+    def _check_done(self, check: asyncio.Task):
+        self._checks.discard(check)
+        self._wakeup.set()
+
+    def _forget(self, task: PendingTask):
+        if self._tasks.get(task.task_id) is task:
+            del self._tasks[task.task_id]
+            if self.callback_router is not None:
+                self.callback_router.unregister(task.task_id, self)
+
+    def _completed(self, task: PendingTask):
+        if self.on_complete is not None:
+            self.on_complete(task.task_id)
+
+    def _resolve(self, task: PendingTask, result: Dict[str, any]):
+        self._forget(task)
+        for waiter in task.waiters:
+            if not waiter.done():
+                waiter.set_result(result)
+
+    async def _check(self, session: aiohttp.ClientSession, task: PendingTask):
+        """Check one task and resolve it, or schedule its next check."""
+        task.checks += 1
+        try:
+            result, error = await self.check(session, task.task_id, task.url)
+            if result is not None:
+                self._completed(task)
+        except Exception as e:
+            logger.error(f"Unexpected error polling task {task.task_id} for {task.url}: {type(e).__name__}: {str(e)[:200]}")
+            result, error = {
+                "url": task.url or "",
+                "html": None,
+                "status": "failed",
+                "error": f"Unexpected error: {type(e).__name__}: {str(e)[:200]}"
+            }, None
+
+        now = time.monotonic()
+        if result is not None:
+            if result.get("status") == "success" and task.keys:
+                # It finished somewhere between the last two checks
+                self.completion_stats.record(
+                    task.keys,
+                    (task.last_pending_at + now) / 2 - task.submitted_at
+                )
+            self._resolve(task, result)
+            return
+
+        interval = None
+        if error is None:
+            if task.checks == 1:
+                logger.debug(f"Task {task.task_id} not ready yet, starting polling...")
+            task.consecutive_errors = 0
+            task.last_pending_at = now
+            backoff = POLL_BACKOFF
+            adaptive = self.completion_stats.next_check_delay(
+                task.keys, now - task.submitted_at, self.poll_mass_step
+            ) if self.adaptive else None
+            if adaptive is not None:
+                interval = min(max(adaptive, MIN_POLL_INTERVAL), self.max_interval)
+        else:
+            task.consecutive_errors += 1
+            logger.warning(f"Polling task {task.task_id} failed (consecutive #{task.consecutive_errors}): {error}")
+            if task.consecutive_errors >= self.max_consecutive_errors:
+                logger.error(f"Too many consecutive errors ({task.consecutive_errors}) for task {task.task_id}, giving up")
+                self._resolve(task, {
+                    "url": task.url or "",
+                    "html": None,
+                    "status": "failed",
+                    "error": f"{error} (after {task.consecutive_errors} attempts)"
+                })
+                return
+            backoff = ERROR_BACKOFF
+
+        if interval is None:
+            # No usable history (or an error): exponential backoff
+            interval = task.interval
+            task.interval = min(task.interval * backoff, self.max_interval)
+
+        waited = now - task.submitted_at
+        if waited + interval > self.max_wait:
+            logger.warning(f"Task {task.task_id} for {task.url} did not complete within {self.max_wait}s (waited: {waited:.1f}s)")
+            self._resolve(task, {
+                "url": task.url or "",
+                "html": None,
+                "status": "failed",
+                "error": f"Polling timeout: task did not complete within {self.max_wait}s"
+            })
+            return
+
+        self._schedule(task, now + interval)
+
+    async def close(self):
+        """Stop polling; pending tasks are cancelled."""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+
+
+# Completion times are shared by every scheduler in the process
+_completion_time_stats = CompletionTimeStats()
+
+
+def get_completion_time_stats() -> CompletionTimeStats:
+    """Get the process-wide Decodo completion time history."""
+    return _completion_time_stats
@@ -0,0 +1,185 @@
+"""
+Durable journal of submitted Decodo tasks.
+
+Every task ID is written to SQLite as soon as its submission is accepted
+and removed once Decodo reports the task finished, or once polling gives
+up on it (timeout, repeated errors). If the process dies in between, the
+next request for the same URL reattaches to the task that is already paid
+for and polls it, instead of submitting the URL again.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tasks older than this are assumed gone from Decodo and are resubmitted
+DEFAULT_MAX_TASK_AGE = 3600.0
+
+# Parameters per SELECT ... IN (...) query
+_QUERY_BATCH = 500
+
+
+class DecodoTaskJournal:
+    """SQLite-backed record of Decodo tasks submitted but not finished."""
+
+    def __init__(self, path: str, max_age: float = DEFAULT_MAX_TASK_AGE):
+        """
+        Initialize the task journal.
+
+        Args:
+            path: SQLite database file (created if missing)
+            max_age: Seconds after submission a task is still reattached (default: 3600)
+        """
+        self.path = path
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS decodo_tasks ("
+            " task_id TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " target TEXT NOT NULL,"
+            " submitted_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS decodo_tasks_url ON decodo_tasks (url, target)"
+        )
+        self._conn.commit()
+
+    def record_submitted(self, task_map: Dict[str, Optional[str]], target: str):
+        """
+        Record the tasks of an accepted submission.
+
+        Args:
+            task_map: task_id -> URL (tasks without a URL cannot be reattached and are skipped)
+            target: Decodo target the tasks were submitted with
+        """
+        now = time.time()
+        rows = [(task_id, url, target, now) for task_id, url in task_map.items() if url]
+        if not rows:
+            return
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO decodo_tasks (task_id, url, target, submitted_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to journal {len(rows)} Decodo tasks to {self.path}: {e}")
+
+    def remove(self, task_id: str):
+        """Forget a task Decodo reported finished."""
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM decodo_tasks WHERE task_id = ?", (task_id,))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to remove Decodo task {task_id} from {self.path}: {e}")
+
+    def remove_many(self, task_ids: List[str]):
+        """Forget tasks that finished or were given up on."""
+        if not task_ids:
+            return
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "DELETE FROM decodo_tasks WHERE task_id = ?",
+                    [(task_id,) for task_id in task_ids]
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to remove {len(task_ids)} Decodo tasks from {self.path}: {e}")
+
+    def find_in_flight(self, urls: List[str], target: str) -> Dict[str, Tuple[str, float]]:
+        """
+        Find tasks still in flight for URLs.
+
+        Args:
+            urls: URLs about to be submitted
+            target: Decodo target they would be submitted with
+
+        Returns:
+            URL -> (task_id, submitted_at as a Unix time) of its newest task
+            younger than max_age
+        """
+        cutoff = time.time() - self.max_age
+        found: Dict[str, Tuple[str, float]] = {}
+        unique = list(dict.fromkeys(urls))
+        with self._lock:
+            for i in range(0, len(unique), _QUERY_BATCH):
+                batch = unique[i:i + _QUERY_BATCH]
+                rows = self._conn.execute(
+                    "SELECT url, task_id, submitted_at FROM decodo_tasks"
+                    f" WHERE target = ? AND submitted_at >= ? AND url IN ({','.join('?' * len(batch))})"
+                    " ORDER BY submitted_at",
+                    (target, cutoff, *batch)
+                ).fetchall()
+                for url, task_id, submitted_at in rows:
+                    found[url] = (task_id, submitted_at)
+        return found
+
+    def prune(self) -> int:
+        """
+        Drop tasks older than max_age.
+
+        Returns:
+            Number of tasks dropped
+        """
+        with self._lock:
+            try:
+                cursor = self._conn.execute(
+                    "DELETE FROM decodo_tasks WHERE submitted_at < ?",
+                    (time.time() - self.max_age,)
+                )
+                self._conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to prune Decodo task journal {self.path}: {e}")
+                return 0
+
+    def in_flight_count(self) -> int:
+        """Number of journaled tasks."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM decodo_tasks").fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
+
+
+_shared_journals: Dict[str, DecodoTaskJournal] = {}
+_shared_journals_lock = threading.Lock()
+
+
+def get_decodo_task_journal(
+    path: Optional[str],
+    max_age: float = DEFAULT_MAX_TASK_AGE
+) -> Optional[DecodoTaskJournal]:
+    """
+    Get the process-wide task journal stored at path.
+
+    Args:
+        path: SQLite database file, or None to disable the journal
+        max_age: Seconds a task is still reattached (used when the journal is first opened)
+
+    Returns:
+        Shared DecodoTaskJournal, or None if path is None
+    """
+    if not path:
+        return None
+    with _shared_journals_lock:
+        journal = _shared_journals.get(path)
+        if journal is None:
+            journal = DecodoTaskJournal(path, max_age=max_age)
+            _shared_journals[path] = journal
+        return journal
@@ -0,0 +1,166 @@
+"""
+Persistent per-domain statistics for the learned routing stores.
+
+DomainStatsStore keeps a SQLite table of counters per (domain, key), caches
+each domain's rows in memory and writes changed rows back at most every
+flush_interval seconds. TierRouter (keyed by tier) and XHRPatternIndex
+(keyed by endpoint pattern) build on it. Shared stores are flushed and
+closed at interpreter exit, so the stats of the last interval are kept.
+"""
+
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+from typing import Dict, List, Optional, Sequence, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+
+def domain_of(url: str) -> str:
+    """Return normalized hostname (without www.) from URL."""
+    parsed = urlparse(url)
+    hostname = (parsed.hostname or parsed.path).lower()
+    if hostname.startswith("www."):
+        hostname = hostname[4:]
+    return hostname
+
+
+class DomainStatsStore:
+    """SQLite-backed per-domain counters, cached in memory and written back in batches."""
+
+    # Table, key column and (column, SQL type) of the counters kept per key
+    table = ""
+    key_column = ""
+    value_columns: Sequence[Tuple[str, str]] = ()
+    # What the store holds, for log messages
+    description = "domain stats"
+
+    def __init__(self, path: str, flush_interval: float = 5.0):
+        """
+        Open (or create) the store.
+
+        Args:
+            path: SQLite database file (created if missing)
+            flush_interval: Seconds between automatic writes to disk
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            " domain TEXT NOT NULL,"
+            f" {self.key_column} TEXT NOT NULL,"
+            + "".join(f" {name} {sql_type} NOT NULL DEFAULT 0," for name, sql_type in self.value_columns)
+            + " updated_at REAL NOT NULL,"
+            f" PRIMARY KEY (domain, {self.key_column}))"
+        )
+        self._conn.commit()
+
+        # domain -> key -> counters, in value_columns order
+        self._stats: Dict[str, Dict[str, List[float]]] = {}
+        self._dirty: Dict[Tuple[str, str], float] = {}
+        self._last_flush = time.time()
+
+    def _load_domain(self, domain: str) -> Dict[str, List[float]]:
+        """Load (and cache) the stats for a domain. Caller holds the lock."""
+        stats = self._stats.get(domain)
+        if stats is None:
+            columns = ", ".join(name for name, _ in self.value_columns)
+            rows = self._conn.execute(
+                f"SELECT {self.key_column}, {columns} FROM {self.table} WHERE domain = ?",
+                (domain,)
+            ).fetchall()
+            stats = {key: list(values) for key, *values in rows}
+            self._stats[domain] = stats
+        return stats
+
+    def _mark_dirty(self, domain: str, key: str) -> bool:
+        """
+        Mark an entry as changed. Caller holds the lock.
+
+        Returns:
+            Whether a flush is due (call flush() after releasing the lock)
+        """
+        now = time.time()
+        self._dirty[(domain, key)] = now
+        return now - self._last_flush >= self.flush_interval
+
+    def flush(self):
+        """Write pending stats to disk."""
+        with self._lock:
+            if not self._dirty:
+                self._last_flush = time.time()
+                return
+            rows = [
+                (domain, key, *self._stats[domain][key], updated_at)
+                for (domain, key), updated_at in self._dirty.items()
+            ]
+            self._dirty.clear()
+            columns = [self.key_column, *(name for name, _ in self.value_columns)]
+            try:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table}"
+                    f" (domain, {', '.join(columns)}, updated_at)"
+                    f" VALUES (?, {', '.join('?' for _ in columns)}, ?)",
+                    rows
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to persist {self.description} to {self.path}: {e}")
+            self._last_flush = time.time()
+
+    def close(self):
+        """Flush pending stats and close the database."""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+StoreT = TypeVar("StoreT", bound=DomainStatsStore)
+
+_shared_stores: Dict[Tuple[type, str], DomainStatsStore] = {}
+_shared_stores_lock = threading.Lock()
+
+
+def get_shared_store(store_class: Type[StoreT], path: Optional[str], **options) -> Optional[StoreT]:
+    """
+    Get the process-wide store of a class at path, opening it on first use.
+
+    Args:
+        store_class: DomainStatsStore subclass
+        path: SQLite database file, or None to disable the store
+        **options: Constructor arguments (used when the store is first opened)
+
+    Returns:
+        Shared store, or None if path is None
+    """
+    if not path:
+        return None
+    with _shared_stores_lock:
+        store = _shared_stores.get((store_class, path))
+        if store is None:
+            store = store_class(path, **options)
+            _shared_stores[(store_class, path)] = store
+        return store
+
+
+def close_shared_stores():
+    """Flush and close every shared store (runs at interpreter exit)."""
+    with _shared_stores_lock:
+        stores = list(_shared_stores.values())
+        _shared_stores.clear()
+    for store in stores:
+        try:
+            store.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to close {store.description} at {store.path}: {e}")
+
+
+atexit.register(close_shared_stores)
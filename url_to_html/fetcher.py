@@ -2,14 +2,20 @@
 Main fetcher with three-tier fallback strategy.
 """
 
+import copy
 import logging
 import os
+import threading
+from collections import OrderedDict
 from urllib.parse import urlparse, quote
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from .static_fetcher import StaticFetcher
 from .xhr_fetcher import XHRFetcher
 from .js_renderer import JSrend
 from .content_analyzer import ContentAnalyzer
+from .session_pool import get_shared_session_pool, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE
+from .xhr_pattern_index import get_xhr_pattern_index
+from .tier_router import get_tier_router, SYNC_TIERS
 from .exceptions import FetchError, JSRenderError, TimeoutError
 
 logger = logging.getLogger(__name__)
@@ -75,6 +81,10 @@ class FetcherConfig:
         # XHR fetcher config
         xhr_timeout: int = 30,
         xhr_headers: Optional[Dict[str, str]] = None,
+        xhr_max_parallel: int = 4,
+        xhr_pattern_index_path: Optional[str] = None,
+        xhr_pattern_exploration_rate: float = 0.1,
+        xhr_pattern_max_failures: int = 5,
         
         # JS renderer config (Decodo)
         js_api_endpoint: Optional[str] = None,
@@ -92,6 +102,15 @@ class FetcherConfig:
         min_text_length: int = 200,
         min_meaningful_elements: int = 5,
         text_to_markup_ratio: float = 0.001,
+        parser_backend: str = "auto",
+        
+        # Learned tier routing config
+        tier_stats_path: Optional[str] = None,
+        tier_exploration_rate: float = 0.05,
+        
+        # Connection pool config (shared by all tiers)
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
         
         # General config
         enable_logging: bool = True,
@@ -104,6 +123,10 @@ class FetcherConfig:
         self.static_headers = static_headers or {}
         self.xhr_timeout = xhr_timeout
         self.xhr_headers = xhr_headers or {}
+        self.xhr_max_parallel = xhr_max_parallel
+        self.xhr_pattern_index_path = xhr_pattern_index_path
+        self.xhr_pattern_exploration_rate = xhr_pattern_exploration_rate
+        self.xhr_pattern_max_failures = xhr_pattern_max_failures
         self.js_api_endpoint = js_api_endpoint
         self.js_api_key = js_api_key
         self.js_timeout = js_timeout
@@ -117,164 +140,313 @@ class FetcherConfig:
         self.min_text_length = min_text_length
         self.min_meaningful_elements = min_meaningful_elements
         self.text_to_markup_ratio = text_to_markup_ratio
+        self.parser_backend = parser_backend
+        self.tier_stats_path = tier_stats_path
+        self.tier_exploration_rate = tier_exploration_rate
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
         self.enable_logging = enable_logging
         self.log_level = log_level
         self.save_outputs = save_outputs
         self.output_dir = output_dir
 
 
-def fetch_html(
-    url: str,
-    config: Optional[FetcherConfig] = None,
-    **kwargs
-) -> str:
+class Fetcher:
     """
-    Fetch HTML content from URL using progressive fallback strategy.
+    Long-lived fetch engine with pre-built components.
     
-    Strategy:
-    1. Try static HTTP GET request
-    2. If blocked or skeleton content, try XHR/API endpoints
-    3. If still fails, use JS rendering via external API
+    Build one instance per configuration and reuse it: the tier fetchers,
+    content analyzer and keep-alive session pool are created once, so
+    repeated fetches only pay for the network work.
+    """
     
-    Args:
-        url: URL to fetch
-        config: FetcherConfig instance (optional)
-        **kwargs: Additional configuration options (merged with config)
+    def __init__(self, config: Optional[FetcherConfig] = None):
+        """
+        Initialize the fetch engine.
         
-    Returns:
-        HTML content as string
+        Args:
+            config: FetcherConfig instance (optional, defaults are used if omitted)
+        """
+        if config is not None and config.enable_logging:
+            _configure_logging(config.log_level)
         
-    Raises:
-        FetchError: If all methods fail
-    """
-    # Setup logging if enabled
-    if config and config.enable_logging:
-        logging.basicConfig(
-            level=config.log_level,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        self.config = config or FetcherConfig()
+        
+        # Keep-alive sessions are shared across calls and across tiers
+        self.session_pool = get_shared_session_pool(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize
         )
+        
+        self.tier_router = get_tier_router(
+            self.config.tier_stats_path,
+            exploration_rate=self.config.tier_exploration_rate
+        )
+        
+        self.content_analyzer = ContentAnalyzer(
+            min_content_length=self.config.min_content_length,
+            min_text_length=self.config.min_text_length,
+            min_meaningful_elements=self.config.min_meaningful_elements,
+            text_to_markup_ratio=self.config.text_to_markup_ratio,
+            parser_backend=self.config.parser_backend
+        )
+        
+        self.static_fetcher = StaticFetcher(
+            timeout=self.config.static_timeout,
+            headers=self.config.static_headers,
+            session_pool=self.session_pool
+        )
+        
+        self.xhr_fetcher = XHRFetcher(
+            timeout=self.config.xhr_timeout,
+            headers=self.config.xhr_headers,
+            session_pool=self.session_pool,
+            max_parallel=self.config.xhr_max_parallel,
+            content_analyzer=self.content_analyzer,
+            pattern_index=get_xhr_pattern_index(
+                self.config.xhr_pattern_index_path,
+                exploration_rate=self.config.xhr_pattern_exploration_rate,
+                max_failures=self.config.xhr_pattern_max_failures
+            )
+        )
+
     
-    # Create config from kwargs if not provided
-    if config is None:
-        config = FetcherConfig(**kwargs)
-    else:
-        # Merge kwargs into config
-        for key, value in kwargs.items():
-            if hasattr(config, key):
-                setattr(config, key, value)
-    
-    # Initialize components
-    static_fetcher = StaticFetcher(
-        timeout=config.static_timeout,
-        headers=config.static_headers
-    )
-    
-    xhr_fetcher = XHRFetcher(
-        timeout=config.xhr_timeout,
-        headers=config.xhr_headers
-    )
-    
-    content_analyzer = ContentAnalyzer(
-        min_content_length=config.min_content_length,
-        min_text_length=config.min_text_length,
-        min_meaningful_elements=config.min_meaningful_elements,
-        text_to_markup_ratio=config.text_to_markup_ratio
-    )
-    
-    logger.info(f"Starting fetch for URL: {url}")
+    def _record_tier(self, url: str, tier: str, success: bool):
+        """Feed a tier outcome to the learned tier router, if enabled."""
+        if self.tier_router is not None:
+            self.tier_router.record(url, tier, success)
     
-    # Tier 1: Static Fetch
-    try:
-        logger.info("Tier 1: Attempting static fetch")
-        html_content, status_code = static_fetcher.fetch(url)
+    def fetch(self, url: str) -> str:
+        """
+        Fetch HTML content from URL using progressive fallback strategy.
+        
+        Strategy:
+        1. Try static HTTP GET request
+        2. If blocked or skeleton content, try XHR/API endpoints
+        3. If still fails, use JS rendering via external API
         
-        if html_content is not None:
-            # Save static fetch output for verification
-            if config.save_outputs:
-                _save_html_to_file(html_content, url, "static", config.output_dir)
+        With learned tier routing enabled, tiers that keep failing on the
+        URL's domain are skipped and the fetch starts further down the chain.
+        
+        Args:
+            url: URL to fetch
             
-            should_fallback, reason = content_analyzer.should_fallback(
-                html_content, status_code
-            )
+        Returns:
+            HTML content as string
             
-            if not should_fallback:
-                logger.info("Static fetch successful, content is valid")
-                return html_content
-            else:
-                logger.info(f"Static fetch returned insufficient content: {reason}")
-        else:
-            logger.info("Static fetch returned no content")
-    
-    except (TimeoutError, FetchError) as e:
-        logger.warning(f"Static fetch failed: {e}")
-    except Exception as e:
-        logger.warning(f"Static fetch unexpected error: {e}")
-    
-    # Tier 2: XHR Fetch
-    try:
-        logger.info("Tier 2: Attempting XHR fetch")
-        html_content, status_code = xhr_fetcher.fetch(url)
+        Raises:
+            FetchError: If all methods fail
+        """
+        config = self.config
         
-        if html_content is not None:
-            # Save XHR fetch output for verification
-            if config.save_outputs:
-                _save_html_to_file(html_content, url, "xhr", config.output_dir)
+        start_tier = "static"
+        if self.tier_router is not None:
+            start_tier = self.tier_router.choose_start_tier(url, SYNC_TIERS)
+        start_index = SYNC_TIERS.index(start_tier)
+        
+        logger.info(f"Starting fetch for URL: {url}")
+        if start_index > 0:
+            logger.info(f"Learned routing: starting at tier '{start_tier}'")
+        
+        # Tier 1: Static Fetch
+        if start_index <= 0:
+            static_ok = False
+            try:
+                logger.info("Tier 1: Attempting static fetch")
+                html_content, status_code = self.static_fetcher.fetch(url)
+                
+                if html_content is not None:
+                    # Save static fetch output for verification
+                    if config.save_outputs:
+                        _save_html_to_file(html_content, url, "static", config.output_dir)
+                    
+                    should_fallback, reason = self.content_analyzer.should_fallback(
+                        html_content, status_code
+                    )
+                    
+                    if not should_fallback:
+                        logger.info("Static fetch successful, content is valid")
+                        static_ok = True
+                        return html_content
+                    else:
+                        logger.info(f"Static fetch returned insufficient content: {reason}")
+                else:
+                    logger.info("Static fetch returned no content")
             
-            should_fallback, reason = content_analyzer.should_fallback(
-                html_content, status_code
+            except (TimeoutError, FetchError) as e:
+                logger.warning(f"Static fetch failed: {e}")
+            except Exception as e:
+                logger.warning(f"Static fetch unexpected error: {e}")
+            finally:
+                self._record_tier(url, "static", static_ok)
+        
+        # Tier 2: XHR Fetch
+        if start_index <= 1:
+            xhr_ok = False
+            try:
+                logger.info("Tier 2: Attempting XHR fetch")
+                # Candidates are raced and validated inside the XHR fetcher
+                html_content, status_code, verdict = self.xhr_fetcher.fetch_validated(url)
+                
+                if html_content is not None:
+                    # Save XHR fetch output for verification
+                    if config.save_outputs:
+                        _save_html_to_file(html_content, url, "xhr", config.output_dir)
+                    
+                    should_fallback, reason = verdict
+                    
+                    if not should_fallback:
+                        logger.info("XHR fetch successful, content is valid")
+                        xhr_ok = True
+                        return html_content
+                    else:
+                        logger.info(f"XHR fetch returned insufficient content: {reason}")
+                else:
+                    logger.info("XHR fetch returned no content")
+            
+            except Exception as e:
+                logger.warning(f"XHR fetch failed: {e}")
+            finally:
+                self._record_tier(url, "xhr", xhr_ok)
+        
+        # Tier 3: JS Rendering
+        try:
+            logger.info("Tier 3: Attempting JS rendering")
+            html_content = JSrend(
+                url,
+                api_endpoint=config.js_api_endpoint,
+                api_key=config.js_api_key,
+                timeout=config.js_timeout,
+                headers=config.js_headers,
+                username=config.js_username,
+                password=config.js_password,
+                headless_mode=config.js_headless_mode,
+                location=config.js_location,
+                language=config.js_language,
+                session_pool=self.session_pool
             )
             
-            if not should_fallback:
-                logger.info("XHR fetch successful, content is valid")
+            if html_content:
+                # Save JS rendering output for verification
+                if config.save_outputs:
+                    _save_html_to_file(html_content, url, "js", config.output_dir)
+                
+                logger.info(f"JS rendering successful: {len(html_content)} bytes")
+                self._record_tier(url, "js", True)
                 return html_content
             else:
-                logger.info(f"XHR fetch returned insufficient content: {reason}")
-        else:
-            logger.info("XHR fetch returned no content")
+                logger.warning("JS rendering returned empty content")
+                self._record_tier(url, "js", False)
+        
+        except JSRenderError as e:
+            # If JS rendering is required but not configured, stop here
+            logger.error(f"JS rendering failed: {e}")
+            print(f"\nJS rendering required for: {url}")
+            print("Please configure js_api_endpoint in FetcherConfig to enable JS rendering.")
+            raise  # Re-raise to stop execution
+        except Exception as e:
+            logger.error(f"JS rendering unexpected error: {e}")
+        
+        # All methods failed
+        tried = " → ".join(
+            ["static fetch", "XHR fetch", "JS rendering"][start_index:]
+        )
+        error_msg = (
+            f"All fetch methods failed for URL: {url}. "
+            f"Tried: {tried}"
+        )
+        logger.error(error_msg)
+        raise FetchError(error_msg)
+
+
+_logging_configured = False
+
+# Most recently used engines, keyed on a frozen snapshot of their config
+MAX_CACHED_FETCHERS = 16
+_fetchers: "OrderedDict[Optional[Tuple], Fetcher]" = OrderedDict()
+_fetchers_lock = threading.Lock()
+
+
+def _configure_logging(log_level: int):
+    """Configure root logging once per process."""
+    global _logging_configured
+    if _logging_configured:
+        return
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    _logging_configured = True
+
+
+def _freeze(value: Any) -> Any:
+    """Hashable copy of a config value (header dicts, lists of domains)."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+def _config_key(config: Optional[FetcherConfig]) -> Optional[Tuple]:
+    """Frozen snapshot of a config's attributes (None for the default config)."""
+    if config is None:
+        return None
+    return tuple(sorted((name, _freeze(value)) for name, value in vars(config).items()))
+
+
+def _get_fetcher(config: Optional[FetcherConfig]) -> Fetcher:
+    """
+    Get a cached Fetcher for the given config.
     
-    except Exception as e:
-        logger.warning(f"XHR fetch failed: {e}")
+    Engines are shared by every config with the same settings, so a config
+    that is modified gets a new engine and equal configs share one.
+    """
+    key = _config_key(config)
+    with _fetchers_lock:
+        fetcher = _fetchers.get(key)
+        if fetcher is not None:
+            _fetchers.move_to_end(key)
+            return fetcher
+        # Private copy: later changes to the caller's config must not leak into this engine
+        fetcher = Fetcher(copy.deepcopy(config))
+        _fetchers[key] = fetcher
+        if len(_fetchers) > MAX_CACHED_FETCHERS:
+            _fetchers.popitem(last=False)
+        return fetcher
+
+
+def fetch_html(
+    url: str,
+    config: Optional[FetcherConfig] = None,
+    **kwargs
+) -> str:
+    """
+    Fetch HTML content from URL using progressive fallback strategy.
     
-    # Tier 3: JS Rendering
-    try:
-        logger.info("Tier 3: Attempting JS rendering")
-        html_content = JSrend(
-            url,
-            api_endpoint=config.js_api_endpoint,
-            api_key=config.js_api_key,
-            timeout=config.js_timeout,
-            headers=config.js_headers,
-            username=config.js_username,
-            password=config.js_password,
-            headless_mode=config.js_headless_mode,
-            location=config.js_location,
-            language=config.js_language
-        )
+    Thin wrapper over a cached Fetcher engine; see Fetcher.fetch.
+    
+    Args:
+        url: URL to fetch
+        config: FetcherConfig instance (optional)
+        **kwargs: Additional configuration options (merged into a copy of config)
         
-        if html_content:
-            # Save JS rendering output for verification
-            if config.save_outputs:
-                _save_html_to_file(html_content, url, "js", config.output_dir)
-            
-            logger.info(f"JS rendering successful: {len(html_content)} bytes")
-            return html_content
+    Returns:
+        HTML content as string
+        
+    Raises:
+        FetchError: If all methods fail
+    """
+    if kwargs:
+        # Never mutate the caller's config; merge into a copy
+        if config is None:
+            config = FetcherConfig(**kwargs)
         else:
-            logger.warning("JS rendering returned empty content")
-    
-    except JSRenderError as e:
-        # If JS rendering is required but not configured, stop here
-        logger.error(f"JS rendering failed: {e}")
-        print(f"\nJS rendering required for: {url}")
-        print("Please configure js_api_endpoint in FetcherConfig to enable JS rendering.")
-        raise  # Re-raise to stop execution
-    except Exception as e:
-        logger.error(f"JS rendering unexpected error: {e}")
+            config = copy.copy(config)
+            for key, value in kwargs.items():
+                if hasattr(config, key):
+                    setattr(config, key, value)
     
-    # All methods failed
-    error_msg = (
-        f"All fetch methods failed for URL: {url}. "
-        "Tried: static fetch → XHR fetch → JS rendering"
-    )
-    logger.error(error_msg)
-    raise FetchError(error_msg)
-
+    return _get_fetcher(config).fetch(url)
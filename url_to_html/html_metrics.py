@@ -0,0 +1,359 @@
+"""
+Single-pass HTML metrics for skeleton detection.
+
+Computes, in one streaming scan with no parse tree, the numbers that
+ContentAnalyzer.is_skeleton_content used to get from a BeautifulSoup tree:
+
+- text length as measured by soup.get_text(separator=' ', strip=True)
+- meaningful elements: p/article/section/div with a .string, img[src], a[href]
+- number of div elements
+
+plus a single regex scan for the skeleton indicator words.
+
+The tokenizer is the same html.parser BeautifulSoup uses, and the event
+handling mirrors BeautifulSoup's tree building (void elements, pop-to-tag
+on end tags, string container tags, text-run splitting), so the numbers
+match the soup-based ones.
+"""
+
+import logging
+import re
+from html.entities import html5 as _HTML5_ENTITIES
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tags BeautifulSoup's html.parser builder treats as empty elements
+VOID_ELEMENTS = frozenset((
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed',
+    'frame', 'hr', 'image', 'img', 'input', 'isindex', 'keygen', 'link',
+    'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track', 'wbr'
+))
+
+# Strings inside these tags are not part of get_text() output
+NON_TEXT_CONTAINERS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+
+# Elements counted as meaningful when they hold a single string
+STRING_ELEMENTS = frozenset(('p', 'article', 'section', 'div'))
+
+
+class HTMLMetrics:
+    """Structural and text metrics of an HTML document."""
+
+    def __init__(self, text_length: int, meaningful_elements: int, div_count: int):
+        """
+        Args:
+            text_length: Length of get_text(separator=' ', strip=True)
+            meaningful_elements: p/article/section/div with a single string,
+                                 plus img[src] and a[href]
+            div_count: Number of div elements
+        """
+        self.text_length = text_length
+        self.meaningful_elements = meaningful_elements
+        self.div_count = div_count
+
+    def __repr__(self) -> str:
+        return (
+            f"HTMLMetrics(text_length={self.text_length}, "
+            f"meaningful_elements={self.meaningful_elements}, div_count={self.div_count})"
+        )
+
+
+class ParsedDocument:
+    """HTMLMetrics plus the text, script contents and elements of a document."""
+
+    def __init__(
+        self,
+        metrics: HTMLMetrics,
+        text_parts: List[str],
+        scripts: List[str],
+        elements: List[Tuple[str, Dict[str, str]]]
+    ):
+        """
+        Args:
+            metrics: Document metrics
+            text_parts: Stripped, non-empty text strings in document order
+            scripts: .string of every <script> element that has one
+            elements: (tag, attributes) of every element in document order
+        """
+        self.metrics = metrics
+        self.text_parts = text_parts
+        self.scripts = scripts
+        self.elements = elements
+
+    @property
+    def text(self) -> str:
+        """Visible text, as returned by soup.get_text(separator=' ', strip=True)."""
+        return ' '.join(self.text_parts)
+
+
+class DocumentBuilder:
+    """
+    Accumulates metrics from a well-nested stream of parse events.
+
+    Parser backends walk their own tree (or token stream) and call start(),
+    end() and string() in document order; no tree is kept here, only the
+    stack of open elements.
+    """
+
+    def __init__(self, collect_details: bool = False):
+        """
+        Args:
+            collect_details: Also keep text parts, script contents and element
+                             attributes (needed for ParsedDocument)
+        """
+        self.collect_details = collect_details
+        # Open elements: [name, child_count, last_child_has_string, last_string]
+        self._stack: List[list] = [['[document]', 0, False, None]]
+        self._non_text_depth = 0
+
+        self.text_length = 0
+        self.text_pieces = 0
+        self.string_elements = 0
+        self.src_images = 0
+        self.href_links = 0
+        self.div_count = 0
+
+        self.text_parts: List[str] = []
+        self.scripts: List[str] = []
+        self.elements: List[Tuple[str, Dict[str, str]]] = []
+
+    def start(self, tag: str, attrs: Dict[str, Optional[str]]):
+        """Open an element."""
+        if tag == 'div':
+            self.div_count += 1
+        elif tag == 'img':
+            if 'src' in attrs:
+                self.src_images += 1
+        elif tag == 'a':
+            if 'href' in attrs:
+                self.href_links += 1
+        if self.collect_details:
+            self.elements.append((
+                tag,
+                {key: value or '' for key, value in attrs.items()}
+            ))
+
+        parent = self._stack[-1]
+        parent[1] += 1
+        parent[2] = False
+        self._stack.append([tag, 0, False, None])
+        if tag in NON_TEXT_CONTAINERS:
+            self._non_text_depth += 1
+
+    def end(self):
+        """Close the innermost open element."""
+        name, child_count, last_child_has_string, last_string = self._stack.pop()
+        has_string = child_count == 1 and last_child_has_string
+        if has_string:
+            if name in STRING_ELEMENTS:
+                self.string_elements += 1
+            elif name == 'script' and self.collect_details and last_string is not None:
+                self.scripts.append(last_string)
+        if name in NON_TEXT_CONTAINERS:
+            self._non_text_depth -= 1
+        # The parent's .string goes through this child if it is the only one
+        self._stack[-1][2] = has_string
+        self._stack[-1][3] = None
+
+    def string(self, data: str, is_text: bool = True):
+        """
+        Add a string child to the innermost open element.
+
+        Args:
+            data: String content
+            is_text: False for comments, doctypes and processing instructions,
+                     which never count towards get_text()
+        """
+        parent = self._stack[-1]
+        parent[1] += 1
+        parent[2] = True
+        parent[3] = data
+        if is_text and self._non_text_depth == 0:
+            self._add_text(data)
+
+    def cdata(self, data: str):
+        """Add a CDATA section, which counts as text even inside script/style."""
+        self.string(data, is_text=False)
+        self._add_text(data)
+
+    def _add_text(self, data: str):
+        stripped = data.strip()
+        if stripped:
+            self.text_length += len(stripped) + (1 if self.text_pieces else 0)
+            self.text_pieces += 1
+            if self.collect_details:
+                self.text_parts.append(stripped)
+
+    def metrics(self) -> HTMLMetrics:
+        """Close any open elements and return the metrics."""
+        while len(self._stack) > 1:
+            self.end()
+        return HTMLMetrics(
+            text_length=self.text_length,
+            meaningful_elements=self.string_elements + self.src_images + self.href_links,
+            div_count=self.div_count
+        )
+
+    def document(self) -> ParsedDocument:
+        """Close any open elements and return the parsed document."""
+        return ParsedDocument(self.metrics(), self.text_parts, self.scripts, self.elements)
+
+
+class _TreeEventParser(HTMLParser):
+    """
+    Turns html.parser tokens into DocumentBuilder events.
+
+    Applies BeautifulSoup's html.parser tree-building rules, so the events
+    describe the same tree BeautifulSoup(html, 'html.parser') would build.
+    """
+
+    def __init__(self, builder: DocumentBuilder):
+        super().__init__(convert_charrefs=False)
+        self.builder = builder
+        self._open: List[str] = []
+        self._data: List[str] = []
+        # Void elements already closed, whose stray end tags are still to be skipped
+        # (a count per tag: same as BeautifulSoup's list, without its linear scans)
+        self._already_closed_void: Dict[str, int] = {}
+
+    def _end_data(self):
+        """Close the current text run (BeautifulSoup.endData)."""
+        if self._data:
+            data = ''.join(self._data)
+            self._data = []
+            self.builder.string(data)
+
+    def _pop_to(self, name: str):
+        """Pop up to and including the most recent open element called name."""
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i] == name:
+                for _ in range(len(self._open) - i):
+                    self._open.pop()
+                    self.builder.end()
+                return
+
+    def finish(self):
+        """Close the parser and flush pending text."""
+        self.close()
+        self._end_data()
+
+    # HTMLParser events
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]], void: bool = True):
+        self._end_data()
+        self.builder.start(tag, dict(attrs))
+        self._open.append(tag)
+        if void and tag in VOID_ELEMENTS:
+            self._pop_to(tag)
+            self._already_closed_void[tag] = self._already_closed_void.get(tag, 0) + 1
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        self.handle_starttag(tag, attrs, void=False)
+        self._pop_to(tag)
+
+    def handle_endtag(self, tag: str):
+        pending = self._already_closed_void.get(tag)
+        if pending:
+            self._already_closed_void[tag] = pending - 1
+            return
+        self._end_data()
+        self._pop_to(tag)
+
+    def handle_data(self, data: str):
+        self._data.append(data)
+
+    def handle_charref(self, name: str):
+        try:
+            codepoint = int(name[1:], 16) if name[:1] in ('x', 'X') else int(name)
+        except ValueError:
+            self._data.append(name)
+            return
+        if 0x80 <= codepoint <= 0x9f:
+            # References to C1 controls are really windows-1252 characters
+            try:
+                char = bytes([codepoint]).decode('windows-1252')
+            except UnicodeDecodeError:
+                char = chr(codepoint)
+        elif codepoint == 0 or codepoint > 0x10ffff or 0xd800 <= codepoint <= 0xdfff:
+            char = '\N{REPLACEMENT CHARACTER}'
+        else:
+            char = chr(codepoint)
+        self._data.append(char)
+
+    def handle_entityref(self, name: str):
+        self._data.append(_HTML5_ENTITIES.get(name + ';', '&' + name))
+
+    def handle_comment(self, data: str):
+        self._end_data()
+        self.builder.string(data, is_text=False)
+
+    def handle_decl(self, decl: str):
+        self._end_data()
+        self.builder.string(decl, is_text=False)
+
+    def unknown_decl(self, data: str):
+        self._end_data()
+        if data.upper().startswith('CDATA['):
+            self.builder.cdata(data[len('CDATA['):])
+        else:
+            self.builder.string(data, is_text=False)
+
+    def handle_pi(self, data: str):
+        self._end_data()
+        self.builder.string(data, is_text=False)
+
+
+def parse_document(html_content: str, collect_details: bool = False) -> ParsedDocument:
+    """
+    Parse a document with html.parser in a single streaming pass.
+
+    Args:
+        html_content: HTML content
+        collect_details: Also collect text parts, scripts and element attributes
+
+    Returns:
+        ParsedDocument (text_parts/scripts/elements empty unless collect_details)
+    """
+    builder = DocumentBuilder(collect_details=collect_details)
+    parser = _TreeEventParser(builder)
+    parser.feed(html_content)
+    parser.finish()
+    return builder.document()
+
+
+def collect_metrics(html_content: str) -> HTMLMetrics:
+    """
+    Compute HTMLMetrics for a document in a single streaming pass.
+
+    Args:
+        html_content: HTML content
+
+    Returns:
+        HTMLMetrics for the document
+    """
+    return parse_document(html_content).metrics
+
+
+def count_distinct_matches(html_content: str, pattern: Pattern, limit: int) -> int:
+    """
+    Count how many distinct (lowercased) matches of a pattern occur in a document.
+
+    Used for the skeleton indicator check: one case-insensitive regex scan
+    instead of a lowercased copy of the document plus one search per word.
+
+    Args:
+        html_content: HTML content
+        pattern: Compiled alternation of the words to look for
+        limit: Number of distinct words in the pattern (scan stops once all are found)
+
+    Returns:
+        Number of distinct words found
+    """
+    found = set()
+    for match in pattern.finditer(html_content):
+        found.add(match.group(0).lower())
+        if len(found) >= limit:
+            break
+    return len(found)
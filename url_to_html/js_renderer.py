@@ -8,6 +8,7 @@ import requests
 import urllib3
 from typing import Optional, Dict
 from .exceptions import JSRenderError, TimeoutError
+from .session_pool import SessionPool, get_shared_session_pool
 
 # Disable SSL warnings for Decodo proxy
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -32,7 +33,8 @@ def JSrend(
     password: Optional[str] = None,
     headless_mode: str = "html",
     location: Optional[str] = None,
-    language: Optional[str] = None
+    language: Optional[str] = None,
+    session_pool: Optional[SessionPool] = None
 ) -> str:
     """
     Render JavaScript content via Decodo proxy API.
@@ -48,6 +50,7 @@ def JSrend(
         headless_mode: Rendering mode - "html", "screenshot", etc. (default: "html")
         location: Geographic location (e.g., "us")
         language: Language locale (e.g., "en-US")
+        session_pool: Pool of keep-alive sessions (default: shared process-wide pool)
         
     Returns:
         Rendered HTML content as string
@@ -104,9 +107,14 @@ def JSrend(
         "https": proxy_auth_url,
     }
     
+    # Reuse one keep-alive session for every request through the proxy
+    if session_pool is None:
+        session_pool = get_shared_session_pool()
+    session = session_pool.get_session(proxy_auth_url)
+    
     try:
         # Make GET request through Decodo proxy
-        response = requests.get(
+        response = session.get(
             url,
             headers=request_headers,
             proxies=proxies,
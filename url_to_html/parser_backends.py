@@ -0,0 +1,213 @@
+"""
+Pluggable HTML parser backends for ContentAnalyzer.
+
+Every backend turns a document into an html_metrics.ParsedDocument by
+walking its own parse tree into a DocumentBuilder, so the heuristics see
+the same numbers whichever parser produced them:
+
+- "selectolax": selectolax's lexbor HTML5 parser (fastest)
+- "lxml": libxml2 via lxml (the setup.py "fast" extra)
+- "html.parser": the standard library, with BeautifulSoup's tree-building
+  rules (always available)
+
+get_parser_backend("auto") picks lxml if it is installed, else html.parser.
+selectolax builds the HTML5 tree, which differs from html.parser's on tag
+soup (e.g. <template> content is kept out of the tree), so its verdicts
+can differ there and it is only used when asked for by name.
+"""
+
+import logging
+from typing import Dict, List, Optional, Type
+from .html_metrics import DocumentBuilder, ParsedDocument, parse_document
+
+logger = logging.getLogger(__name__)
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:
+    _lxml_etree = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as _LexborHTMLParser
+except ImportError:
+    _LexborHTMLParser = None
+
+# Every backend, fastest first
+BACKEND_ORDER = ("selectolax", "lxml", "html.parser")
+# Preference order for "auto": backends whose verdicts match html.parser's
+AUTO_BACKEND_ORDER = ("lxml", "html.parser")
+
+
+class ParserBackend:
+    """Parses HTML into a ParsedDocument."""
+
+    name = ""
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Whether the backend's parser library is installed."""
+        return True
+
+    def parse(self, html_content: str, collect_details: bool = False) -> ParsedDocument:
+        """
+        Parse a document.
+
+        Args:
+            html_content: HTML content
+            collect_details: Also collect text parts, scripts and element attributes
+
+        Returns:
+            ParsedDocument
+        """
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}()"
+
+
+class HTMLParserBackend(ParserBackend):
+    """Standard library html.parser (same tree as BeautifulSoup's 'html.parser')."""
+
+    name = "html.parser"
+
+    def parse(self, html_content: str, collect_details: bool = False) -> ParsedDocument:
+        return parse_document(html_content, collect_details=collect_details)
+
+
+class LxmlBackend(ParserBackend):
+    """libxml2 HTML parser via lxml."""
+
+    name = "lxml"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return _lxml_etree is not None
+
+    def parse(self, html_content: str, collect_details: bool = False) -> ParsedDocument:
+        builder = DocumentBuilder(collect_details=collect_details)
+        try:
+            root = _lxml_etree.fromstring(html_content, _lxml_etree.HTMLParser())
+        except ValueError:
+            # Unicode strings with an encoding declaration must be passed as bytes
+            root = _lxml_etree.fromstring(
+                html_content.encode('utf-8'),
+                _lxml_etree.HTMLParser(encoding='utf-8')
+            )
+        if root is None:
+            return builder.document()
+
+        # Iterative walk: iterwalk() would skip comments and their tails
+        open_elements = []
+        stack = [iter((root,))]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                if open_elements:
+                    element = open_elements.pop()
+                    builder.end()
+                    if element.tail:
+                        builder.string(element.tail)
+                continue
+
+            if isinstance(node.tag, str):
+                builder.start(node.tag, node.attrib)
+                if node.text:
+                    builder.string(node.text)
+                open_elements.append(node)
+                stack.append(iter(node))
+            else:
+                # Comment or processing instruction
+                builder.string(node.text or '', is_text=False)
+                if node.tail:
+                    builder.string(node.tail)
+        return builder.document()
+
+
+class SelectolaxBackend(ParserBackend):
+    """Lexbor HTML5 parser via selectolax."""
+
+    name = "selectolax"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return _LexborHTMLParser is not None
+
+    def parse(self, html_content: str, collect_details: bool = False) -> ParsedDocument:
+        builder = DocumentBuilder(collect_details=collect_details)
+        tree = _LexborHTMLParser(html_content)
+        root = tree.root
+        if root is None:
+            return builder.document()
+
+        # Iterative pre-order walk over first-child / next-sibling links
+        node = root
+        depth = 0  # elements started and descended into
+        while True:
+            tag = node.tag
+            if tag is None:
+                # Processing instruction (<?php ... ?>): lexbor gives it no tag name
+                builder.string('', is_text=False)
+            elif tag == '-text':
+                builder.string(node.text_content or '')
+            elif tag[0] in '-_!#':
+                # Comment, doctype or other non-element node
+                builder.string('', is_text=False)
+            else:
+                builder.start(tag, node.attributes)
+                child = node.child
+                if child is not None:
+                    node = child
+                    depth += 1
+                    continue
+                builder.end()
+
+            # Next sibling, closing finished ancestors on the way up
+            while depth > 0 and node.next is None:
+                node = node.parent
+                depth -= 1
+                builder.end()
+            if depth == 0:
+                return builder.document()
+            node = node.next
+
+
+BACKENDS: Dict[str, Type[ParserBackend]] = {
+    HTMLParserBackend.name: HTMLParserBackend,
+    LxmlBackend.name: LxmlBackend,
+    SelectolaxBackend.name: SelectolaxBackend,
+}
+
+
+def available_backends() -> List[str]:
+    """Names of the installed backends, fastest first."""
+    return [name for name in BACKEND_ORDER if BACKENDS[name].is_available()]
+
+
+def get_parser_backend(name: Optional[str] = "auto") -> ParserBackend:
+    """
+    Get a parser backend by name.
+
+    Args:
+        name: "auto" (lxml if installed, else html.parser), "selectolax", "lxml"
+              or "html.parser"
+
+    Returns:
+        ParserBackend instance. A named backend that is not installed falls
+        back to html.parser with a warning.
+
+    Raises:
+        ValueError: If the name is not a known backend
+    """
+    if not name or name == "auto":
+        return next(BACKENDS[auto]() for auto in AUTO_BACKEND_ORDER if BACKENDS[auto].is_available())
+
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        raise ValueError(
+            f"Unknown parser backend '{name}'. Choose from: auto, {', '.join(BACKEND_ORDER)}"
+        )
+    if not backend_class.is_available():
+        logger.warning(f"Parser backend '{name}' is not installed, using html.parser")
+        return HTMLParserBackend()
+    return backend_class()
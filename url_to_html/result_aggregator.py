@@ -5,6 +5,7 @@ Result aggregation and summary generation.
 import logging
 from typing import List, Dict, Optional
 from collections import defaultdict
+from .tier_router import TierRouter
 
 logger = logging.getLogger(__name__)
 
@@ -12,9 +13,15 @@ logger = logging.getLogger(__name__)
 class ResultAggregator:
     """Aggregates results from all processing phases."""
     
-    def __init__(self):
-        """Initialize the result aggregator."""
+    def __init__(self, tier_router: Optional[TierRouter] = None):
+        """
+        Initialize the result aggregator.
+        
+        Args:
+            tier_router: Learned tier router fed with each URL's outcome (optional)
+        """
         self.results: List[Dict[str, any]] = []
+        self.tier_router = tier_router
     
     def add_result(
         self,
@@ -22,7 +29,8 @@ class ResultAggregator:
         html: Optional[str],
         method: Optional[str],
         status: str,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        tiers_tried: Optional[List[str]] = None
     ):
         """
         Add a result to the aggregator.
@@ -33,6 +41,7 @@ class ResultAggregator:
             method: Method used (static, xhr, custom_js, decodo)
             status: Status (success or failed)
             error: Error message if failed
+            tiers_tried: Tiers attempted for this URL, in order (fed to the tier router)
         """
         self.results.append({
             "url": url,
@@ -41,6 +50,9 @@ class ResultAggregator:
             "status": status,
             "error": error
         })
+        
+        if self.tier_router is not None and tiers_tried:
+            self.tier_router.record_path(url, tiers_tried, status == "success")
     
     def add_results(self, results: List[Dict[str, any]]):
         """
@@ -106,6 +118,9 @@ class ResultAggregator:
         summary = self.get_summary()
         summary["total_time"] = total_time
         
+        if self.tier_router is not None:
+            self.tier_router.flush()
+        
         return {
             "results": self.results,
             "summary": summary
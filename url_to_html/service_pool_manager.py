@@ -1,17 +1,64 @@
 """
 Service Pool Manager for managing multiple JS rendering services.
 Tracks availability, cooldowns, and distributes batches across services.
+
+One pool is shared by every batch running in the process, so cooldowns hold
+across concurrent batches. Batches waiting for a service are served by a
+fair dispatcher: clients take turns, one service at a time.
+
+Scheduling is event-driven: free services sit in a ready queue, services in
+cooldown in a min-heap keyed by expiry, and a single timer fires when the
+earliest cooldown ends. Waiters are woken through futures the moment a
+service frees up, and every dispatch is O(log n) in the number of services.
+
+Which free service gets the next batch is latency-aware: every service keeps
+an EWMA of its render time per URL and of its success rate, and dispatch
+picks the better of two randomly sampled free services (power of two
+choices), which steers work to fast services without herding on one.
+
+Request budgets are token buckets: each service may render rate_limit_urls
+URLs per rate_limit_window seconds (by default batch_size URLs per
+cooldown_seconds), with up to max_concurrent_batches batches at once. A
+batch spends one token per URL, and a service takes its next batch once it
+holds a full batch's worth of tokens (min(batch_size, rate_limit_urls)), so
+a service that rendered a small batch is free again after a correspondingly
+short wait without being drip-fed one-URL batches. Health probes spend a
+token too.
+
+Each service has a circuit breaker. A failed batch opens it (the service
+leaves the pool); after a backoff that doubles on every consecutive
+opening, the breaker goes half-open and a one-URL probe render is sent.
+A healthy answer closes the breaker and re-admits the service, anything
+else re-opens it.
 """
 
 import logging
 import asyncio
+import aiohttp
+import heapq
+import itertools
+import random
+import threading
 import time
-from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict, deque
+from .async_session_pool import AsyncSessionPool, DEFAULT_DNS_CACHE_TTL, DEFAULT_KEEPALIVE_TIMEOUT
+from typing import Any, Awaitable, Callable, Deque, Hashable, List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# Page rendered to check whether a failed service has recovered
+DEFAULT_PROBE_URL = "https://example.com/"
+
+# Weight of the newest batch in the latency and success-rate averages
+DEFAULT_EWMA_ALPHA = 0.3
+
+
+def _service_url(endpoint: str) -> str:
+    """Turn a bare service host into its render URL."""
+    return f"https://{endpoint}/render" if not endpoint.startswith("http") else endpoint
+
 
 class ServiceStatus(Enum):
     """Status of a service."""
@@ -21,6 +68,13 @@ class ServiceStatus(Enum):
     FAILED = "failed"
 
 
+class BreakerState(Enum):
+    """Circuit breaker state of a service."""
+    CLOSED = "closed"        # in the pool
+    OPEN = "open"            # out of the pool, waiting to be probed
+    HALF_OPEN = "half_open"  # probe in flight
+
+
 @dataclass
 class ServiceInfo:
     """Information about a service."""
@@ -29,6 +83,32 @@ class ServiceInfo:
     cooldown_until: float = 0.0
     last_batch_time: float = 0.0
     failure_count: int = 0
+    breaker_state: BreakerState = BreakerState.CLOSED
+    consecutive_failures: int = 0
+    breaker_openings: int = 0  # consecutive openings, drives the probe backoff
+    probe_at: float = 0.0
+    # Observed performance (EWMA over batches)
+    ewma_seconds_per_url: Optional[float] = None
+    ewma_success_rate: float = 1.0
+    ewma_bytes_per_url: Optional[float] = None
+    batches_completed: int = 0
+    urls_rendered: int = 0
+    busy_seconds: float = 0.0
+    # Request budget (token bucket, one token per URL)
+    tokens: float = 0.0
+    tokens_updated: float = 0.0
+    active_batches: int = 0
+    
+    def expected_seconds_per_success(self) -> float:
+        """Expected render time per successfully rendered URL (0 until measured)."""
+        if self.ewma_seconds_per_url is None:
+            # Unmeasured services look fastest, so each one gets tried early
+            return 0.0
+        return self.ewma_seconds_per_url / max(self.ewma_success_rate, 0.05)
+    
+    def throughput(self) -> float:
+        """Successfully rendered URLs per second of processing."""
+        return self.urls_rendered / self.busy_seconds if self.busy_seconds > 0 else 0.0
     
     def is_available(self) -> bool:
         """Check if service is currently available."""
@@ -48,7 +128,20 @@ class ServicePoolManager:
         self,
         service_endpoints: List[str],
         batch_size: int = 20,
-        cooldown_seconds: int = 120
+        cooldown_seconds: int = 120,
+        failure_threshold: int = 1,
+        probe_backoff_seconds: float = 30,
+        max_probe_backoff_seconds: float = 600,
+        probe_url: Optional[str] = None,
+        probe_timeout: float = 60,
+        probe: Optional[Callable[[ServiceInfo], Awaitable[bool]]] = None,
+        ewma_alpha: float = DEFAULT_EWMA_ALPHA,
+        rate_limit_urls: Optional[int] = None,
+        rate_limit_window: Optional[float] = None,
+        max_concurrent_batches: int = 1,
+        keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = DEFAULT_DNS_CACHE_TTL,
+        compress_requests: bool = False
     ):
         """
         Initialize the service pool manager.
@@ -56,46 +149,350 @@ class ServicePoolManager:
         Args:
             service_endpoints: List of service endpoint URLs
             batch_size: Number of URLs per batch (default: 20)
-            cooldown_seconds: Cooldown period after each batch (default: 120)
+            cooldown_seconds: Default rate limit window, and the cooldown of
+                              mark_service_cooldown() (default: 120)
+            failure_threshold: Consecutive failed batches that open a service's
+                               circuit breaker (default: 1)
+            probe_backoff_seconds: Wait before the first probe of an opened
+                                   breaker, doubled on each re-opening (default: 30)
+            max_probe_backoff_seconds: Upper bound for the probe backoff (default: 600)
+            probe_url: Page rendered by health probes (default: DEFAULT_PROBE_URL)
+            probe_timeout: Timeout of one probe render in seconds (default: 60)
+            probe: Custom health check, awaited with the service; returns
+                   whether it is healthy (default: a probe render of probe_url)
+            ewma_alpha: Weight of the newest batch in each service's latency and
+                        success-rate averages (default: 0.3)
+            rate_limit_urls: URLs each service may render per window, also the
+                             burst size (default: batch_size)
+            rate_limit_window: Window of the URL budget in seconds; 0 disables the
+                               budget (default: cooldown_seconds)
+            max_concurrent_batches: Batches one service may run at once (default: 1)
+            keepalive_timeout: Seconds an idle connection to a service is kept
+                               open for the next batch (default: 75)
+            dns_cache_ttl: Seconds service DNS lookups are cached (default: 300)
+            compress_requests: Gzip request bodies sent to the services (default: False)
         """
         self.services = [
             ServiceInfo(
-                endpoint=f"https://{endpoint}/render" if not endpoint.startswith("http") else endpoint,
+                endpoint=_service_url(endpoint),
                 status=ServiceStatus.AVAILABLE
             )
             for endpoint in service_endpoints
         ]
         self.batch_size = batch_size
         self.cooldown_seconds = cooldown_seconds
+        self.failure_threshold = max(1, failure_threshold)
+        self.probe_backoff_seconds = probe_backoff_seconds
+        self.max_probe_backoff_seconds = max_probe_backoff_seconds
+        self.probe_url = probe_url or DEFAULT_PROBE_URL
+        self.probe_timeout = probe_timeout
+        self.probe = probe or self._probe_render
+        self.ewma_alpha = ewma_alpha
+        self.rate_limit_urls = rate_limit_urls if rate_limit_urls is not None else batch_size
+        self.rate_limit_window = rate_limit_window if rate_limit_window is not None else cooldown_seconds
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        # Token refill rate in URLs per second (None: no budget)
+        self._refill_rate = (
+            self.rate_limit_urls / self.rate_limit_window
+            if self.rate_limit_urls > 0 and self.rate_limit_window > 0 else None
+        )
+        # Tokens a service needs before it takes another batch
+        self._batch_tokens = float(max(1, min(self.batch_size, self.rate_limit_urls)))
+        now = time.time()
+        for service in self.services:
+            service.tokens = float(self.rate_limit_urls)
+            service.tokens_updated = now
         self.lock = asyncio.Lock()
         
+        # Keep-alive connections to the services, shared by every batch and probe
+        # (one connection per concurrent batch, plus one for probes)
+        self.sessions = AsyncSessionPool(
+            limit_per_host=self.max_concurrent_batches + 1,
+            keepalive_timeout=keepalive_timeout,
+            dns_cache_ttl=dns_cache_ttl,
+            compress_requests=compress_requests
+        )
+        
+        # Pending acquire_service() calls, as (future, avoid), per client in round-robin order
+        self._waiters: "OrderedDict[Hashable, Deque[Tuple[asyncio.Future, Optional[Set[str]]]]]" = OrderedDict()
+        
+        # Free services, sampled for power-of-two-choices selection.
+        # Entries are re-checked when sampled; _ready_index maps id -> position.
+        self._ready: List[ServiceInfo] = list(self.services)
+        self._ready_index: Dict[int, int] = {id(service): i for i, service in enumerate(self.services)}
+        # (cooldown_until, seq, service) for services in cooldown
+        self._cooldowns: List[Tuple[float, int, ServiceInfo]] = []
+        self._seq = itertools.count()
+        # Fires when the earliest cooldown ends while clients are waiting
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_due = 0.0
+        
+        # Circuit breakers: pending probe timers and probes in flight
+        self._probe_timers: Dict[int, asyncio.TimerHandle] = {}
+        self._probe_tasks: Set[asyncio.Task] = set()
+        
         logger.info(f"Initialized service pool with {len(self.services)} services")
     
     async def get_available_service(self) -> Optional[ServiceInfo]:
         """
-        Get an available service for processing.
+        Get an available service for processing (without reserving it).
         
         Returns:
             Available ServiceInfo or None if all services are busy
         """
         async with self.lock:
-            # Check all services and update their status
-            for service in self.services:
-                if service.is_available():
-                    return service
-            
-            # Check if any service is in cooldown and will be available soon
-            available_soon = None
-            min_wait_time = float('inf')
+            self._promote_expired()
+            return self._choose_ready()  # None if all services are busy
+    
+    def serves(self, service_endpoints: List[str]) -> bool:
+        """Whether this pool manages exactly the given service endpoints."""
+        return sorted(_service_url(endpoint) for endpoint in service_endpoints) == sorted(
+            service.endpoint for service in self.services
+        )
+    
+    async def acquire_service(
+        self,
+        client: Hashable = None,
+        timeout: Optional[float] = None,
+        avoid: Optional[Set[str]] = None
+    ) -> Optional[ServiceInfo]:
+        """
+        Wait for a service and mark it as processing.
+        
+        Clients (e.g. the batches sharing this pool) are served in turn, so a
+        batch that queued many requests cannot starve the others.
+        
+        Args:
+            client: Identifies the requester for fair scheduling
+            timeout: Maximum time to wait in seconds
+            avoid: Endpoints to pass over while any other service is free
+                   (e.g. services that already failed the URLs being retried)
             
-            for service in self.services:
-                if service.status == ServiceStatus.COOLDOWN:
-                    wait_time = service.cooldown_until - time.time()
-                    if wait_time < min_wait_time:
-                        min_wait_time = wait_time
-                        available_soon = service
+        Returns:
+            Service reserved for the caller, or None if timeout
+        """
+        future = asyncio.get_running_loop().create_future()
+        async with self.lock:
+            self._waiters.setdefault(client, deque()).append((future, avoid))
+            self._dispatch()
+        
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        except asyncio.CancelledError:
+            # The service may have been handed over just before the cancellation
+            if future.done() and not future.cancelled():
+                await self.release_service(future.result())
+            raise
+    
+    async def release_service(self, service: ServiceInfo):
+        """Return a reserved service to the pool without using it."""
+        async with self.lock:
+            self._settle(service)
+            self._dispatch()
+    
+    def _next_waiter(self) -> Optional[Tuple[asyncio.Future, Optional[Set[str]]]]:
+        """Pop the oldest pending (future, avoid) waiter of the next client in round-robin order."""
+        while self._waiters:
+            client, waiters = next(iter(self._waiters.items()))
+            while waiters and waiters[0][0].done():
+                # Timed out or cancelled
+                waiters.popleft()
+            if not waiters:
+                del self._waiters[client]
+                continue
+            waiter = waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(client)
+            else:
+                del self._waiters[client]
+            return waiter
+        return None
+    
+    def _make_ready(self, service: ServiceInfo):
+        """Mark a service available and add it to the ready set."""
+        service.status = ServiceStatus.AVAILABLE
+        if id(service) not in self._ready_index:
+            self._ready_index[id(service)] = len(self._ready)
+            self._ready.append(service)
+    
+    def _remove_ready(self, service: ServiceInfo):
+        """Remove a service from the ready set in O(1) (swap with the last entry)."""
+        i = self._ready_index.pop(id(service))
+        last = self._ready.pop()
+        if last is not service:
+            self._ready[i] = last
+            self._ready_index[id(last)] = i
+    
+    def _choose_ready(self, avoid: Optional[Set[str]] = None) -> Optional[ServiceInfo]:
+        """
+        Pick a free service by power of two choices.
+        
+        Samples two free services and returns the one with the lower
+        expected time per successful URL. Entries whose service changed
+        state since joining the ready set are dropped on the way.
+        
+        Args:
+            avoid: Endpoints to pass over unless no other service is free
+        """
+        while self._ready:
+            ready = self._ready
+            if avoid:
+                ready = [service for service in self._ready if service.endpoint not in avoid] or ready
+            candidates = random.sample(ready, 2) if len(ready) > 1 else [ready[0]]
+            stale = [service for service in candidates if service.status != ServiceStatus.AVAILABLE]
+            if stale:
+                for service in stale:
+                    self._remove_ready(service)
+                continue
+            return min(candidates, key=ServiceInfo.expected_seconds_per_success)
+        return None
+    
+    def _refill(self, service: ServiceInfo, now: float):
+        """Add the tokens a service earned since its last update."""
+        if self._refill_rate is None:
+            return
+        service.tokens = min(
+            float(self.rate_limit_urls),
+            service.tokens + (now - service.tokens_updated) * self._refill_rate
+        )
+        service.tokens_updated = now
+    
+    def _budget_wait(self, service: ServiceInfo, now: float) -> float:
+        """Seconds until a service has tokens for a full batch."""
+        if self._refill_rate is None:
+            return 0.0
+        self._refill(service, now)
+        if service.tokens >= self._batch_tokens - 1e-9:
+            return 0.0
+        return (self._batch_tokens - service.tokens) / self._refill_rate
+    
+    def _start_cooldown(self, service: ServiceInfo, until: float):
+        """Put a service in cooldown; the heap and timer bring it back."""
+        service.status = ServiceStatus.COOLDOWN
+        service.cooldown_until = until
+        heapq.heappush(self._cooldowns, (until, next(self._seq), service))
+    
+    def _settle(self, service: ServiceInfo):
+        """
+        End one of a service's batches: it is free again at once if its budget
+        allows, otherwise in cooldown until enough tokens have refilled.
+        """
+        service.active_batches = max(0, service.active_batches - 1)
+        if service.breaker_state != BreakerState.CLOSED:
+            return
+        now = time.time()
+        wait = self._budget_wait(service, now)
+        if wait > 0:
+            if service.status != ServiceStatus.COOLDOWN or service.cooldown_until < now + wait:
+                self._start_cooldown(service, now + wait)
+        elif service.status != ServiceStatus.COOLDOWN and service.active_batches < self.max_concurrent_batches:
+            self._make_ready(service)
+    
+    async def reserve_urls(self, service: ServiceInfo, url_count: int) -> int:
+        """
+        Spend a reserved service's budget on a batch.
+        
+        Args:
+            service: Service returned by acquire_service()
+            url_count: URLs the caller would like to send
             
-            return None  # All services busy
+        Returns:
+            URLs the caller may send now (at most url_count, 0 if the budget is spent)
+        """
+        async with self.lock:
+            if self._refill_rate is None:
+                return url_count
+            now = time.time()
+            self._refill(service, now)
+            granted = max(0, min(url_count, int(service.tokens + 1e-9)))
+            service.tokens -= granted
+            if service.status == ServiceStatus.AVAILABLE:
+                wait = self._budget_wait(service, now)
+                if wait > 0:
+                    # Still had room for another concurrent batch, but not the budget for one
+                    self._start_cooldown(service, now + wait)
+                    self._schedule_timer()
+            return granted
+    
+    def _promote_expired(self):
+        """Move services whose cooldown has ended from the heap to the ready queue."""
+        now = time.time()
+        while self._cooldowns and self._cooldowns[0][0] <= now:
+            cooldown_until, _, service = heapq.heappop(self._cooldowns)
+            # Ignore entries superseded by a later state change
+            if cooldown_until != service.cooldown_until:
+                continue
+            if service.status == ServiceStatus.COOLDOWN or (
+                # ServiceInfo.is_available() may already have flipped it
+                service.status == ServiceStatus.AVAILABLE and id(service) not in self._ready_index
+            ):
+                if service.active_batches >= self.max_concurrent_batches:
+                    service.status = ServiceStatus.PROCESSING
+                else:
+                    self._make_ready(service)
+    
+    def _dispatch(self):
+        """Hand free services to waiting clients (runs without awaiting, so it is atomic)."""
+        self._promote_expired()
+        while self._waiters:
+            if self._choose_ready() is None:
+                break
+            waiter = self._next_waiter()
+            if waiter is None:
+                # Only stale waiters were left
+                break
+            future, avoid = waiter
+            service = self._choose_ready(avoid)
+            service.active_batches += 1
+            if service.active_batches >= self.max_concurrent_batches:
+                self._remove_ready(service)
+                service.status = ServiceStatus.PROCESSING
+            service.last_batch_time = time.time()
+            future.set_result(service)
+        self._schedule_timer()
+    
+    def _schedule_timer(self):
+        """Arm the timer for the earliest cooldown expiry while clients are waiting."""
+        if not self._waiters or not self._cooldowns:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            return
+        due = self._cooldowns[0][0]
+        if self._timer is not None:
+            if self._timer_due == due:
+                return
+            self._timer.cancel()
+        self._timer_due = due
+        self._timer = asyncio.get_running_loop().call_later(
+            max(0.0, due - time.time()), self._on_timer
+        )
+    
+    def _on_timer(self):
+        """A cooldown has ended: dispatch to waiting clients."""
+        self._timer = None
+        self._dispatch()
+    
+    async def close(self):
+        """Stop the timers and probes, fail every pending acquire_service() call and close the connections."""
+        for task in list(self._probe_tasks):
+            task.cancel()
+        await asyncio.gather(*self._probe_tasks, return_exceptions=True)
+        async with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            for handle in self._probe_timers.values():
+                handle.cancel()
+            self._probe_timers.clear()
+            for waiters in self._waiters.values():
+                for future, _ in waiters:
+                    if not future.done():
+                        future.set_result(None)
+            self._waiters.clear()
+        await self.sessions.close()
     
     async def mark_service_processing(self, service: ServiceInfo):
         """Mark a service as processing a batch."""
@@ -103,29 +500,146 @@ class ServicePoolManager:
             service.status = ServiceStatus.PROCESSING
             service.last_batch_time = time.time()
     
-    async def mark_service_cooldown(self, service: ServiceInfo):
-        """Mark a service as in cooldown after completing a batch."""
+    async def finish_batch(self, service: ServiceInfo):
+        """
+        Return a service after a successful batch.
+        
+        The service takes the next batch as soon as its URL budget allows.
+        
+        Args:
+            service: Service that finished a batch
+        """
         async with self.lock:
-            service.status = ServiceStatus.COOLDOWN
-            service.cooldown_until = time.time() + self.cooldown_seconds
-            logger.debug(f"Service {service.endpoint} entering {self.cooldown_seconds}s cooldown")
+            service.consecutive_failures = 0
+            self._settle(service)
+            if service.status == ServiceStatus.COOLDOWN:
+                logger.debug(
+                    f"Service {service.endpoint} budget spent, free in "
+                    f"{service.cooldown_until - time.time():.1f}s"
+                )
+            self._dispatch()
+    
+    async def mark_service_cooldown(self, service: ServiceInfo, cooldown_seconds: Optional[float] = None):
+        """
+        Mark a service as in cooldown for a fixed time after completing a batch.
+        
+        Args:
+            service: Service that finished a batch
+            cooldown_seconds: Cooldown to apply (default: the pool's cooldown)
+        """
+        if cooldown_seconds is None:
+            cooldown_seconds = self.cooldown_seconds
+        async with self.lock:
+            service.consecutive_failures = 0
+            service.active_batches = max(0, service.active_batches - 1)
+            self._start_cooldown(service, time.time() + cooldown_seconds)
+            logger.debug(f"Service {service.endpoint} entering {cooldown_seconds}s cooldown")
+            self._dispatch()
     
     async def mark_service_failed(self, service: ServiceInfo):
-        """Mark a service as failed and increment failure count."""
+        """Record a failed batch; opens the service's circuit breaker at the failure threshold."""
         async with self.lock:
             service.failure_count += 1
-            service.status = ServiceStatus.FAILED
+            service.consecutive_failures += 1
             logger.warning(f"Service {service.endpoint} marked as failed (failure count: {service.failure_count})")
+            if service.breaker_state != BreakerState.CLOSED:
+                service.active_batches = max(0, service.active_batches - 1)
+                return
+            if service.consecutive_failures >= self.failure_threshold:
+                service.active_batches = max(0, service.active_batches - 1)
+                self._open_breaker(service)
+            else:
+                # Below the threshold the service stays in the pool
+                self._settle(service)
+                self._dispatch()
     
     async def mark_service_available(self, service: ServiceInfo):
-        """Mark a service as available again (after recovery)."""
+        """Re-admit a service by hand (or return one after a batch), closing its circuit breaker."""
+        async with self.lock:
+            service.active_batches = max(0, service.active_batches - 1)
+            self._cancel_probe(service)
+            self._close_breaker(service)
+            logger.info(f"Service {service.endpoint} recovered and available")
+            self._dispatch()
+    
+    def _open_breaker(self, service: ServiceInfo):
+        """Take a service out of the pool and schedule its probe with exponential backoff."""
+        backoff = min(
+            self.max_probe_backoff_seconds,
+            self.probe_backoff_seconds * (2 ** service.breaker_openings)
+        )
+        service.breaker_openings += 1
+        service.breaker_state = BreakerState.OPEN
+        service.status = ServiceStatus.FAILED
+        service.probe_at = time.time() + backoff
+        self._cancel_probe(service)
+        self._probe_timers[id(service)] = asyncio.get_running_loop().call_later(
+            backoff, self._start_probe, service
+        )
+        logger.warning(f"Circuit breaker opened for {service.endpoint}, probing in {backoff:.0f}s")
+    
+    def _close_breaker(self, service: ServiceInfo):
+        """Put a service back in the pool (in cooldown until its budget allows a batch)."""
+        service.breaker_state = BreakerState.CLOSED
+        service.consecutive_failures = 0
+        service.breaker_openings = 0
+        service.probe_at = 0.0
+        now = time.time()
+        wait = self._budget_wait(service, now)
+        if wait > 0:
+            self._start_cooldown(service, now + wait)
+        else:
+            self._make_ready(service)
+    
+    def _cancel_probe(self, service: ServiceInfo):
+        """Cancel a scheduled probe of a service."""
+        handle = self._probe_timers.pop(id(service), None)
+        if handle is not None:
+            handle.cancel()
+    
+    def _start_probe(self, service: ServiceInfo):
+        """Backoff elapsed: go half-open and probe the service."""
+        self._probe_timers.pop(id(service), None)
+        service.breaker_state = BreakerState.HALF_OPEN
+        if self._refill_rate is not None:
+            # The probe renders a URL like any batch
+            self._refill(service, time.time())
+            service.tokens -= 1
+        task = asyncio.ensure_future(self._run_probe(service))
+        self._probe_tasks.add(task)
+        task.add_done_callback(self._probe_tasks.discard)
+    
+    async def _run_probe(self, service: ServiceInfo):
+        """Probe a half-open service, then close or re-open its breaker."""
+        try:
+            healthy = await self.probe(service)
+        except Exception as e:
+            logger.debug(f"Probe of {service.endpoint} failed: {e}")
+            healthy = False
+        
         async with self.lock:
-            if service.failure_count < 3:  # Allow recovery if not too many failures
-                service.status = ServiceStatus.AVAILABLE
-                service.failure_count = 0
-                logger.info(f"Service {service.endpoint} recovered and available")
+            if service.breaker_state != BreakerState.HALF_OPEN:
+                # Re-admitted by hand while the probe was in flight
+                return
+            if healthy:
+                self._close_breaker(service)
+                logger.info(f"Circuit breaker closed for {service.endpoint}, service re-admitted")
+                self._dispatch()
             else:
-                logger.warning(f"Service {service.endpoint} has too many failures, keeping as failed")
+                self._open_breaker(service)
+    
+    async def _probe_render(self, service: ServiceInfo) -> bool:
+        """Render probe_url on the service; healthy if it answers with a well-formed result."""
+        async with self.sessions.post(
+            service.endpoint,
+            json={"urls": [self.probe_url]},
+            headers={'Content-Type': 'application/json'},
+            timeout=aiohttp.ClientTimeout(total=self.probe_timeout)
+        ) as response:
+            if response.status != 200:
+                return False
+            data = await response.json()
+            return isinstance(data, dict) and "results" in data
     
     async def get_all_available_services(self) -> List[ServiceInfo]:
         """
@@ -135,15 +649,75 @@ class ServicePoolManager:
             List of available services
         """
         async with self.lock:
-            available = []
-            for service in self.services:
-                if service.is_available():
-                    available.append(service)
-            return available
+            self._promote_expired()
+            return [service for service in self._ready if service.status == ServiceStatus.AVAILABLE]
+    
+    async def record_batch_result(
+        self,
+        service: ServiceInfo,
+        url_count: int,
+        successful: int,
+        elapsed: float,
+        html_bytes: int = 0
+    ):
+        """
+        Update a service's latency, success-rate and page-size averages after a batch.
+        
+        Args:
+            service: Service that processed the batch
+            url_count: URLs in the batch
+            successful: URLs rendered successfully
+            elapsed: Wall time of the batch in seconds (the timeout if it timed out)
+            html_bytes: Total size of the rendered pages
+        """
+        if url_count <= 0:
+            return
+        seconds_per_url = elapsed / url_count
+        success_rate = successful / url_count
+        alpha = self.ewma_alpha
+        async with self.lock:
+            if service.ewma_seconds_per_url is None:
+                service.ewma_seconds_per_url = seconds_per_url
+                service.ewma_success_rate = success_rate
+            else:
+                service.ewma_seconds_per_url += alpha * (seconds_per_url - service.ewma_seconds_per_url)
+                service.ewma_success_rate += alpha * (success_rate - service.ewma_success_rate)
+            if successful:
+                bytes_per_url = html_bytes / successful
+                if service.ewma_bytes_per_url is None:
+                    service.ewma_bytes_per_url = bytes_per_url
+                else:
+                    service.ewma_bytes_per_url += alpha * (bytes_per_url - service.ewma_bytes_per_url)
+            service.batches_completed += 1
+            service.urls_rendered += successful
+            service.busy_seconds += elapsed
+    
+    async def get_service_stats(self) -> List[Dict[str, any]]:
+        """Per-service state and observed performance, fastest expected first."""
+        async with self.lock:
+            services = sorted(self.services, key=ServiceInfo.expected_seconds_per_success)
+            return [
+                {
+                    "endpoint": service.endpoint,
+                    "status": service.status.value,
+                    "breaker": service.breaker_state.value,
+                    "seconds_per_url": service.ewma_seconds_per_url,
+                    "success_rate": service.ewma_success_rate,
+                    "bytes_per_url": service.ewma_bytes_per_url,
+                    "url_budget": int(service.tokens) if self._refill_rate is not None else None,
+                    "active_batches": service.active_batches,
+                    "throughput": service.throughput(),
+                    "batches": service.batches_completed
+                }
+                for service in services
+            ]
     
     async def wait_for_available_service(self, timeout: Optional[float] = None) -> Optional[ServiceInfo]:
         """
-        Wait for a service to become available.
+        Wait for a service to become available and reserve it (status PROCESSING).
+        
+        Same as acquire_service() without a client: woken as soon as a
+        service frees up instead of polling.
         
         Args:
             timeout: Maximum time to wait in seconds
@@ -151,34 +725,32 @@ class ServicePoolManager:
         Returns:
             Available service or None if timeout
         """
-        start_time = time.time()
-        
-        while True:
-            service = await self.get_available_service()
-            if service:
-                return service
-            
-            # Check timeout
-            if timeout and (time.time() - start_time) >= timeout:
-                return None
-            
-            # Wait a bit before checking again
-            await asyncio.sleep(0.5)
+        return await self.acquire_service(timeout=timeout)
     
     def get_service_count(self) -> int:
         """Get total number of services in pool."""
         return len(self.services)
     
     async def get_status_summary(self) -> Dict[str, int]:
-        """Get summary of service statuses."""
+        """Get summary of service statuses and of the batches waiting for one."""
         async with self.lock:
             summary = {
                 "available": 0,
                 "processing": 0,
                 "cooldown": 0,
-                "failed": 0
+                "failed": 0,
+                "waiting_batches": 0,
+                "waiting_clients": 0,
+                "breaker_closed": 0,
+                "breaker_open": 0,
+                "breaker_half_open": 0
             }
             
+            for waiters in self._waiters.values():
+                pending = sum(1 for future, _ in waiters if not future.done())
+                summary["waiting_batches"] += pending
+                summary["waiting_clients"] += 1 if pending else 0
+            
             for service in self.services:
                 if service.is_available():
                     summary["available"] += 1
@@ -188,6 +760,111 @@ class ServicePoolManager:
                     summary["cooldown"] += 1
                 elif service.status == ServiceStatus.FAILED:
                     summary["failed"] += 1
+                summary[f"breaker_{service.breaker_state.value}"] += 1
             
             return summary
 
+
+
+# Shared pools per event loop: the pool's lock and waiters belong to one loop.
+# Each loop has one pool per set of services, with the settings it was created
+# with; the loop's pools are closed (and dropped) when the loop shuts down.
+_shared_pools: Dict[
+    asyncio.AbstractEventLoop, Dict[Tuple[str, ...], Tuple[ServicePoolManager, Dict[str, Any]]]
+] = {}
+_shared_pool_keepers: Dict[asyncio.AbstractEventLoop, "asyncio.Task[None]"] = {}
+_shared_pools_lock = threading.Lock()
+
+
+async def _close_pools_at_shutdown(loop: asyncio.AbstractEventLoop):
+    """Wait until the loop shuts down (cancels its tasks), then close its shared pools."""
+    try:
+        await loop.create_future()
+    finally:
+        with _shared_pools_lock:
+            pools = _shared_pools.pop(loop, {})
+            _shared_pool_keepers.pop(loop, None)
+        for pool, _ in pools.values():
+            try:
+                await pool.close()
+            except Exception as e:
+                logger.warning(f"Error closing shared service pool: {e}")
+
+
+def get_service_pool(
+    service_endpoints: List[str],
+    batch_size: int = 20,
+    cooldown_seconds: int = 120,
+    probe_url: Optional[str] = None,
+    probe_backoff_seconds: float = 30,
+    rate_limit_urls: Optional[int] = None,
+    rate_limit_window: Optional[float] = None,
+    max_concurrent_batches: int = 1,
+    keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl: int = DEFAULT_DNS_CACHE_TTL,
+    compress_requests: bool = False
+) -> ServicePoolManager:
+    """
+    Get the shared service pool for a set of service endpoints.
+    
+    Must be called from a running event loop; every batch on that loop that
+    renders through the same services shares the returned pool, and with it
+    their cooldowns, circuit breakers and URL budgets. The first call creates
+    the pool with its settings. Batch sizes are per request (each renderer
+    sizes its own batches), so batch_size only sets a new pool's default
+    budget; every other setting must match the pool's. The loop's pools are
+    closed when it shuts down.
+    
+    Args:
+        service_endpoints: List of service endpoint URLs
+        batch_size: Number of URLs per batch
+        cooldown_seconds: Default rate limit window
+        probe_url: Page rendered by health probes of failed services
+        probe_backoff_seconds: Wait before a failed service's first probe
+        rate_limit_urls: URLs per service per window (default: batch_size)
+        rate_limit_window: Budget window in seconds (default: cooldown_seconds)
+        max_concurrent_batches: Batches one service may run at once
+        keepalive_timeout: Seconds idle service connections are kept open
+        dns_cache_ttl: Seconds service DNS lookups are cached
+        compress_requests: Gzip request bodies sent to the services
+        
+    Returns:
+        Shared ServicePoolManager instance
+        
+    Raises:
+        ValueError: If the services already have a pool with different settings
+    """
+    loop = asyncio.get_running_loop()
+    key = tuple(sorted(_service_url(endpoint) for endpoint in service_endpoints))
+    settings = {
+        "cooldown_seconds": cooldown_seconds,
+        "probe_url": probe_url,
+        "probe_backoff_seconds": probe_backoff_seconds,
+        "rate_limit_urls": rate_limit_urls,
+        "rate_limit_window": rate_limit_window,
+        "max_concurrent_batches": max_concurrent_batches,
+        "keepalive_timeout": keepalive_timeout,
+        "dns_cache_ttl": dns_cache_ttl,
+        "compress_requests": compress_requests,
+    }
+    with _shared_pools_lock:
+        if loop not in _shared_pool_keepers:
+            _shared_pool_keepers[loop] = loop.create_task(_close_pools_at_shutdown(loop))
+        pools = _shared_pools.setdefault(loop, {})
+        if key not in pools:
+            pool = ServicePoolManager(service_endpoints=service_endpoints, batch_size=batch_size, **settings)
+            pools[key] = (pool, settings)
+            return pool
+        pool, pool_settings = pools[key]
+    
+    conflicts = [
+        f"{name}={value!r} (pool has {pool_settings[name]!r})"
+        for name, value in settings.items()
+        if value != pool_settings[name]
+    ]
+    if conflicts:
+        raise ValueError(
+            f"The shared service pool for {', '.join(key)} was created with other settings: "
+            f"{', '.join(conflicts)}. Use the same settings, or pass your own ServicePoolManager."
+        )
+    return pool
@@ -0,0 +1,152 @@
+"""
+Shared HTTP connection pooling for the synchronous fetch tiers.
+"""
+
+import logging
+import threading
+import requests
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+# Hosts with a live session; the least recently used one is closed beyond this
+DEFAULT_MAX_HOSTS = 256
+
+
+class _NoCookiesPolicy(DefaultCookiePolicy):
+    """Cookie policy that never stores a cookie in a pooled session."""
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+class SessionPool:
+    """Thread-safe pool of keep-alive requests sessions, one per host."""
+
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        pool_block: bool = False,
+        max_hosts: int = DEFAULT_MAX_HOSTS
+    ):
+        """
+        Initialize the session pool.
+
+        Args:
+            pool_connections: Number of urllib3 connection pools cached per session
+            pool_maxsize: Maximum number of keep-alive connections kept per host
+            pool_block: Whether to block when a host pool has no free connection
+                        (instead of opening a throwaway connection)
+            max_hosts: Maximum hosts with a live session; the least recently
+                       used host's session is closed to make room
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.max_hosts = max(1, max_hosts)
+        self._sessions: "OrderedDict[str, requests.Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        """Return the scheme://host[:port] key a URL is pooled under."""
+        parsed = urlparse(url)
+        scheme = (parsed.scheme or "http").lower()
+        host = (parsed.hostname or "").lower()
+        if parsed.port:
+            return f"{scheme}://{host}:{parsed.port}"
+        return f"{scheme}://{host}"
+
+    def _create_session(self) -> requests.Session:
+        """Create a session with a sized keep-alive adapter and no cookie jar persistence."""
+        session = requests.Session()
+        # Sessions are shared by unrelated fetches (and every site behind a
+        # proxy): cookies one response sets must not be sent with the next
+        session.cookies.set_policy(_NoCookiesPolicy())
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get_session(self, url: str) -> requests.Session:
+        """
+        Get the long-lived session for the host of a URL.
+
+        Args:
+            url: URL (or proxy URL) whose host the session is keyed on
+
+        Returns:
+            requests.Session shared by every caller hitting that host
+        """
+        key = self._host_key(url)
+        evicted = None
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+                return session
+            session = self._create_session()
+            self._sessions[key] = session
+            logger.debug(f"Created pooled session for {key}")
+            if len(self._sessions) > self.max_hosts:
+                evicted_key, evicted = self._sessions.popitem(last=False)
+                logger.debug(f"Closing pooled session for least recently used host {evicted_key}")
+        if evicted is not None:
+            evicted.close()
+        return session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Issue a GET request through the pooled session for the URL's host."""
+        return self.get_session(url).get(url, **kwargs)
+
+    def close(self):
+        """Close every pooled session and drop their connections."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+_shared_pools: Dict[Tuple[int, int], SessionPool] = {}
+_shared_pools_lock = threading.Lock()
+
+
+def get_shared_session_pool(
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE
+) -> SessionPool:
+    """
+    Get the process-wide session pool for the given pool sizes.
+
+    Every fetcher configured with the same sizes shares one pool, so
+    connections stay warm across fetch_html calls and across tiers.
+
+    Args:
+        pool_connections: Number of urllib3 connection pools cached per session
+        pool_maxsize: Maximum number of keep-alive connections kept per host
+
+    Returns:
+        Shared SessionPool instance
+    """
+    key = (pool_connections, pool_maxsize)
+    with _shared_pools_lock:
+        pool = _shared_pools.get(key)
+        if pool is None:
+            pool = SessionPool(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize
+            )
+            _shared_pools[key] = pool
+        return pool
@@ -6,6 +6,7 @@ import logging
 import requests
 from typing import Optional, Dict, Any, Tuple
 from .exceptions import BlockedError, TimeoutError, InvalidURLError
+from .session_pool import SessionPool, get_shared_session_pool
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +18,8 @@ class StaticFetcher:
         self,
         timeout: int = 30,
         headers: Optional[Dict[str, str]] = None,
-        allow_redirects: bool = True
+        allow_redirects: bool = True,
+        session_pool: Optional[SessionPool] = None
     ):
         """
         Initialize the static fetcher.
@@ -26,6 +28,7 @@ class StaticFetcher:
             timeout: Request timeout in seconds
             headers: Custom headers to include in requests
             allow_redirects: Whether to follow redirects
+            session_pool: Pool of keep-alive sessions (default: shared process-wide pool)
         """
         self.timeout = timeout
         self.default_headers = {
@@ -39,6 +42,7 @@ class StaticFetcher:
         if headers:
             self.default_headers.update(headers)
         self.allow_redirects = allow_redirects
+        self.session_pool = session_pool or get_shared_session_pool()
     
     def fetch(self, url: str) -> Tuple[Optional[str], int]:
         """
@@ -56,7 +60,7 @@ class StaticFetcher:
         """
         try:
             logger.info(f"Attempting static fetch for: {url}")
-            response = requests.get(
+            response = self.session_pool.get(
                 url,
                 headers=self.default_headers,
                 timeout=self.timeout,
@@ -0,0 +1,132 @@
+"""
+Learned tier routing.
+
+Keeps a persistent (SQLite) per-domain success rate for every fetch tier
+and picks the tier each URL should start at, skipping tiers that keep
+failing on that domain. A small exploration rate sends some URLs down the
+full chain so the stats stay fresh.
+"""
+
+import random
+from typing import Optional, Sequence
+from .domain_stats import DomainStatsStore, domain_of, get_shared_store
+
+# Tier chains, in fallback order
+BATCH_TIERS = ("static", "xhr", "custom_js", "decodo")
+SYNC_TIERS = ("static", "xhr", "js")
+
+
+class TierRouter(DomainStatsStore):
+    """Per-domain tier success-rate store used to pick each URL's starting tier."""
+
+    table = "tier_stats"
+    key_column = "tier"
+    value_columns = (("attempts", "REAL"), ("successes", "REAL"))
+    description = "tier stats"
+
+    def __init__(
+        self,
+        path: str,
+        exploration_rate: float = 0.05,
+        min_samples: int = 20,
+        skip_below: float = 0.05,
+        window: int = 500,
+        flush_interval: float = 5.0
+    ):
+        """
+        Initialize the tier router.
+
+        Args:
+            path: SQLite database file (created if missing)
+            exploration_rate: Probability of starting a URL at the first tier
+                              regardless of stats
+            min_samples: Attempts needed before a tier may be skipped
+            skip_below: Success rate under which a tier is skipped
+            window: Attempts after which counts are halved, so old outcomes fade
+            flush_interval: Seconds between automatic writes to disk
+        """
+        super().__init__(path, flush_interval=flush_interval)
+        self.exploration_rate = exploration_rate
+        self.min_samples = min_samples
+        self.skip_below = skip_below
+        self.window = window
+
+    def choose_start_tier(self, url: str, tiers: Sequence[str] = BATCH_TIERS) -> str:
+        """
+        Pick the tier a URL should start at.
+
+        Args:
+            url: URL to route
+            tiers: Tier chain in fallback order
+
+        Returns:
+            Name of the first tier worth attempting (never skips the last tier)
+        """
+        if random.random() < self.exploration_rate:
+            return tiers[0]
+
+        domain = domain_of(url)
+        with self._lock:
+            stats = self._load_domain(domain)
+            for tier in tiers[:-1]:
+                attempts, successes = stats.get(tier, (0.0, 0.0))
+                if attempts >= self.min_samples and successes / attempts < self.skip_below:
+                    continue
+                return tier
+        return tiers[-1]
+
+    def record(self, url: str, tier: str, success: bool):
+        """
+        Record the outcome of one tier attempt.
+
+        Args:
+            url: URL that was fetched
+            tier: Tier that was attempted
+            success: Whether the tier produced valid content
+        """
+        domain = domain_of(url)
+        with self._lock:
+            stats = self._load_domain(domain)
+            entry = stats.setdefault(tier, [0.0, 0.0])
+            entry[0] += 1
+            if success:
+                entry[1] += 1
+            if entry[0] > self.window:
+                entry[0] /= 2
+                entry[1] /= 2
+            should_flush = self._mark_dirty(domain, tier)
+
+        if should_flush:
+            self.flush()
+
+    def record_path(self, url: str, tiers_tried: Sequence[str], success: bool):
+        """
+        Record a URL's full path through the tier chain.
+
+        Every tier before the last one failed; the last one succeeded or
+        failed according to success.
+
+        Args:
+            url: URL that was fetched
+            tiers_tried: Tiers attempted, in order
+            success: Whether the last tier succeeded
+        """
+        for i, tier in enumerate(tiers_tried):
+            self.record(url, tier, success and i == len(tiers_tried) - 1)
+
+
+def get_tier_router(
+    path: Optional[str],
+    exploration_rate: float = 0.05
+) -> Optional[TierRouter]:
+    """
+    Get the process-wide tier router stored at path.
+
+    Args:
+        path: SQLite database file, or None to disable learned routing
+        exploration_rate: Exploration probability (used when the store is first opened)
+
+    Returns:
+        Shared TierRouter, or None if path is None
+    """
+    return get_shared_store(TierRouter, path, exploration_rate=exploration_rate)
@@ -2,13 +2,105 @@
 XHR/API fetch implementation for alternative endpoints.
 """
 
+import atexit
 import logging
-import requests
-from urllib.parse import urljoin, urlparse
-from typing import Optional, Dict, List, Tuple
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.compat import chardet
+from typing import Optional, Dict, List, Set, Tuple
+from .content_analyzer import ContentAnalyzer
+from .session_pool import SessionPool, get_shared_session_pool
+from .xhr_pattern_index import XHRPatternIndex, generate_api_candidates
 
 logger = logging.getLogger(__name__)
 
+# Threads shared by every XHRFetcher in the process; each fetch keeps at
+# most its max_parallel candidates in flight on them
+XHR_EXECUTOR_WORKERS = 32
+# Bytes of a candidate body read between checks for a winner
+READ_CHUNK_SIZE = 16 * 1024
+
+_shared_executor: Optional[ThreadPoolExecutor] = None
+_shared_executor_lock = threading.Lock()
+
+
+def get_xhr_executor() -> ThreadPoolExecutor:
+    """Get the process-wide thread pool XHR candidates are fetched on."""
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(
+                max_workers=XHR_EXECUTOR_WORKERS,
+                thread_name_prefix="xhr-fetch"
+            )
+        return _shared_executor
+
+
+def shutdown_xhr_executor():
+    """Shut down the shared XHR thread pool, dropping queued candidates (runs at exit)."""
+    global _shared_executor
+    with _shared_executor_lock:
+        executor, _shared_executor = _shared_executor, None
+    if executor is None:
+        return
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        executor.shutdown(wait=False)
+
+
+atexit.register(shutdown_xhr_executor)
+
+
+def _abort_response(response):
+    """Close a response another thread may be reading, waking that thread up."""
+    try:
+        sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+        if sock is not None:
+            # close() alone does not interrupt a thread blocked in recv()
+            sock.shutdown(socket.SHUT_RDWR)
+    except (OSError, AttributeError):
+        pass
+    try:
+        response.close()
+    except Exception:
+        pass
+
+
+class _CandidateRace:
+    """Cancellation state shared by the candidates of one fetch_validated() call."""
+    
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._responses: Set = set()
+    
+    def track(self, response) -> bool:
+        """Register an open response; False (and closed) if the race is already over."""
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._responses.add(response)
+                return True
+        response.close()
+        return False
+    
+    def untrack(self, response):
+        """Forget a finished response and close it."""
+        with self._lock:
+            self._responses.discard(response)
+        response.close()
+    
+    def cancel(self):
+        """End the race: close the losers' responses so their threads stop reading."""
+        with self._lock:
+            self.cancelled.set()
+            responses = list(self._responses)
+            self._responses.clear()
+        for response in responses:
+            _abort_response(response)
+
 
 class XHRFetcher:
     """Attempts to fetch content via XHR/API endpoints."""
@@ -16,7 +108,11 @@ class XHRFetcher:
     def __init__(
         self,
         timeout: int = 30,
-        headers: Optional[Dict[str, str]] = None
+        headers: Optional[Dict[str, str]] = None,
+        session_pool: Optional[SessionPool] = None,
+        max_parallel: int = 4,
+        content_analyzer: Optional[ContentAnalyzer] = None,
+        pattern_index: Optional[XHRPatternIndex] = None
     ):
         """
         Initialize the XHR fetcher.
@@ -24,6 +120,12 @@ class XHRFetcher:
         Args:
             timeout: Request timeout in seconds
             headers: Custom headers to include in requests
+            session_pool: Pool of keep-alive sessions (default: shared process-wide pool)
+            max_parallel: Maximum candidate endpoints in flight per URL (per host)
+            content_analyzer: Analyzer used to accept a candidate response
+                              (default: first 200 response wins)
+            pattern_index: Learned per-domain index restricting which
+                           endpoint patterns are probed (default: probe all)
         """
         self.timeout = timeout
         self.default_headers = {
@@ -35,6 +137,11 @@ class XHRFetcher:
         }
         if headers:
             self.default_headers.update(headers)
+        self.session_pool = session_pool or get_shared_session_pool()
+        self.max_parallel = max(1, max_parallel)
+        self.content_analyzer = content_analyzer
+        self.pattern_index = pattern_index
+        self._executor = get_xhr_executor()
     
     def _generate_api_endpoints(self, url: str) -> List[str]:
         """
@@ -46,46 +153,88 @@ class XHRFetcher:
         Returns:
             List of potential API endpoint URLs
         """
-        parsed = urlparse(url)
-        base_url = f"{parsed.scheme}://{parsed.netloc}"
-        path = parsed.path.rstrip('/')
-        
-        endpoints = []
-        
-        # Common API patterns
-        api_patterns = [
-            '/api' + path,
-            '/api/v1' + path,
-            '/api/v2' + path,
-            '/api/data' + path,
-            path + '/data',
-            path + '/api',
-            '/data' + path,
-        ]
-        
-        for pattern in api_patterns:
-            endpoints.append(urljoin(base_url, pattern))
-        
-        # Try JSON endpoint
-        if path:
-            endpoints.append(urljoin(base_url, path + '.json'))
-        
-        # Try with query parameters preserved
-        if parsed.query:
-            for pattern in api_patterns[:3]:  # Limit to avoid too many URLs
-                endpoints.append(urljoin(base_url, pattern + '?' + parsed.query))
-        
-        return endpoints
+        return [endpoint for _, endpoint in generate_api_candidates(url)]
     
-    def fetch(self, url: str) -> Tuple[Optional[str], int]:
+    def _fetch_candidate(
+        self,
+        endpoint: str,
+        headers: Dict[str, str],
+        race: _CandidateRace
+    ) -> Tuple[Optional[str], int, Optional[Tuple[bool, str]]]:
         """
-        Attempt to fetch content via XHR/API endpoints.
+        Fetch and validate one candidate endpoint.
+        
+        The body is read in chunks and abandoned as soon as another
+        candidate wins (the race closes the response).
+        
+        Returns:
+            Tuple of (response text for a 200 response else None, status_code,
+            should_fallback verdict or None). status_code is 0 if no
+            response was received.
+        """
+        if race.cancelled.is_set():
+            return None, 0, None
+        try:
+            logger.debug(f"Trying XHR endpoint: {endpoint}")
+            response = self.session_pool.get(
+                endpoint,
+                headers=headers,
+                timeout=self.timeout,
+                allow_redirects=True,
+                stream=True
+            )
+        except Exception as e:
+            logger.debug(f"XHR fetch failed for endpoint {endpoint}: {e}")
+            return None, 0, None
+        
+        if not race.track(response):
+            return None, 0, None
+        try:
+            if response.status_code != 200:
+                return None, response.status_code, None
+            body = bytearray()
+            for chunk in response.iter_content(READ_CHUNK_SIZE):
+                if race.cancelled.is_set():
+                    return None, 0, None
+                body.extend(chunk)
+            encoding = response.encoding or chardet.detect(bytes(body))['encoding'] or 'utf-8'
+            try:
+                content = body.decode(encoding, errors='replace')
+            except LookupError:
+                content = body.decode('utf-8', errors='replace')
+        except Exception as e:
+            # Includes reads cut short because another candidate won
+            if not race.cancelled.is_set():
+                logger.debug(f"XHR fetch failed for endpoint {endpoint}: {e}")
+            return None, 0, None
+        finally:
+            race.untrack(response)
+        
+        if race.cancelled.is_set():
+            return None, 0, None
+        verdict = None
+        if self.content_analyzer is not None:
+            verdict = self.content_analyzer.should_fallback(content, 200)
+        return content, 200, verdict
+    
+    def fetch_validated(self, url: str) -> Tuple[Optional[str], int, Optional[Tuple[bool, str]]]:
+        """
+        Race the original URL and generated API endpoints concurrently.
+        
+        Up to max_parallel candidates are in flight at once. The first 200
+        response that passes ContentAnalyzer.should_fallback wins and the
+        remaining candidates are cancelled and their responses closed.
+        Candidates are validated on the worker threads. If no candidate
+        passes, the highest-priority 200 response (original URL first) is
+        returned.
         
         Args:
             url: Original URL to derive API endpoints from
             
         Returns:
-            Tuple of (html_content: Optional[str], status_code: int)
+            Tuple of (html_content, status_code, (should_fallback, reason)).
+            The verdict is None when no content was fetched or no analyzer
+            is configured.
         """
         logger.info(f"Attempting XHR fetch for: {url}")
         
@@ -93,64 +242,75 @@ class XHRFetcher:
         headers = self.default_headers.copy()
         headers['Referer'] = url
         
-        # First, try the original URL with XHR headers
-        try:
-            response = requests.get(
-                url,
-                headers=headers,
-                timeout=self.timeout,
-                allow_redirects=True
+        # (pattern_key, endpoint); the original URL has no pattern key
+        api_candidates = generate_api_candidates(url)
+        if self.pattern_index is not None:
+            api_candidates = self.pattern_index.select(url, api_candidates)
+        candidates = [(None, url)] + api_candidates
+        logger.debug(f"Racing {len(candidates)} XHR candidates ({self.max_parallel} at a time)")
+        
+        race = _CandidateRace()
+        in_flight = {}
+        next_index = 0
+        # (priority, content, verdict) of the best rejected 200 response
+        fallback = None
+        
+        def submit_next():
+            nonlocal next_index
+            future = self._executor.submit(
+                self._fetch_candidate, candidates[next_index][1], headers, race
             )
-            
-            if response.status_code == 200:
-                try:
-                    content = response.text
-                    logger.info(f"XHR fetch successful (original URL): {len(content)} bytes")
-                    return content, response.status_code
-                except UnicodeDecodeError:
-                    response.encoding = response.apparent_encoding or 'utf-8'
-                    content = response.text
-                    logger.info(f"XHR fetch successful (original URL): {len(content)} bytes")
-                    return content, response.status_code
-        except Exception as e:
-            logger.debug(f"XHR fetch failed for original URL: {e}")
+            in_flight[future] = next_index
+            next_index += 1
         
-        # Try alternative API endpoints
-        api_endpoints = self._generate_api_endpoints(url)
-        logger.debug(f"Trying {len(api_endpoints)} alternative endpoints")
+        try:
+            while next_index < len(candidates) and len(in_flight) < self.max_parallel:
+                submit_next()
+            
+            while in_flight:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    pattern = candidates[index][0]
+                    content, candidate_status, verdict = future.result()
+                    accepted = False
+                    if content is not None:
+                        accepted = verdict is None or not verdict[0]
+                        if not accepted and (fallback is None or index < fallback[0]):
+                            fallback = (index, content, verdict)
+                    
+                    # Network errors say nothing about the pattern itself
+                    if pattern is not None and self.pattern_index is not None and candidate_status:
+                        self.pattern_index.record(url, pattern, accepted)
+                    
+                    if accepted:
+                        source = "original URL" if index == 0 else "endpoint"
+                        logger.info(f"XHR fetch successful ({source}): {len(content)} bytes")
+                        return content, 200, verdict
+                    
+                    if next_index < len(candidates):
+                        submit_next()
+        finally:
+            race.cancel()
+            for future in in_flight:
+                future.cancel()
         
-        for endpoint in api_endpoints:
-            try:
-                logger.debug(f"Trying XHR endpoint: {endpoint}")
-                response = requests.get(
-                    endpoint,
-                    headers=headers,
-                    timeout=self.timeout,
-                    allow_redirects=True
-                )
-                
-                if response.status_code == 200:
-                    try:
-                        content = response.text
-                        # If it's JSON, try to extract HTML or return as-is
-                        if response.headers.get('Content-Type', '').startswith('application/json'):
-                            # JSON response - might contain HTML or data
-                            # For now, return as text (could be enhanced to parse JSON)
-                            logger.info(f"XHR fetch successful (JSON endpoint): {len(content)} bytes")
-                            return content, response.status_code
-                        else:
-                            logger.info(f"XHR fetch successful (endpoint): {len(content)} bytes")
-                            return content, response.status_code
-                    except UnicodeDecodeError:
-                        response.encoding = response.apparent_encoding or 'utf-8'
-                        content = response.text
-                        logger.info(f"XHR fetch successful (endpoint): {len(content)} bytes")
-                        return content, response.status_code
-                        
-            except Exception as e:
-                logger.debug(f"XHR fetch failed for endpoint {endpoint}: {e}")
-                continue
+        if fallback is not None:
+            logger.info(f"XHR fetch returned no valid candidate, using best response: {len(fallback[1])} bytes")
+            return fallback[1], 200, fallback[2]
         
         logger.warning(f"XHR fetch failed for all endpoints: {url}")
-        return None, 0
-
+        return None, 0, None
+    
+    def fetch(self, url: str) -> Tuple[Optional[str], int]:
+        """
+        Attempt to fetch content via XHR/API endpoints.
+        
+        Args:
+            url: Original URL to derive API endpoints from
+            
+        Returns:
+            Tuple of (html_content: Optional[str], status_code: int)
+        """
+        html_content, status_code, _ = self.fetch_validated(url)
+        return html_content, status_code
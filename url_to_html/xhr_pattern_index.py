@@ -0,0 +1,163 @@
+"""
+Learned per-domain index of XHR/API endpoint patterns.
+
+Records which generated endpoint patterns returned valid content on each
+domain (persisted in SQLite) so later fetches only probe patterns that
+have worked there, with occasional exploration of the others.
+"""
+
+import random
+from urllib.parse import urljoin, urlparse
+from typing import List, Optional, Tuple
+from .domain_stats import DomainStatsStore, domain_of, get_shared_store
+
+
+def generate_api_candidates(url: str) -> List[Tuple[str, str]]:
+    """
+    Generate potential API endpoints based on the URL.
+
+    Args:
+        url: Original URL
+
+    Returns:
+        List of (pattern_key, endpoint_url) tuples in probing priority order
+    """
+    parsed = urlparse(url)
+    base_url = f"{parsed.scheme}://{parsed.netloc}"
+    path = parsed.path.rstrip('/')
+
+    # Common API patterns
+    api_patterns = [
+        ('api', '/api' + path),
+        ('api_v1', '/api/v1' + path),
+        ('api_v2', '/api/v2' + path),
+        ('api_data', '/api/data' + path),
+        ('path_data', path + '/data'),
+        ('path_api', path + '/api'),
+        ('data', '/data' + path),
+    ]
+
+    candidates = [(key, urljoin(base_url, pattern)) for key, pattern in api_patterns]
+
+    # Try JSON endpoint
+    if path:
+        candidates.append(('json', urljoin(base_url, path + '.json')))
+
+    # Try with query parameters preserved
+    if parsed.query:
+        for key, pattern in api_patterns[:3]:  # Limit to avoid too many URLs
+            candidates.append((f"{key}_query", urljoin(base_url, pattern + '?' + parsed.query)))
+
+    return candidates
+
+
+class XHRPatternIndex(DomainStatsStore):
+    """SQLite-backed per-domain success index for XHR endpoint patterns."""
+
+    table = "xhr_patterns"
+    key_column = "pattern"
+    value_columns = (("successes", "INTEGER"), ("failure_streak", "INTEGER"))
+    description = "XHR pattern index"
+
+    def __init__(
+        self,
+        path: str,
+        exploration_rate: float = 0.1,
+        max_failures: int = 5,
+        flush_interval: float = 5.0
+    ):
+        """
+        Initialize the pattern index.
+
+        Args:
+            path: SQLite database file (created if missing)
+            exploration_rate: Probability of also probing one unproven pattern
+                              on a domain that already has working patterns
+            max_failures: Consecutive failures after which a pattern is
+                          skipped entirely on a domain
+            flush_interval: Seconds between automatic writes to disk
+        """
+        super().__init__(path, flush_interval=flush_interval)
+        self.exploration_rate = exploration_rate
+        self.max_failures = max_failures
+
+    def select(self, url: str, candidates: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        Restrict generated candidates to the patterns worth probing for a URL's domain.
+
+        Args:
+            url: Original URL
+            candidates: (pattern_key, endpoint) tuples from generate_api_candidates
+
+        Returns:
+            Filtered candidates, original priority order preserved
+        """
+        domain = domain_of(url)
+        with self._lock:
+            stats = self._load_domain(domain)
+            proven = []
+            unproven = []
+            for key, endpoint in candidates:
+                successes, streak = stats.get(key, (0, 0))
+                if streak >= self.max_failures:
+                    continue  # Keeps failing on this domain
+                if successes > 0:
+                    proven.append((key, endpoint))
+                else:
+                    unproven.append((key, endpoint))
+
+        if not proven:
+            # Nothing has worked here yet: keep learning
+            return unproven
+
+        selected = set(proven)
+        if unproven and random.random() < self.exploration_rate:
+            selected.add(random.choice(unproven))
+        return [candidate for candidate in candidates if candidate in selected]
+
+    def record(self, url: str, pattern: str, success: bool):
+        """
+        Record the outcome of probing a pattern on a URL's domain.
+
+        Args:
+            url: Original URL
+            pattern: Pattern key that was probed
+            success: Whether the pattern returned valid content
+        """
+        domain = domain_of(url)
+        with self._lock:
+            stats = self._load_domain(domain)
+            entry = stats.setdefault(pattern, [0, 0])
+            if success:
+                entry[0] += 1
+                entry[1] = 0
+            else:
+                entry[1] += 1
+            should_flush = self._mark_dirty(domain, pattern)
+
+        if should_flush:
+            self.flush()
+
+
+def get_xhr_pattern_index(
+    path: Optional[str],
+    exploration_rate: float = 0.1,
+    max_failures: int = 5
+) -> Optional[XHRPatternIndex]:
+    """
+    Get the process-wide pattern index stored at path.
+
+    Args:
+        path: SQLite database file, or None to disable the index
+        exploration_rate: Exploration probability (used when the index is first opened)
+        max_failures: Consecutive failures before a pattern is skipped (used when first opened)
+
+    Returns:
+        Shared XHRPatternIndex, or None if path is None
+    """
+    return get_shared_store(
+        XHRPatternIndex,
+        path,
+        exploration_rate=exploration_rate,
+        max_failures=max_failures
+    )